@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+异步数据库调用
+在线程池中执行 UserManager / CaseManager / DirectoryManager 的方法，
+结果通过 Tk 的 after 轮询交回界面线程，界面不会因为数据库慢而卡住。
+
+- submit 返回 Future，Future 在界面线程中完成，add_done_callback 的回调也在界面线程执行
+- 相同 key 的请求在执行期间合并，只查询一次，结果分发给所有调用方
+- 每个请求可设置超时，超时后以 TimeoutError 结束（后台查询的结果被丢弃）
+"""
+
+import queue
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError
+
+from database_config import DatabaseConfig
+
+# 默认超时（秒）
+DEFAULT_TIMEOUT = 30
+
+# 等待后台结果时的轮询间隔（毫秒）
+POLL_INTERVAL_MS = 20
+
+
+class _Request:
+    """一个执行中的请求（合并后可能对应多个调用方）"""
+
+    def __init__(self, key, deadline):
+        self.key = key
+        self.deadline = deadline
+        self.future = Future()
+        self.worker_future = None
+
+
+class AsyncDatabase:
+    """数据库调用的异步门面（submit/watch 只能在界面线程中调用）"""
+
+    def __init__(self, widget, max_workers=None, default_timeout=DEFAULT_TIMEOUT,
+                 poll_interval_ms=POLL_INTERVAL_MS):
+        self.widget = widget
+        self.default_timeout = default_timeout
+        self.poll_interval_ms = poll_interval_ms
+        # 线程数与连接池大小一致，避免线程在连接池上排队
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or DatabaseConfig.POOL_CONFIG['max_size'],
+            thread_name_prefix='async-db')
+        self._results = queue.SimpleQueue()
+        self._requests = []
+        self._inflight = {}
+        self._after_id = None
+        self._closed = False
+
+    def submit(self, fn, *args, key=None, timeout=None, on_success=None, on_error=None):
+        """在后台线程执行 fn(*args)
+
+        key 不为 None 时，与正在执行的相同 key 的请求合并。
+        on_success(结果) / on_error(异常) 在界面线程中调用。
+        """
+        request = self._inflight.get(key) if key is not None else None
+        if request is None:
+            request = self._start(key, timeout)
+            request.worker_future = self._executor.submit(fn, *args)
+            request.worker_future.add_done_callback(lambda f, r=request: self._results.put((r, f)))
+        self._add_callbacks(request.future, on_success, on_error)
+        return request.future
+
+    def watch(self, worker_future, timeout=None, on_success=None, on_error=None):
+        """把其他线程池返回的 Future 接入界面线程分发（例如密码哈希线程池）"""
+        request = self._start(None, timeout)
+        request.worker_future = worker_future
+        worker_future.add_done_callback(lambda f, r=request: self._results.put((r, f)))
+        self._add_callbacks(request.future, on_success, on_error)
+        return request.future
+
+    def pending(self):
+        """执行中的请求数"""
+        return len(self._requests)
+
+    def close(self):
+        """停止分发并关闭线程池（不等待执行中的查询）"""
+        self._closed = True
+        if self._after_id is not None:
+            try:
+                self.widget.after_cancel(self._after_id)
+            except Exception:
+                pass
+            self._after_id = None
+        for request in self._requests:
+            request.future.cancel()
+        self._requests = []
+        self._inflight.clear()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _start(self, key, timeout):
+        if self._closed:
+            raise RuntimeError("AsyncDatabase 已关闭")
+        timeout = self.default_timeout if timeout is None else timeout
+        request = _Request(key, time.monotonic() + timeout if timeout else None)
+        self._requests.append(request)
+        if key is not None:
+            self._inflight[key] = request
+        if self._after_id is None:
+            self._after_id = self.widget.after(self.poll_interval_ms, self._poll)
+        return request
+
+    @staticmethod
+    def _add_callbacks(future, on_success, on_error):
+        if on_success is None and on_error is None:
+            return
+
+        def done(f):
+            if f.cancelled():
+                return
+            error = f.exception()
+            if error is None:
+                if on_success:
+                    on_success(f.result())
+            elif on_error:
+                on_error(error)
+            else:
+                print(f"后台数据库调用错误: {error}")
+
+        future.add_done_callback(done)
+
+    def _finish(self, request):
+        if request in self._requests:
+            self._requests.remove(request)
+        if request.key is not None and self._inflight.get(request.key) is request:
+            del self._inflight[request.key]
+
+    def _poll(self):
+        """界面线程：分发已完成的结果，处理超时"""
+        self._after_id = None
+        if self._closed:
+            return
+
+        while True:
+            try:
+                request, worker_future = self._results.get_nowait()
+            except queue.Empty:
+                break
+            self._finish(request)
+            if request.future.done():
+                # 已超时或被取消，丢弃结果
+                continue
+            if worker_future.cancelled():
+                request.future.cancel()
+            elif worker_future.exception() is not None:
+                request.future.set_exception(worker_future.exception())
+            else:
+                request.future.set_result(worker_future.result())
+
+        now = time.monotonic()
+        for request in list(self._requests):
+            if request.future.done():
+                self._finish(request)
+            elif request.deadline is not None and now >= request.deadline:
+                self._finish(request)
+                request.worker_future.cancel()
+                request.future.set_exception(TimeoutError("数据库请求超时"))
+
+        if self._requests:
+            self._after_id = self.widget.after(self.poll_interval_ms, self._poll)
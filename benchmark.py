@@ -0,0 +1,468 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+管理类和PDF处理流程的性能基准测试
+生成合成的用户、卷宗、目录数据（默认 1 万个卷宗、100 万条目录）和合成的多页PDF，
+测量以下操作的耗时，结果可保存为 JSON，并与保存的基准结果比较，发现性能回退：
+
+- get_user_cases           一个用户的卷宗列表
+- get_case_directories     一个卷宗的目录
+- batch_insert_directories 批量插入目录（每次 --batch-rows 条）
+- validate_session         会话验证（分别测量缓存命中和查询数据库两种情况）
+- toc_extraction           整个PDF的文本提取和目录识别（与提取进程中的流程相同）
+- page_render              一页PDF的预览和全部图块渲染
+
+默认在临时目录中的 SQLite 数据库上运行；--backend mysql 时使用 DatabaseConfig.DB_CONFIG
+配置的数据库（请使用专门的测试数据库），合成数据的用户名以 bench_ 开头，测试结束后删除。
+
+用法:
+    python benchmark.py [--backend sqlite|mysql] [--cases 10000] [--directories 1000000]
+    python benchmark.py --output results.json
+    python benchmark.py --baseline baseline.json [--tolerance 0.25]
+    python benchmark.py --only validate_session_cached,page_render --cases 1000 --directories 50000
+
+--sqlite-path 指定数据库文件时保留生成的数据，再次运行时数据量相同则直接使用，不重新生成。
+比较基准时任一项的 p50 比基准慢 --tolerance 以上（且差值超过 --min-delta-ms）则返回非零退出码。
+"""
+
+import argparse
+import json
+import os
+import platform
+import queue
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+import fitz  # PyMuPDF
+
+import toc_parser
+from database_config import (CaseManager, DatabaseConfig, DatabaseManager, DirectoryManager, Error,
+                             SQLiteBackend, UserManager)
+from pdf_extraction import extract_page_range
+from pdf_renderer import TILE_SIZE, PREVIEW_SCALE, page_geometry, render_tile
+
+# 合成数据的用户名前缀（清理数据时按此前缀删除）
+USER_PREFIX = 'bench_'
+
+# 生成数据时每次 executemany 的行数
+INSERT_CHUNK_SIZE = 5000
+
+# 每项测试的默认执行次数
+DEFAULT_ITERATIONS = {
+    'get_user_cases': 50,
+    'get_case_directories': 200,
+    'batch_insert_directories': 20,
+    'validate_session_cached': 2000,
+    'validate_session_uncached': 300,
+    'toc_extraction': 3,
+    'page_render': 30
+}
+
+BENCHMARKS = list(DEFAULT_ITERATIONS)
+
+
+def summarize(timings):
+    """耗时列表（毫秒）的统计值"""
+    timings = sorted(timings)
+    return {
+        'iterations': len(timings),
+        'p50_ms': round(timings[len(timings) // 2], 4),
+        'p95_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 4),
+        'mean_ms': round(statistics.fmean(timings), 4),
+        'min_ms': round(timings[0], 4),
+        'max_ms': round(timings[-1], 4)
+    }
+
+
+def measure(fn, iterations, warmup=1, setup=None):
+    """执行 fn 若干次并统计耗时；setup 在每次执行前调用，不计入耗时"""
+    for _ in range(warmup):
+        if setup:
+            setup()
+        fn()
+    timings = []
+    for _ in range(iterations):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return summarize(timings)
+
+
+# ---------------------------------------------------------------- 合成数据
+
+def synthetic_directory(rng, index):
+    return {
+        'number': str(index + 1),
+        'title': rng.choice(toc_parser.SAMPLE_TITLES),
+        'page': index * 3 + 1,
+        'evidence_type': None
+    }
+
+
+class SyntheticDataset:
+    """数据库中的合成用户、卷宗和目录数据"""
+
+    def __init__(self, db_manager, users, cases, directories, seed=1):
+        self.db = db_manager
+        self.user_count = users
+        self.case_count = cases
+        self.directory_count = directories
+        self.rng = random.Random(seed)
+        self.user_ids = []
+        self.case_ids = []
+        self.scratch_case_id = None
+
+    def prepare(self):
+        """数据量与要求相同时直接使用已有数据，否则清除后重新生成"""
+        self.user_ids = [row['id'] for row in self.db.execute_query(
+            "SELECT id FROM users WHERE username LIKE %s ORDER BY id", (USER_PREFIX + '%',))]
+        if self.user_ids:
+            self.case_ids = self._load_case_ids()
+            directories = self.db.execute_query(
+                "SELECT COALESCE(SUM(directory_count), 0) AS total FROM cases WHERE created_by IN ({})".format(
+                    ", ".join(["%s"] * len(self.user_ids))), self.user_ids)
+            if (len(self.user_ids) == self.user_count and len(self.case_ids) == self.case_count
+                    and int(directories[0]['total']) == self.directory_count):
+                print(f"使用已有的合成数据：{self.user_count} 个用户，{self.case_count} 个卷宗，"
+                      f"{self.directory_count} 条目录")
+                return
+            self.cleanup()
+        self.generate()
+
+    def generate(self):
+        start = time.perf_counter()
+        # 所有合成用户使用同一个密码哈希，避免为每个用户计算一次哈希
+        password = UserManager.hash_password('bench-password')
+        with self.db.transaction() as cursor:
+            cursor.executemany(
+                "INSERT INTO users (username, password, full_name, role, status) VALUES (%s, %s, %s, %s, %s)",
+                [(f"{USER_PREFIX}{i:05d}", password, f"测试用户{i}", 'user', 'active')
+                 for i in range(self.user_count)])
+        self.user_ids = [row['id'] for row in self.db.execute_query(
+            "SELECT id FROM users WHERE username LIKE %s ORDER BY id", (USER_PREFIX + '%',))]
+
+        # 目录数平均分到每个卷宗，余数分给前面的卷宗
+        per_case, extra = divmod(self.directory_count, self.case_count)
+        now = datetime.now().replace(microsecond=0)
+        cases = []
+        for i in range(self.case_count):
+            updated_at = now - timedelta(minutes=i)
+            cases.append((f"测试卷宗{i}", f"BENCH-{i:06d}", "合成数据", self.user_ids[i % self.user_count],
+                          'active', per_case + (1 if i < extra else 0), updated_at, updated_at))
+        with self.db.transaction() as cursor:
+            for first in range(0, len(cases), INSERT_CHUNK_SIZE):
+                cursor.executemany("""
+                    INSERT INTO cases (case_name, case_number, description, created_by, status,
+                                       directory_count, created_at, updated_at)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                """, cases[first:first + INSERT_CHUNK_SIZE])
+        self.case_ids = self._load_case_ids()
+
+        query = """
+            INSERT INTO case_directories (case_id, sequence_number, file_name, page_number, end_page, sort_order, is_custom, evidence_type)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+        """
+        rows = []
+        for i, case_id in enumerate(self.case_ids):
+            for index in range(per_case + (1 if i < extra else 0)):
+                directory = synthetic_directory(self.rng, index)
+                directory['end_page'] = directory['page'] + 2
+                rows.append(DirectoryManager._directory_params(case_id, index, directory))
+            if len(rows) >= INSERT_CHUNK_SIZE * 20 or i == len(self.case_ids) - 1:
+                with self.db.transaction() as cursor:
+                    for first in range(0, len(rows), INSERT_CHUNK_SIZE):
+                        cursor.executemany(query, rows[first:first + INSERT_CHUNK_SIZE])
+                rows = []
+                print(f"\r生成目录 {i + 1}/{len(self.case_ids)} 个卷宗", end='', flush=True)
+        print()
+        print(f"生成合成数据：{self.user_count} 个用户，{self.case_count} 个卷宗，{self.directory_count} 条目录，"
+              f"耗时 {time.perf_counter() - start:.1f} 秒")
+
+    def create_scratch_case(self):
+        """batch_insert_directories 写入的空卷宗"""
+        self.scratch_case_id = CaseManager(self.db).create_case("批量插入测试", "BENCH-SCRATCH", "合成数据",
+                                                                 self.user_ids[0])
+        return self.scratch_case_id
+
+    def drop_scratch_case(self):
+        if self.scratch_case_id:
+            self.db.execute_update("DELETE FROM case_directories WHERE case_id = %s", (self.scratch_case_id,))
+            self.db.execute_update("DELETE FROM cases WHERE id = %s", (self.scratch_case_id,))
+            self.scratch_case_id = None
+
+    def cleanup(self):
+        """删除全部合成数据"""
+        if not self.user_ids:
+            return
+        placeholders = ", ".join(["%s"] * len(self.user_ids))
+        case_ids = self._load_case_ids(include_scratch=True)
+        for first in range(0, len(case_ids), 500):
+            chunk = case_ids[first:first + 500]
+            self.db.execute_update("DELETE FROM case_directories WHERE case_id IN ({})".format(
+                ", ".join(["%s"] * len(chunk))), chunk)
+        self.db.execute_update(f"DELETE FROM cases WHERE created_by IN ({placeholders})", self.user_ids)
+        self.db.execute_update(f"DELETE FROM user_sessions WHERE user_id IN ({placeholders})", self.user_ids)
+        self.db.execute_update(f"DELETE FROM users WHERE id IN ({placeholders})", self.user_ids)
+        self.user_ids = []
+        self.case_ids = []
+
+    def _load_case_ids(self, include_scratch=False):
+        placeholders = ", ".join(["%s"] * len(self.user_ids))
+        scratch = "" if include_scratch else "AND case_number <> 'BENCH-SCRATCH'"
+        return [row['id'] for row in self.db.execute_query(
+            f"SELECT id FROM cases WHERE created_by IN ({placeholders}) {scratch} ORDER BY id", self.user_ids)]
+
+
+def synthetic_pdf(path, page_count, seed=1):
+    """生成带多页目录的合成卷宗PDF，返回目录条目数"""
+    rng = random.Random(seed)
+    document = toc_parser.synthetic_document(rng, toc_pages=3)
+    pages = document['pages']
+    while len(pages) < page_count:
+        pages.append('\n'.join(rng.choice(toc_parser.SAMPLE_BODY) for _ in range(rng.randint(10, 40))))
+
+    doc = fitz.open()
+    try:
+        for text in pages:
+            page = doc.new_page(width=595, height=842)
+            page.insert_text((50, 60), text, fontname='china-s', fontsize=10, lineheight=1.6)
+        doc.save(path, garbage=3, deflate=True)
+    finally:
+        doc.close()
+    return len(document['toc'])
+
+
+# ---------------------------------------------------------------- 测试项
+
+def run_database_benchmarks(db_manager, dataset, selected, iterations, batch_rows):
+    results = {}
+    rng = random.Random(7)
+    user_manager = UserManager(db_manager)
+    case_manager = CaseManager(db_manager)
+    directory_manager = DirectoryManager(db_manager)
+
+    if 'get_user_cases' in selected:
+        results['get_user_cases'] = measure(
+            lambda: case_manager.get_user_cases(rng.choice(dataset.user_ids)), iterations['get_user_cases'])
+
+    if 'get_case_directories' in selected:
+        results['get_case_directories'] = measure(
+            lambda: directory_manager.get_case_directories(rng.choice(dataset.case_ids)),
+            iterations['get_case_directories'])
+
+    if 'batch_insert_directories' in selected:
+        case_id = dataset.create_scratch_case()
+        directories = [synthetic_directory(rng, index) for index in range(batch_rows)]
+        try:
+            results['batch_insert_directories'] = measure(
+                lambda: directory_manager.batch_insert_directories(case_id, directories, total_pages=batch_rows * 3),
+                iterations['batch_insert_directories'],
+                setup=lambda: directory_manager.clear_case_directories(case_id))
+            results['batch_insert_directories']['rows'] = batch_rows
+        finally:
+            dataset.drop_scratch_case()
+
+    if 'validate_session_cached' in selected or 'validate_session_uncached' in selected:
+        tokens = [user_manager.create_session(user_id) for user_id in dataset.user_ids[:100]]
+        if 'validate_session_cached' in selected:
+            token = tokens[0]
+            results['validate_session_cached'] = measure(
+                lambda: user_manager.validate_session(token), iterations['validate_session_cached'])
+        if 'validate_session_uncached' in selected:
+            current = []
+
+            def pick_token():
+                # 每次先移除缓存，使验证查询数据库
+                current[:] = [rng.choice(tokens)]
+                UserManager.invalidate_session(current[0])
+
+            results['validate_session_uncached'] = measure(
+                lambda: user_manager.validate_session(current[0]), iterations['validate_session_uncached'],
+                setup=pick_token)
+        for token in tokens:
+            user_manager.logout_user(token)
+    return results
+
+
+def run_pdf_benchmarks(pdf_path, expected_rows, selected, iterations, zoom):
+    results = {}
+    page_count = fitz.open(pdf_path).page_count
+
+    if 'toc_extraction' in selected:
+        detected = []
+
+        def extract():
+            _, _, page_results = extract_page_range(pdf_path, 0, page_count, queue.Queue(), threading.Event(), 0)
+            detected[:] = toc_parser.select_toc_rows(page_results)
+
+        results['toc_extraction'] = measure(extract, iterations['toc_extraction'])
+        results['toc_extraction']['pages'] = page_count
+        results['toc_extraction']['pages_per_second'] = round(
+            page_count / results['toc_extraction']['p50_ms'] * 1000, 1)
+        if len(detected) != expected_rows:
+            print(f"警告：识别出 {len(detected)} 条目录，合成PDF中有 {expected_rows} 条")
+
+    if 'page_render' in selected:
+        rng = random.Random(11)
+        current = []
+
+        def render():
+            page_number = current[0]
+            width, height, _ = page_geometry(pdf_path, page_number, zoom)
+            preview_zoom = zoom / PREVIEW_SCALE
+            render_tile(pdf_path, page_number, preview_zoom, 0, 0, 0, width / PREVIEW_SCALE, height / PREVIEW_SCALE)
+            for y0 in range(0, height, TILE_SIZE):
+                for x0 in range(0, width, TILE_SIZE):
+                    render_tile(pdf_path, page_number, zoom, 0, x0, y0,
+                                min(x0 + TILE_SIZE, width), min(y0 + TILE_SIZE, height))
+
+        results['page_render'] = measure(
+            render, iterations['page_render'],
+            setup=lambda: current.__setitem__(slice(None), [rng.randint(1, page_count)]))
+        results['page_render']['zoom'] = zoom
+    return results
+
+
+# ---------------------------------------------------------------- 基准比较
+
+def compare(results, baseline, tolerance, min_delta_ms):
+    """与基准结果比较 p50，返回回退的测试项"""
+    if baseline.get('dataset') != results.get('dataset'):
+        print(f"警告：数据规模与基准不同（基准 {baseline.get('dataset')}，本次 {results.get('dataset')}）")
+    if baseline.get('backend') != results.get('backend'):
+        print(f"警告：数据库后端与基准不同（基准 {baseline.get('backend')}，本次 {results.get('backend')}）")
+
+    regressions = []
+    print(f"\n{'测试项':<28}{'基准 p50':>12}{'本次 p50':>12}{'变化':>10}")
+    for name, current in results['results'].items():
+        previous = baseline.get('results', {}).get(name)
+        if previous is None:
+            print(f"{name:<28}{'-':>12}{current['p50_ms']:>12.3f}{'新增':>10}")
+            continue
+        ratio = current['p50_ms'] / previous['p50_ms'] if previous['p50_ms'] else 1.0
+        regressed = (ratio > 1 + tolerance and current['p50_ms'] - previous['p50_ms'] > min_delta_ms)
+        mark = '  回退' if regressed else ''
+        print(f"{name:<28}{previous['p50_ms']:>12.3f}{current['p50_ms']:>12.3f}{ratio - 1:>+10.1%}{mark}")
+        if regressed:
+            regressions.append(name)
+    return regressions
+
+
+def print_results(results):
+    print(f"\n{'测试项':<28}{'次数':>6}{'p50 ms':>12}{'p95 ms':>12}{'平均 ms':>12}")
+    for name, result in results.items():
+        print(f"{name:<28}{result['iterations']:>6}{result['p50_ms']:>12.3f}"
+              f"{result['p95_ms']:>12.3f}{result['mean_ms']:>12.3f}")
+
+
+def open_database(backend_name, sqlite_path):
+    if backend_name == 'sqlite':
+        config = dict(DatabaseConfig.SQLITE_CONFIG, path=sqlite_path)
+        db_manager = DatabaseManager(SQLiteBackend(config))
+    else:
+        db_manager = DatabaseManager(DatabaseConfig.get_backend(backend_name))
+    if not db_manager.connect():
+        return None
+    return db_manager
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="管理类和PDF处理流程的性能基准测试")
+    parser.add_argument('--backend', choices=sorted(DatabaseConfig.BACKENDS), default='sqlite')
+    parser.add_argument('--sqlite-path', help="SQLite 数据库文件（保留合成数据供下次使用，默认使用临时文件）")
+    parser.add_argument('--keep-data', action='store_true', help="测试结束后不删除数据库中的合成数据")
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--cases', type=int, default=10000)
+    parser.add_argument('--directories', type=int, default=1000000)
+    parser.add_argument('--batch-rows', type=int, default=1000, help="batch_insert_directories 每次插入的条数")
+    parser.add_argument('--pdf-pages', type=int, default=300)
+    parser.add_argument('--zoom', type=float, default=1.5, help="page_render 的缩放")
+    parser.add_argument('--iterations', type=float, default=1.0, help="各项默认执行次数的倍数")
+    parser.add_argument('--only', help="只运行指定的测试项（逗号分隔）：" + ", ".join(BENCHMARKS))
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help="结果写入的 JSON 文件")
+    parser.add_argument('--baseline', help="比较的基准结果 JSON 文件")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="p50 允许比基准慢的比例")
+    parser.add_argument('--min-delta-ms', type=float, default=0.05, help="p50 差值小于该值时不算回退")
+    args = parser.parse_args(argv)
+
+    selected = BENCHMARKS if not args.only else [name.strip() for name in args.only.split(',') if name.strip()]
+    unknown = [name for name in selected if name not in DEFAULT_ITERATIONS]
+    if unknown:
+        print(f"未知的测试项: {', '.join(unknown)}")
+        return 2
+    if args.users < 1 or args.cases < args.users:
+        print("卷宗数不能少于用户数")
+        return 2
+    iterations = {name: max(1, int(count * args.iterations)) for name, count in DEFAULT_ITERATIONS.items()}
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    workdir = tempfile.mkdtemp(prefix='benchmark_')
+    results = {}
+    try:
+        database_benchmarks = [name for name in selected if name not in ('toc_extraction', 'page_render')]
+        if database_benchmarks:
+            db_manager = open_database(args.backend, args.sqlite_path or os.path.join(workdir, 'benchmark.db'))
+            if db_manager is None:
+                print("数据库连接失败")
+                return 1
+            dataset = SyntheticDataset(db_manager, args.users, args.cases, args.directories, args.seed)
+            try:
+                dataset.prepare()
+                results.update(run_database_benchmarks(db_manager, dataset, database_benchmarks, iterations,
+                                                       args.batch_rows))
+                if not args.keep_data and (args.backend != 'sqlite' or not args.sqlite_path):
+                    dataset.cleanup()
+            except Error as e:
+                print(f"数据库测试错误: {e}")
+                return 1
+            finally:
+                db_manager.disconnect()
+
+        pdf_benchmarks = [name for name in selected if name in ('toc_extraction', 'page_render')]
+        if pdf_benchmarks:
+            pdf_path = os.path.join(workdir, 'benchmark.pdf')
+            expected_rows = synthetic_pdf(pdf_path, args.pdf_pages, args.seed)
+            results.update(run_pdf_benchmarks(pdf_path, expected_rows, pdf_benchmarks, iterations, args.zoom))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'backend': args.backend,
+        'dataset': {'users': args.users, 'cases': args.cases, 'directories': args.directories,
+                    'pdf_pages': args.pdf_pages, 'seed': args.seed},
+        'environment': {'python': platform.python_version(), 'platform': platform.platform(),
+                        'processor': platform.processor() or platform.machine(), 'cpus': os.cpu_count(),
+                        'pymupdf': fitz.VersionBind},
+        'results': {name: results[name] for name in selected if name in results}
+    }
+    print_results(report['results'])
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已写入 {args.output}")
+
+    if baseline is not None:
+        regressions = compare(report, baseline, args.tolerance, args.min_delta_ms)
+        if regressions:
+            print(f"\n性能回退: {', '.join(regressions)}")
+            return 1
+        print("\n没有超过允许范围的性能回退")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
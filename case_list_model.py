@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+卷宗列表数据模型
+按卷宗ID保存用户的卷宗，按更新时间倒序排列。首次只加载第一页，
+滚动到末尾时按键集分页继续加载；之后的刷新只查询 updated_at 有变化的卷宗。
+"""
+
+from datetime import datetime
+
+
+class CaseListModel:
+    """卷宗列表数据模型（按卷宗ID索引，支持增量刷新和分页加载）"""
+
+    PAGE_SIZE = 200
+
+    def __init__(self, case_manager, user_id):
+        self.case_manager = case_manager
+        self.user_id = user_id
+
+        self.cases = {}        # 卷宗ID -> 卷宗数据
+        self.order = []        # 按 (updated_at, id) 倒序排列的卷宗ID
+        self.has_more = True   # 是否还有未加载的分页
+        self.last_updated_at = None  # 已获取数据中最新的 updated_at
+        self._page_cursor = None     # 分页位置：上一页最后一行的 (updated_at, id)
+
+    def __len__(self):
+        return len(self.order)
+
+    @property
+    def page_cursor(self):
+        """下一页的分页位置：上一页最后一行的 (updated_at, id)"""
+        return self._page_cursor
+
+    def row(self, index):
+        """按显示位置获取卷宗数据"""
+        return self.cases[self.order[index]]
+
+    def index_of(self, case_id):
+        """卷宗在列表中的位置，不存在返回 -1"""
+        try:
+            return self.order.index(case_id)
+        except ValueError:
+            return -1
+
+    def load_more(self):
+        """加载下一页卷宗，返回本次加载的行数"""
+        if not self.has_more:
+            return 0
+        return self.apply_page(self.fetch_page(self._page_cursor), self._page_cursor)
+
+    def refresh(self):
+        """增量刷新：只获取上次之后有变化的卷宗，返回变化的行数"""
+        if self.last_updated_at is None:
+            return self.load_more()
+        return self.apply_changes(self.fetch_changes(self.last_updated_at))
+
+    # fetch_* 只查询数据库、不修改模型，可以在后台线程执行；
+    # apply_* 在界面线程中把查询结果合并进模型
+
+    def fetch_page(self, cursor=None):
+        """查询 cursor 之后的一页（cursor 为 None 时查询第一页）"""
+        return self.case_manager.get_user_cases_page(self.user_id, cursor, self.PAGE_SIZE)
+
+    def apply_page(self, rows, cursor):
+        """合并 cursor 之后的一页；该页已被其他请求合并过时忽略"""
+        if rows is None or cursor != self._page_cursor:
+            return 0
+        if len(rows) < self.PAGE_SIZE:
+            self.has_more = False
+        if rows:
+            last = rows[-1]
+            self._page_cursor = (last['updated_at'], last['id'])
+        self._apply(rows)
+        return len(rows)
+
+    def fetch_changes(self, since):
+        """查询 since 之后有变化的卷宗"""
+        return self.case_manager.get_user_cases_changed_since(self.user_id, since)
+
+    def apply_changes(self, rows):
+        """合并增量刷新结果"""
+        if rows is None:
+            return 0
+        self._apply(rows)
+        return len(rows)
+
+    def remove(self, case_id):
+        """从列表中移除卷宗（例如删除成功后立即更新界面）"""
+        if self.cases.pop(case_id, None) is not None:
+            self.order.remove(case_id)
+
+    def _apply(self, rows):
+        """合并查询结果：已删除的卷宗移除，其余按ID覆盖，然后重新排序"""
+        for case in rows:
+            if case['status'] != 'active':
+                self.cases.pop(case['id'], None)
+            else:
+                self.cases[case['id']] = case
+            updated_at = case['updated_at']
+            if updated_at and (self.last_updated_at is None or updated_at > self.last_updated_at):
+                self.last_updated_at = updated_at
+
+        self.order = sorted(self.cases, key=self._sort_key, reverse=True)
+
+    def _sort_key(self, case_id):
+        case = self.cases[case_id]
+        return (case['updated_at'] or datetime.min, case_id)
+
+
+class CaseSearchModel:
+    """卷宗检索结果模型（与 CaseListModel 接口相同，可直接交给列表视图显示）"""
+
+    PAGE_SIZE = 50
+
+    def __init__(self, case_manager, user_id, keyword):
+        self.case_manager = case_manager
+        self.user_id = user_id
+        self.keyword = keyword
+
+        self.cases = {}
+        self.order = []
+        self.has_more = True
+
+    def __len__(self):
+        return len(self.order)
+
+    @property
+    def page_cursor(self):
+        """下一页的偏移量"""
+        return len(self.order)
+
+    def row(self, index):
+        return self.cases[self.order[index]]
+
+    def index_of(self, case_id):
+        try:
+            return self.order.index(case_id)
+        except ValueError:
+            return -1
+
+    def load_more(self):
+        """加载下一页检索结果，返回本次加载的行数"""
+        if not self.has_more:
+            return 0
+        return self.apply_page(self.fetch_page(self.page_cursor), self.page_cursor)
+
+    def fetch_page(self, cursor):
+        """查询偏移量 cursor 开始的一页检索结果"""
+        return self.case_manager.search_cases(self.user_id, self.keyword, self.PAGE_SIZE, cursor)
+
+    def apply_page(self, rows, cursor):
+        """合并一页检索结果；该页已被其他请求合并过时忽略"""
+        if cursor != self.page_cursor:
+            return 0
+        if rows is None:
+            self.has_more = False
+            return 0
+        if len(rows) < self.PAGE_SIZE:
+            self.has_more = False
+        for case in rows:
+            if case['id'] not in self.cases:
+                self.cases[case['id']] = case
+                self.order.append(case['id'])
+        return len(rows)
+
+    def remove(self, case_id):
+        if self.cases.pop(case_id, None) is not None:
+            self.order.remove(case_id)
@@ -1,13 +1,230 @@
 # 数据库配置文件
-import mysql.connector
-from mysql.connector import Error
-import hashlib
+try:
+    import mysql.connector
+    from mysql.connector import Error, errors
+except ImportError:
+    # 离线单机版（SQLite 后端）可以不安装 mysql-connector
+    mysql = None
+    from sqlite_backend import Error, errors
+import os
 import secrets
+import sys
+import threading
+import time
+import weakref
+from collections import OrderedDict, deque, namedtuple
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 
+import password_hashing
+import sqlite_backend
+from directory_index import DirectoryRangeIndex, infer_end_pages
+from query_metrics import QueryEvent, get_query_metrics
+
+class PoolExhaustedError(Error):
+    """连接池在等待时间内没有可用连接"""
+
+class TransactionRollbackError(Error):
+    """工作单元中有语句执行失败，整个事务已回滚"""
+
+class ConcurrentModificationError(Error):
+    """数据在读取之后已被其他用户修改"""
+
+def escape_like(keyword):
+    """转义 LIKE 模式中的通配符"""
+    return keyword.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+# LIKE 的转义字符：MySQL 默认为反斜杠，SQLite 需要显式指定
+LIKE_ESCAPE = {
+    'mysql': "",
+    'sqlite': " ESCAPE '\\'"
+}
+
+def fulltext_phrase(keyword):
+    """构造 BOOLEAN MODE 下的短语检索表达式"""
+    return '"' + keyword.replace('"', ' ') + '"'
+
+class ConnectionPool:
+    """线程安全的数据库连接池
+    
+    - 连接数上限为 max_size，超过上限的借出请求最多等待 acquire_timeout 秒
+    - 空闲超过 idle_timeout 秒的连接会被回收
+    - 空闲超过 health_check_interval 秒的连接在借出前先 ping，
+      失效（例如被 MySQL wait_timeout 断开）时自动重连
+    """
+    
+    def __init__(self, connect, max_size=10, acquire_timeout=10,
+                 idle_timeout=300, health_check_interval=30):
+        self._connect = connect
+        self.max_size = max_size
+        self.acquire_timeout = acquire_timeout
+        self.idle_timeout = idle_timeout
+        self.health_check_interval = health_check_interval
+        
+        self._cond = threading.Condition()
+        self._idle = deque()  # (connection, last_used)，右端为最近归还
+        self._in_use = 0
+        self._closed = False
+        
+        # 统计信息
+        self._created = 0
+        self._reconnects = 0
+        self._evicted = 0
+        self._checkouts = 0
+        self._waits = 0
+        self._wait_time_total = 0.0
+        self._wait_time_max = 0.0
+    
+    def acquire(self, timeout=None):
+        """借出一个连接，超时抛出 PoolExhaustedError"""
+        timeout = self.acquire_timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+        connection = None
+        last_used = None
+        evicted = []
+        
+        with self._cond:
+            waited = False
+            while True:
+                if self._closed:
+                    raise PoolExhaustedError(msg="连接池已关闭")
+                now = time.monotonic()
+                evicted.extend(self._evict_idle_locked(now))
+                if self._idle:
+                    # 后进先出，让少用的连接自然老化并被回收
+                    connection, last_used = self._idle.pop()
+                    break
+                if self._in_use < self.max_size:
+                    break
+                remaining = deadline - now
+                if remaining <= 0:
+                    raise PoolExhaustedError(
+                        msg=f"等待数据库连接超时（{timeout}秒，连接池上限 {self.max_size}）")
+                waited = True
+                self._cond.wait(remaining)
+            
+            self._in_use += 1
+            self._checkouts += 1
+            if waited:
+                wait_time = time.monotonic() - started
+                self._waits += 1
+                self._wait_time_total += wait_time
+                self._wait_time_max = max(self._wait_time_max, wait_time)
+        
+        for stale in evicted:
+            self._close_quietly(stale)
+        
+        try:
+            if connection is None:
+                connection = self._connect()
+                with self._cond:
+                    self._created += 1
+            elif time.monotonic() - last_used > self.health_check_interval:
+                connection = self._ensure_alive(connection)
+        except BaseException:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+        return connection
+    
+    def release(self, connection, discard=False):
+        """归还连接，discard 为 True 时直接关闭该连接"""
+        with self._cond:
+            self._in_use -= 1
+            if not (discard or self._closed):
+                self._idle.append((connection, time.monotonic()))
+                connection = None
+            self._cond.notify()
+        if connection is not None:
+            self._close_quietly(connection)
+    
+    def close(self):
+        """关闭连接池及所有空闲连接"""
+        with self._cond:
+            self._closed = True
+            idle = [connection for connection, _ in self._idle]
+            self._idle.clear()
+            self._cond.notify_all()
+        for connection in idle:
+            self._close_quietly(connection)
+    
+    def stats(self):
+        """连接池统计信息，用于评估连接池大小"""
+        with self._cond:
+            return {
+                'max_size': self.max_size,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'created': self._created,
+                'reconnects': self._reconnects,
+                'evicted': self._evicted,
+                'checkouts': self._checkouts,
+                'waits': self._waits,
+                'wait_time_total': self._wait_time_total,
+                'wait_time_avg': self._wait_time_total / self._waits if self._waits else 0.0,
+                'wait_time_max': self._wait_time_max,
+            }
+    
+    def _evict_idle_locked(self, now):
+        """移出空闲过久的连接（调用方需持有锁，返回待关闭的连接）"""
+        evicted = []
+        while self._idle and now - self._idle[0][1] > self.idle_timeout:
+            evicted.append(self._idle.popleft()[0])
+        self._evicted += len(evicted)
+        return evicted
+    
+    def _ensure_alive(self, connection):
+        """检查连接是否可用，失效时重连"""
+        try:
+            connection.ping(reconnect=True, attempts=2, delay=0)
+            return connection
+        except Error:
+            self._close_quietly(connection)
+            connection = self._connect()
+            with self._cond:
+                self._reconnects += 1
+            return connection
+    
+    @staticmethod
+    def _close_quietly(connection):
+        try:
+            connection.close()
+        except Error:
+            pass
+
+class MySQLBackend:
+    """MySQL 后端（中心数据库）"""
+    
+    dialect = 'mysql'
+    
+    def __init__(self, config=None):
+        self.config = config
+    
+    def connect(self):
+        if mysql is None:
+            raise errors.InterfaceError(msg="未安装 mysql-connector-python，无法连接 MySQL")
+        return mysql.connector.connect(**(self.config or DatabaseConfig.DB_CONFIG))
+
+class SQLiteBackend:
+    """SQLite 后端（离线单机版和本地测试，连接接口见 sqlite_backend）"""
+    
+    dialect = 'sqlite'
+    
+    def __init__(self, config=None):
+        self.config = config
+    
+    def connect(self):
+        config = self.config or DatabaseConfig.SQLITE_CONFIG
+        return sqlite_backend.connect(config['path'], config['pragmas'])
+
 class DatabaseConfig:
     """数据库配置类"""
     
+    # 数据库后端：'mysql'（中心数据库）或 'sqlite'（离线单机版，修改后由 offline_sync 同步到 MySQL）
+    BACKEND = 'mysql'
+    
     # 数据库连接配置
     DB_CONFIG = {
         'host': 'localhost',
@@ -19,90 +236,510 @@ class DatabaseConfig:
         'autocommit': True
     }
     
+    # SQLite 后端配置
+    SQLITE_CONFIG = {
+        'path': os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'lawyer_assistant.db'),
+        'pragmas': {
+            'busy_timeout': 5000,          # 等待其他连接写锁的时间（毫秒）
+            'journal_mode': 'WAL',         # 读写互不阻塞，写入只追加到 WAL 文件
+            'synchronous': 'NORMAL',       # WAL 模式下只在检查点时 fsync，断电最多丢失最后的事务
+            'cache_size': -16384,          # 每个连接的页缓存（负数表示 KiB，即 16 MiB）
+            'temp_store': 'MEMORY',        # 排序、分组的临时数据放在内存中
+            'mmap_size': 268435456,        # 以内存映射方式读取数据库文件（256 MiB）
+            'foreign_keys': 'ON'
+        }
+    }
+    
+    # 连接池配置
+    POOL_CONFIG = {
+        'max_size': 10,                # 最大连接数
+        'acquire_timeout': 10,         # 借出连接的最长等待时间（秒）
+        'idle_timeout': 300,           # 空闲连接回收时间（秒）
+        'health_check_interval': 30    # 空闲超过该时间的连接借出前先检查（秒）
+    }
+    
+    # 查询统计配置
+    METRICS_CONFIG = {
+        'enabled': True,               # 是否统计每条语句的耗时
+        'slow_query_ms': 200,          # 超过该耗时（毫秒）的语句写入慢查询日志
+        'slow_query_log': os.path.join(os.path.dirname(os.path.abspath(__file__)), 'logs', 'slow_query.log'),
+        'max_bytes': 5 * 1024 * 1024,  # 慢查询日志单个文件大小上限，超过后轮转
+        'backup_count': 5,             # 保留的历史日志文件数
+        'log_params': False,           # 慢查询日志是否记录参数（可能包含敏感数据）
+        'summary_on_exit': False       # 程序退出时输出统计汇总
+    }
+    
+    BACKENDS = {
+        'mysql': MySQLBackend,
+        'sqlite': SQLiteBackend
+    }
+    
+    _backends = {}
+    _pools = {}  # 后端 -> 全局连接池
+    _pool_lock = threading.Lock()
+    
+    @staticmethod
+    def get_backend(name=None):
+        """获取数据库后端（默认为 BACKEND 配置的后端）"""
+        name = name or DatabaseConfig.BACKEND
+        with DatabaseConfig._pool_lock:
+            backend = DatabaseConfig._backends.get(name)
+            if backend is None:
+                backend = DatabaseConfig._backends[name] = DatabaseConfig.BACKENDS[name]()
+            return backend
+    
+    @staticmethod
+    def create_connection(backend=None):
+        """创建新的数据库连接（供连接池使用）"""
+        return (backend or DatabaseConfig.get_backend()).connect()
+    
+    @staticmethod
+    def get_pool(backend=None):
+        """获取后端的全局连接池"""
+        backend = backend or DatabaseConfig.get_backend()
+        with DatabaseConfig._pool_lock:
+            pool = DatabaseConfig._pools.get(backend)
+            if pool is None:
+                pool = DatabaseConfig._pools[backend] = ConnectionPool(backend.connect,
+                                                                       **DatabaseConfig.POOL_CONFIG)
+            return pool
+    
     @staticmethod
-    def get_connection():
-        """获取数据库连接"""
+    def close_pool(backend=None):
+        """关闭后端的全局连接池"""
+        backend = backend or DatabaseConfig.get_backend()
+        with DatabaseConfig._pool_lock:
+            pool = DatabaseConfig._pools.pop(backend, None)
+        if pool:
+            pool.close()
+    
+    @staticmethod
+    def get_connection(backend=None):
+        """从连接池获取数据库连接"""
         try:
-            connection = mysql.connector.connect(**DatabaseConfig.DB_CONFIG)
-            if connection.is_connected():
-                return connection
+            return DatabaseConfig.get_pool(backend).acquire()
         except Error as e:
             print(f"数据库连接错误: {e}")
             return None
     
     @staticmethod
-    def close_connection(connection):
-        """关闭数据库连接"""
-        if connection and connection.is_connected():
-            connection.close()
+    def close_connection(connection, discard=False, backend=None):
+        """将数据库连接归还连接池"""
+        if connection:
+            DatabaseConfig.get_pool(backend).release(connection, discard=discard)
+
+class UnitOfWork:
+    """一个工作单元：同一连接上的一个事务"""
+    
+    def __init__(self, connection):
+        self.connection = connection
+        self.rollback_only = False  # 为 True 时结束时回滚而不是提交
+    
+    def set_rollback_only(self):
+        self.rollback_only = True
+
+def _calling_method():
+    """查找发出语句的管理类方法（跳过 DatabaseManager 内部和 contextlib 的栈帧）"""
+    frame = sys._getframe(2)
+    while frame is not None:
+        code = frame.f_code
+        name = getattr(code, 'co_qualname', code.co_name)
+        if not (name.startswith(('DatabaseManager.', '_InstrumentedCursor.'))
+                or code.co_filename.endswith('contextlib.py')):
+            return name
+        frame = frame.f_back
+    return '<unknown>'
+
+class _InstrumentedCursor:
+    """记录事务中每条语句耗时的游标包装"""
+    
+    def __init__(self, cursor, db_manager):
+        self._cursor = cursor
+        self._db = db_manager
+    
+    def execute(self, query, params=None):
+        start = time.perf_counter()
+        try:
+            result = self._cursor.execute(query, params)
+        except Error as e:
+            self._db.record_query('execute', query, params, start, -1, e)
+            raise
+        self._db.record_query('execute', query, params, start, self._cursor.rowcount)
+        return result
+    
+    def executemany(self, query, seq_params):
+        start = time.perf_counter()
+        try:
+            result = self._cursor.executemany(query, seq_params)
+        except Error as e:
+            self._db.record_query('execute', query, None, start, -1, e)
+            raise
+        self._db.record_query('execute', query, None, start, self._cursor.rowcount)
+        return result
+    
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
 
 class DatabaseManager:
     """数据库管理类"""
     
-    def __init__(self):
-        self.connection = None
+    # 每个连接缓存的预处理游标数上限
+    PREPARED_CACHE_SIZE = 32
+    # iter_query 每次从服务器读取的行数
+    STREAM_BATCH_SIZE = 1000
+    
+    # 连接 -> {'connection_id': 服务器线程ID, 'cursors': OrderedDict(语句 -> 预处理游标)}
+    _prepared_cursors = weakref.WeakKeyDictionary()
+    _prepared_lock = threading.Lock()
+    # 列名元组 -> 行类型（namedtuple）
+    _row_types = {}
+    
+    def __init__(self, backend=None):
+        self.pool = None
+        # 数据库后端；管理类按 dialect 选择对应写法的语句
+        self.backend = backend or DatabaseConfig.get_backend()
+        self.dialect = self.backend.dialect
+        # 当前线程的工作单元（unit_of_work 块内）
+        self._local = threading.local()
+        # 查询钩子：每条语句执行后以 QueryEvent 调用
+        self.query_hooks = []
+        config = dict(DatabaseConfig.METRICS_CONFIG)
+        if config.pop('enabled'):
+            self.query_hooks.append(get_query_metrics(**config))
+    
+    def add_query_hook(self, hook):
+        """注册查询钩子 hook(QueryEvent)"""
+        self.query_hooks.append(hook)
+    
+    def remove_query_hook(self, hook):
+        if hook in self.query_hooks:
+            self.query_hooks.remove(hook)
+    
+    def record_query(self, kind, query, params, start, rows, error=None):
+        """把一条语句的执行结果交给查询钩子"""
+        if not self.query_hooks:
+            return
+        event = QueryEvent(kind, query, params, (time.perf_counter() - start) * 1000,
+                           rows, _calling_method(), error)
+        for hook in self.query_hooks:
+            try:
+                hook(event)
+            except Exception as e:
+                print(f"查询钩子执行错误: {e}")
     
     def connect(self):
-        """连接数据库"""
-        self.connection = DatabaseConfig.get_connection()
-        return self.connection is not None
+        """连接数据库（初始化连接池并验证连接可用）"""
+        self.pool = DatabaseConfig.get_pool(self.backend)
+        connection = DatabaseConfig.get_connection(self.backend)
+        if connection is None:
+            return False
+        DatabaseConfig.close_connection(connection, backend=self.backend)
+        return True
     
     def disconnect(self):
-        """断开数据库连接"""
-        if self.connection:
-            DatabaseConfig.close_connection(self.connection)
-            self.connection = None
+        """断开数据库连接（关闭连接池）"""
+        if self.pool:
+            DatabaseConfig.close_pool(self.backend)
+            self.pool = None
+    
+    def pool_stats(self):
+        """连接池统计信息（使用中、空闲、等待时间等）"""
+        return self.pool.stats() if self.pool else None
+    
+    @contextmanager
+    def checkout(self):
+        """从连接池借出连接，使用完毕后自动归还
+        
+        出现连接级错误时丢弃该连接；其他异常先回滚未完成的事务再归还。
+        """
+        if self.pool is None:
+            raise errors.InterfaceError(msg="数据库未连接")
+        connection = self.pool.acquire()
+        discard = False
+        try:
+            yield connection
+        except (errors.OperationalError, errors.InterfaceError):
+            discard = True
+            raise
+        except BaseException:
+            try:
+                connection.rollback()
+            except Error:
+                discard = True
+            raise
+        finally:
+            self.pool.release(connection, discard=discard)
+    
+    @contextmanager
+    def unit_of_work(self):
+        """工作单元：块内当前线程执行的所有语句（execute_* 和 transaction()）
+        共用一个连接和一个事务，正常结束时只提交一次
+        
+        块内抛出异常时整体回滚；管理类方法内部捕获了数据库错误（返回 None/-1）时，
+        工作单元被标记为只能回滚，退出时回滚并抛出 TransactionRollbackError。
+        嵌套使用时加入外层的工作单元。
+        """
+        unit = getattr(self._local, 'unit', None)
+        if unit is not None:
+            try:
+                yield unit
+            except BaseException:
+                unit.set_rollback_only()
+                raise
+            return
+        
+        with self.checkout() as connection:
+            connection.start_transaction()
+            unit = UnitOfWork(connection)
+            self._local.unit = unit
+            try:
+                yield unit
+            finally:
+                self._local.unit = None
+            if unit.rollback_only:
+                # 由 checkout 回滚后归还连接
+                raise TransactionRollbackError(msg="工作单元中有语句执行失败，已回滚")
+            connection.commit()
+    
+    @contextmanager
+    def _statement_connection(self):
+        """执行单条语句的连接：处于工作单元中时使用其连接（由工作单元提交），否则从连接池借出
+        
+        返回 (连接, 是否在工作单元中)。
+        """
+        unit = getattr(self._local, 'unit', None)
+        if unit is None:
+            with self.checkout() as connection:
+                yield connection, False
+            return
+        try:
+            yield unit.connection, True
+        except Error:
+            unit.set_rollback_only()
+            raise
+    
+    @contextmanager
+    def transaction(self):
+        """在同一连接上执行一组写操作，正常结束时统一提交，出错时整体回滚
+        
+        处于工作单元中时加入工作单元的事务，由工作单元统一提交。
+        """
+        unit = getattr(self._local, 'unit', None)
+        if unit is not None:
+            cursor = unit.connection.cursor()
+            try:
+                yield _InstrumentedCursor(cursor, self) if self.query_hooks else cursor
+            except BaseException:
+                unit.set_rollback_only()
+                raise
+            finally:
+                cursor.close()
+            return
+        
+        with self.checkout() as connection:
+            connection.start_transaction()
+            cursor = connection.cursor()
+            try:
+                yield _InstrumentedCursor(cursor, self) if self.query_hooks else cursor
+                connection.commit()
+            finally:
+                cursor.close()
     
     def execute_query(self, query, params=None):
         """执行查询语句"""
+        start = time.perf_counter()
         try:
-            cursor = self.connection.cursor(dictionary=True)
-            cursor.execute(query, params or ())
-            result = cursor.fetchall()
-            cursor.close()
+            with self._statement_connection() as (connection, _):
+                cursor = connection.cursor(dictionary=True)
+                cursor.execute(query, params or ())
+                result = cursor.fetchall()
+                cursor.close()
+            self.record_query('query', query, params, start, len(result))
             return result
         except Error as e:
+            self.record_query('query', query, params, start, -1, e)
             print(f"查询执行错误: {e}")
             return None
     
-    def execute_update(self, query, params=None):
-        """执行更新语句"""
+    def execute_prepared(self, query, params=None):
+        """用服务器端预处理语句执行查询，返回字典列表（与 execute_query 相同）
+        
+        同一连接上的预处理游标按语句缓存，再次执行时只发送参数。
+        mysql-connector 按对象判断是否为同一语句，query 必须传入同一个字符串对象
+        （例如类常量），每次拼接出的新字符串会重新预处理。
+        """
+        start = time.perf_counter()
+        try:
+            with self._statement_connection() as (connection, _):
+                cursor = self._prepared_cursor(connection, query)
+                try:
+                    cursor.execute(query, params or ())
+                    result = cursor.fetchall()
+                except Error:
+                    self._drop_prepared_cursors(connection)
+                    raise
+            self.record_query('prepared', query, params, start, len(result))
+            return result
+        except Error as e:
+            self.record_query('prepared', query, params, start, -1, e)
+            print(f"查询执行错误: {e}")
+            return None
+    
+    def _prepared_cursor(self, connection, query):
+        """获取连接上 query 对应的预处理游标（连接重连后服务器端语句失效，缓存一并清空）"""
+        connection_id = connection.connection_id
+        with self._prepared_lock:
+            entry = self._prepared_cursors.get(connection)
+            if entry is None or entry['connection_id'] != connection_id:
+                entry = {'connection_id': connection_id, 'cursors': OrderedDict()}
+                self._prepared_cursors[connection] = entry
+            cursors = entry['cursors']
+            cursor = cursors.get(query)
+            if cursor is not None:
+                cursors.move_to_end(query)
+                return cursor
+            cursor = connection.cursor(prepared=True, dictionary=True)
+            cursors[query] = cursor
+            if len(cursors) > self.PREPARED_CACHE_SIZE:
+                _, oldest = cursors.popitem(last=False)
+                try:
+                    oldest.close()
+                except Error:
+                    pass
+            return cursor
+    
+    def _drop_prepared_cursors(self, connection):
+        with self._prepared_lock:
+            self._prepared_cursors.pop(connection, None)
+    
+    def iter_query(self, query, params=None, batch_size=None):
+        """流式执行查询，逐行返回 namedtuple（字段名与列名相同）
+        
+        使用非缓冲游标，每次从服务器读取 batch_size 行，内存中只保留当前一批，
+        适合导出或扫描大量数据。迭代期间一直占用一个连接；
+        提前停止迭代时剩余结果无法读出，该连接会被丢弃而不是归还连接池。
+        """
+        if self.pool is None:
+            raise errors.InterfaceError(msg="数据库未连接")
+        batch_size = batch_size or self.STREAM_BATCH_SIZE
+        start = time.perf_counter()
+        rows = 0
+        finished = False
+        connection = self.pool.acquire()
         try:
-            cursor = self.connection.cursor()
+            cursor = connection.cursor(buffered=False)
             cursor.execute(query, params or ())
-            self.connection.commit()
-            affected_rows = cursor.rowcount
+            row_type = self._row_type(cursor.column_names)
+            while True:
+                batch = cursor.fetchmany(batch_size)
+                if not batch:
+                    break
+                rows += len(batch)
+                for row in batch:
+                    yield row_type._make(row)
             cursor.close()
+            finished = True
+            self.record_query('stream', query, params, start, rows)
+        except Error as e:
+            self.record_query('stream', query, params, start, rows, e)
+            raise
+        finally:
+            self.pool.release(connection, discard=not finished)
+    
+    @classmethod
+    def _row_type(cls, column_names):
+        row_type = cls._row_types.get(column_names)
+        if row_type is None:
+            row_type = cls._row_types[column_names] = namedtuple('Row', column_names, rename=True)
+        return row_type
+    
+    def execute_update(self, query, params=None):
+        """执行更新语句"""
+        start = time.perf_counter()
+        try:
+            with self._statement_connection() as (connection, in_unit):
+                cursor = connection.cursor()
+                cursor.execute(query, params or ())
+                if not in_unit:
+                    connection.commit()
+                affected_rows = cursor.rowcount
+                cursor.close()
+            self.record_query('update', query, params, start, affected_rows)
             return affected_rows
         except Error as e:
+            self.record_query('update', query, params, start, -1, e)
             print(f"更新执行错误: {e}")
-            self.connection.rollback()
             return -1
     
     def execute_insert(self, query, params=None):
         """执行插入语句，返回插入的ID"""
+        start = time.perf_counter()
         try:
-            cursor = self.connection.cursor()
-            cursor.execute(query, params or ())
-            self.connection.commit()
-            insert_id = cursor.lastrowid
-            cursor.close()
+            with self._statement_connection() as (connection, in_unit):
+                cursor = connection.cursor()
+                cursor.execute(query, params or ())
+                if not in_unit:
+                    connection.commit()
+                insert_id = cursor.lastrowid
+                affected_rows = cursor.rowcount
+                cursor.close()
+            self.record_query('insert', query, params, start, affected_rows)
             return insert_id
         except Error as e:
+            self.record_query('insert', query, params, start, -1, e)
             print(f"插入执行错误: {e}")
-            self.connection.rollback()
             return -1
 
 class UserManager:
     """用户管理类"""
     
+    # 会话验证结果的缓存时间（秒），在此期间内重复验证同一令牌不再查询数据库
+    SESSION_CACHE_TTL = 60
+    # 清理过期会话时每批删除的行数，以及批次之间的间隔（秒）
+    SESSION_REAP_BATCH_SIZE = 500
+    SESSION_REAP_PAUSE = 0.05
+    
+    # 会话验证查询（以预处理语句执行，须保持为同一个字符串对象）
+    VALIDATE_SESSION_QUERY = """
+        SELECT s.user_id, u.username, u.full_name, u.role, s.expires_at
+        FROM user_sessions s
+        JOIN users u ON s.user_id = u.id
+        WHERE s.session_token = %s AND s.expires_at > %s AND u.status = 'active'
+    """
+    
+    # 分批删除过期会话（SQLite 默认不支持 DELETE ... ORDER BY ... LIMIT，改为按主键子查询删除）
+    REAP_SESSIONS_QUERIES = {
+        'mysql': """
+            DELETE FROM user_sessions
+            WHERE expires_at < %s
+            ORDER BY expires_at
+            LIMIT %s
+        """,
+        'sqlite': """
+            DELETE FROM user_sessions
+            WHERE id IN (
+                SELECT id FROM user_sessions
+                WHERE expires_at < %s
+                ORDER BY expires_at
+                LIMIT %s
+            )
+        """
+    }
+    
+    # 会话缓存在进程内共享：令牌 -> (用户信息, 缓存截止时间, 会话过期时间)
+    _session_cache = {}
+    _session_cache_lock = threading.Lock()
+    
     def __init__(self, db_manager):
         self.db = db_manager
     
+    # 用户名不存在时也做一次同样成本的验证，避免通过响应时间判断用户是否存在
+    _dummy_password_hash = None
+    
     @staticmethod
     def hash_password(password):
-        """密码加密"""
-        return hashlib.sha256(password.encode()).hexdigest()
+        """密码加密（加盐的 PBKDF2/scrypt，参数见 password_hashing.HASH_CONFIG）"""
+        return password_hashing.hash_password(password)
     
     @staticmethod
     def generate_session_token():
@@ -110,21 +747,42 @@ class UserManager:
         return secrets.token_urlsafe(32)
     
     def authenticate_user(self, username, password):
-        """用户认证"""
-        hashed_password = self.hash_password(password)
+        """用户认证
+        
+        哈希计算较慢（约100毫秒），界面中应使用 authenticate_user_async。
+        验证通过且存储的哈希是旧算法或成本参数已变化时，自动按当前配置重新哈希。
+        """
         query = """
-            SELECT id, username, full_name, role, status 
+            SELECT id, username, full_name, role, status, password
             FROM users 
-            WHERE username = %s AND password = %s AND status = 'active'
+            WHERE username = %s AND status = 'active'
         """
-        result = self.db.execute_query(query, (username, hashed_password))
+        result = self.db.execute_query(query, (username,))
         
-        if result:
-            user = result[0]
-            # 更新最后登录时间
-            self.update_last_login(user['id'])
-            return user
-        return None
+        if not result:
+            if UserManager._dummy_password_hash is None:
+                UserManager._dummy_password_hash = self.hash_password(secrets.token_urlsafe(16))
+            password_hashing.verify_password(password, UserManager._dummy_password_hash)
+            return None
+        
+        user = result[0]
+        stored_hash = user.pop('password')
+        if not password_hashing.verify_password(password, stored_hash):
+            return None
+        if password_hashing.needs_rehash(stored_hash):
+            self.update_password_hash(user['id'], stored_hash, self.hash_password(password))
+        # 更新最后登录时间
+        self.update_last_login(user['id'])
+        return user
+    
+    def authenticate_user_async(self, username, password):
+        """在密码哈希线程池中执行认证，返回 Future"""
+        return password_hashing.hash_executor().submit(self.authenticate_user, username, password)
+    
+    def update_password_hash(self, user_id, old_hash, new_hash):
+        """替换密码哈希（仅当密码在此期间未被修改时）"""
+        query = "UPDATE users SET password = %s WHERE id = %s AND password = %s"
+        return self.db.execute_update(query, (new_hash, user_id, old_hash)) > 0
     
     def update_last_login(self, user_id):
         """更新最后登录时间"""
@@ -147,25 +805,124 @@ class UserManager:
         return None
     
     def validate_session(self, token):
-        """验证会话令牌"""
-        query = """
-            SELECT s.user_id, u.username, u.full_name, u.role
-            FROM user_sessions s
-            JOIN users u ON s.user_id = u.id
-            WHERE s.session_token = %s AND s.expires_at > %s AND u.status = 'active'
-        """
+        """验证会话令牌（验证通过的结果缓存 SESSION_CACHE_TTL 秒）"""
+        now = datetime.now()
+        with self._session_cache_lock:
+            cached = self._session_cache.get(token)
+            if cached:
+                user, cached_until, expires_at = cached
+                if time.monotonic() < cached_until and now < expires_at:
+                    return dict(user)
+                del self._session_cache[token]
         
-        result = self.db.execute_query(query, (token, datetime.now()))
-        return result[0] if result else None
+        result = self.db.execute_prepared(self.VALIDATE_SESSION_QUERY, (token, now))
+        if not result:
+            return None
+        user = result[0]
+        expires_at = user.pop('expires_at')
+        with self._session_cache_lock:
+            self._session_cache[token] = (dict(user), time.monotonic() + self.SESSION_CACHE_TTL, expires_at)
+        return user
     
     def logout_user(self, token):
         """用户登出"""
+        self.invalidate_session(token)
         query = "DELETE FROM user_sessions WHERE session_token = %s"
         return self.db.execute_update(query, (token,)) > 0
+    
+    def set_user_status(self, user_id, status):
+        """修改用户状态（停用的用户已缓存的会话立即失效）"""
+        query = "UPDATE users SET status = %s WHERE id = %s"
+        result = self.db.execute_update(query, (status, user_id))
+        self.invalidate_user_sessions(user_id)
+        return result > 0
+    
+    @classmethod
+    def invalidate_session(cls, token):
+        """移除一个令牌的缓存"""
+        with cls._session_cache_lock:
+            cls._session_cache.pop(token, None)
+    
+    @classmethod
+    def invalidate_user_sessions(cls, user_id):
+        """移除某个用户全部令牌的缓存"""
+        with cls._session_cache_lock:
+            for token in [token for token, (user, _, _) in cls._session_cache.items()
+                          if user['user_id'] == user_id]:
+                del cls._session_cache[token]
+    
+    def reap_expired_sessions(self, batch_size=None, max_batches=None):
+        """分批删除过期会话，返回删除的行数（出错返回 -1）
+        
+        每批按 expires_at 索引删除 batch_size 行并单独提交，
+        避免一次大删除长时间持有锁、阻塞登录时的会话写入。
+        """
+        batch_size = batch_size or self.SESSION_REAP_BATCH_SIZE
+        now = datetime.now()
+        with self._session_cache_lock:
+            for token in [token for token, (_, _, expires_at) in self._session_cache.items()
+                          if expires_at <= now]:
+                del self._session_cache[token]
+        
+        query = self.REAP_SESSIONS_QUERIES[self.db.dialect]
+        total = 0
+        batches = 0
+        while max_batches is None or batches < max_batches:
+            deleted = self.db.execute_update(query, (now, batch_size))
+            if deleted < 0:
+                return -1
+            total += deleted
+            batches += 1
+            if deleted < batch_size:
+                break
+            time.sleep(self.SESSION_REAP_PAUSE)
+        return total
 
 class CaseManager:
     """卷宗管理类"""
     
+    # 全文检索的最短关键词长度（与 MySQL ngram_token_size 一致）
+    FULLTEXT_MIN_LENGTH = 2
+    
+    # 以预处理语句执行的固定查询
+    CASE_BY_ID_QUERY = """
+        SELECT * FROM cases 
+        WHERE id = %s AND created_by = %s AND status = 'active'
+    """
+    
+    # 乐观并发更新：updated_at 至少前进一秒，保证同一秒内的两次保存也能区分（DATETIME 精度为秒）
+    UPDATE_CASE_CHECKED_QUERIES = {
+        'mysql': """
+            UPDATE cases 
+            SET case_name = %s, description = %s,
+                updated_at = GREATEST(%s, updated_at + INTERVAL 1 SECOND)
+            WHERE id = %s AND created_by = %s AND updated_at = %s
+        """,
+        'sqlite': """
+            UPDATE cases 
+            SET case_name = %s, description = %s,
+                updated_at = MAX(%s, datetime(updated_at, '+1 second'))
+            WHERE id = %s AND created_by = %s AND updated_at = %s
+        """
+    }
+    
+    # 按 case_directories 重新计算目录数量（SQLite 不支持 UPDATE ... JOIN，改用相关子查询）
+    RECONCILE_COUNTS_QUERIES = {
+        'mysql': """
+            UPDATE cases c
+            LEFT JOIN (
+                SELECT case_id, COUNT(*) AS n FROM case_directories GROUP BY case_id
+            ) cd ON cd.case_id = c.id
+            SET c.directory_count = COALESCE(cd.n, 0)
+            WHERE c.directory_count <> COALESCE(cd.n, 0) {case_filter}
+        """,
+        'sqlite': """
+            UPDATE cases AS c
+            SET directory_count = (SELECT COUNT(*) FROM case_directories cd WHERE cd.case_id = c.id)
+            WHERE c.directory_count <> (SELECT COUNT(*) FROM case_directories cd WHERE cd.case_id = c.id) {case_filter}
+        """
+    }
+    
     def __init__(self, db_manager):
         self.db = db_manager
     
@@ -187,32 +944,161 @@ class CaseManager:
                 c.description,
                 c.status,
                 c.created_at,
-                COUNT(cd.id) as directory_count
+                c.directory_count
             FROM cases c
-            LEFT JOIN case_directories cd ON c.id = cd.case_id
             WHERE c.created_by = %s AND c.status = 'active'
-            GROUP BY c.id
             ORDER BY c.updated_at DESC
         """
         return self.db.execute_query(query, (user_id,))
     
-    def get_case_by_id(self, case_id, user_id):
-        """根据ID获取卷宗信息"""
+    def get_user_cases_page(self, user_id, after=None, limit=200):
+        """按更新时间倒序分页获取用户卷宗（键集分页）
+        
+        after 为上一页最后一行的 (updated_at, id)，为 None 时返回第一页。
+        """
+        params = [user_id]
+        keyset = ""
+        if after:
+            updated_at, case_id = after
+            keyset = "AND (c.updated_at < %s OR (c.updated_at = %s AND c.id < %s))"
+            params.extend([updated_at, updated_at, case_id])
+        params.append(limit)
+        
+        query = f"""
+            SELECT 
+                c.id,
+                c.case_name,
+                c.case_number,
+                c.description,
+                c.status,
+                c.created_at,
+                c.updated_at,
+                c.directory_count
+            FROM cases c
+            WHERE c.created_by = %s AND c.status = 'active' {keyset}
+            ORDER BY c.updated_at DESC, c.id DESC
+            LIMIT %s
+        """
+        return self.db.execute_query(query, tuple(params))
+    
+    def get_user_cases_changed_since(self, user_id, since):
+        """获取某个时间之后有变化的卷宗（包含已删除的，用于增量刷新）"""
         query = """
-            SELECT * FROM cases 
-            WHERE id = %s AND created_by = %s AND status = 'active'
+            SELECT 
+                c.id,
+                c.case_name,
+                c.case_number,
+                c.description,
+                c.status,
+                c.created_at,
+                c.updated_at,
+                c.directory_count
+            FROM cases c
+            WHERE c.created_by = %s AND c.updated_at >= %s
+            ORDER BY c.updated_at DESC, c.id DESC
+        """
+        return self.db.execute_query(query, (user_id, since))
+    
+    def search_cases(self, user_id, keyword, limit=20, offset=0):
+        """检索卷宗：案号/名称前缀匹配优先，其次全文匹配名称、案号、描述和目录文件名称"""
+        keyword = keyword.strip()
+        if not keyword:
+            return []
+        prefix = escape_like(keyword) + '%'
+        escape = LIKE_ESCAPE[self.db.dialect]
+        
+        branches = [
+            f"SELECT id, 3 AS tier, 0 AS relevance FROM cases WHERE created_by = %s AND case_number LIKE %s{escape}",
+            f"SELECT id, 2 AS tier, 0 AS relevance FROM cases WHERE created_by = %s AND case_name LIKE %s{escape}",
+        ]
+        params = [user_id, prefix, user_id, prefix]
+        
+        if len(keyword) >= self.FULLTEXT_MIN_LENGTH and self.db.dialect == 'sqlite':
+            # SQLite 使用 FTS5 中的字符二元组（见 sqlite_schema.sql），bm25 越小越相关
+            phrase = sqlite_backend.fts_phrase(keyword)
+            branches.append("""
+                SELECT c.id, 1 AS tier, -bm25(cases_fts) AS relevance
+                FROM cases_fts
+                JOIN cases c ON c.id = cases_fts.rowid
+                WHERE cases_fts MATCH %s AND c.created_by = %s
+            """)
+            branches.append("""
+                SELECT cd.case_id AS id, 0 AS tier, -bm25(case_directories_fts) AS relevance
+                FROM case_directories_fts
+                JOIN case_directories cd ON cd.id = case_directories_fts.rowid
+                WHERE case_directories_fts MATCH %s
+            """)
+            params.extend([phrase, user_id, phrase])
+        elif len(keyword) >= self.FULLTEXT_MIN_LENGTH:
+            phrase = fulltext_phrase(keyword)
+            branches.append("""
+                SELECT id, 1 AS tier, MATCH(case_name, case_number, description) AGAINST (%s IN BOOLEAN MODE) AS relevance
+                FROM cases
+                WHERE MATCH(case_name, case_number, description) AGAINST (%s IN BOOLEAN MODE) AND created_by = %s
+            """)
+            branches.append("""
+                SELECT cd.case_id AS id, 0 AS tier, MATCH(cd.file_name) AGAINST (%s IN BOOLEAN MODE) AS relevance
+                FROM case_directories cd
+                WHERE MATCH(cd.file_name) AGAINST (%s IN BOOLEAN MODE)
+            """)
+            params.extend([phrase, phrase, user_id, phrase, phrase])
+        
+        union = " UNION ALL ".join(branches)
+        query = f"""
+            SELECT 
+                c.id,
+                c.case_name,
+                c.case_number,
+                c.description,
+                c.status,
+                c.created_at,
+                c.updated_at,
+                hits.tier,
+                hits.relevance
+            FROM (
+                SELECT id, MAX(tier) AS tier, MAX(relevance) AS relevance
+                FROM ({union}) matched
+                GROUP BY id
+            ) hits
+            JOIN cases c ON c.id = hits.id
+            WHERE c.created_by = %s AND c.status = 'active'
+            ORDER BY hits.tier DESC, hits.relevance DESC, c.updated_at DESC, c.id DESC
+            LIMIT %s OFFSET %s
         """
-        result = self.db.execute_query(query, (case_id, user_id))
+        params.extend([user_id, limit, offset])
+        return self.db.execute_query(query, tuple(params))
+    
+    def get_case_by_id(self, case_id, user_id):
+        """根据ID获取卷宗信息"""
+        result = self.db.execute_prepared(self.CASE_BY_ID_QUERY, (case_id, user_id))
         return result[0] if result else None
     
-    def update_case(self, case_id, case_name, description, user_id):
-        """更新卷宗信息"""
-        query = """
-            UPDATE cases 
-            SET case_name = %s, description = %s, updated_at = %s
-            WHERE id = %s AND created_by = %s
+    def update_case(self, case_id, case_name, description, user_id, expected_updated_at=None):
+        """更新卷宗信息
+        
+        给出 expected_updated_at（读取卷宗时的 updated_at）时做乐观并发检查：
+        卷宗在此期间已被修改则不更新，抛出 ConcurrentModificationError。
         """
-        return self.db.execute_update(query, (case_name, description, datetime.now(), case_id, user_id))
+        if expected_updated_at is None:
+            query = """
+                UPDATE cases 
+                SET case_name = %s, description = %s, updated_at = %s
+                WHERE id = %s AND created_by = %s
+            """
+            return self.db.execute_update(query, (case_name, description, datetime.now(), case_id, user_id))
+        
+        query = self.UPDATE_CASE_CHECKED_QUERIES[self.db.dialect]
+        affected_rows = self.db.execute_update(
+            query, (case_name, description, datetime.now(), case_id, user_id, expected_updated_at))
+        if affected_rows == 0:
+            raise ConcurrentModificationError(msg="卷宗已被其他用户修改，请重新打开后再保存")
+        return affected_rows
+    
+    def reconcile_directory_counts(self, case_id=None):
+        """按 case_directories 重新计算 directory_count，返回修正的卷宗数"""
+        case_filter = "AND c.id = %s" if case_id is not None else ""
+        query = self.RECONCILE_COUNTS_QUERIES[self.db.dialect].format(case_filter=case_filter)
+        return self.db.execute_update(query, (case_id,) if case_id is not None else None)
     
     def delete_case(self, case_id, user_id):
         """删除卷宗（软删除）"""
@@ -226,6 +1112,59 @@ class CaseManager:
 class DirectoryManager:
     """目录管理类"""
     
+    # 批量写入时每条多行 INSERT 包含的目录项数
+    BATCH_CHUNK_SIZE = 500
+    
+    # 以预处理语句执行的固定查询
+    CASE_DIRECTORIES_QUERY = """
+        SELECT 
+            id,
+            sequence_number,
+            file_name,
+            page_number,
+            end_page,
+            sort_order,
+            is_custom,
+            evidence_type
+        FROM case_directories
+        WHERE case_id = %s
+        ORDER BY sort_order, sequence_no, sequence_number
+    """
+    
+    EVIDENCE_TYPE_QUERY = """
+        SELECT id, sequence_number, file_name, page_number, end_page, sort_order
+        FROM case_directories
+        WHERE case_id = %s AND evidence_type = %s
+        ORDER BY sort_order
+    """
+    
+    # 在写入目录的事务中锁定读取的行；SQLite 的事务以 BEGIN IMMEDIATE 开始时已持有写锁
+    LOCK_CLAUSE = {
+        'mysql': "FOR UPDATE",
+        'sqlite': ""
+    }
+    
+    # 调整卷宗目录数量（SQLite 没有 GREATEST，用多参数的 MAX）
+    ADJUST_COUNT_QUERIES = {
+        'mysql': """
+            UPDATE cases
+            SET directory_count = GREATEST(CAST(directory_count AS SIGNED) + %s, 0),
+                updated_at = GREATEST(%s, updated_at)
+            WHERE id = %s
+        """,
+        'sqlite': """
+            UPDATE cases
+            SET directory_count = MAX(directory_count + %s, 0),
+                updated_at = MAX(%s, updated_at)
+            WHERE id = %s
+        """
+    }
+    
+    CLEAR_COUNT_QUERIES = {
+        'mysql': "UPDATE cases SET directory_count = 0, updated_at = GREATEST(%s, updated_at) WHERE id = %s",
+        'sqlite': "UPDATE cases SET directory_count = 0, updated_at = MAX(%s, updated_at) WHERE id = %s"
+    }
+    
     def __init__(self, db_manager):
         self.db = db_manager
     
@@ -235,24 +1174,152 @@ class DirectoryManager:
             INSERT INTO case_directories (case_id, sequence_number, file_name, page_number, end_page, sort_order, is_custom)
             VALUES (%s, %s, %s, %s, %s, %s, %s)
         """
-        return self.db.execute_insert(query, (case_id, sequence_number, file_name, page_number, end_page, sort_order, is_custom))
+        try:
+            with self.db.transaction() as cursor:
+                cursor.execute(query, (case_id, sequence_number, file_name, page_number, end_page, sort_order, is_custom))
+                insert_id = cursor.lastrowid
+                self._adjust_directory_count(cursor, case_id, 1)
+            return insert_id
+        except Error as e:
+            print(f"插入执行错误: {e}")
+            return -1
     
     def get_case_directories(self, case_id):
         """获取卷宗目录"""
+        return self.db.execute_prepared(self.CASE_DIRECTORIES_QUERY, (case_id,))
+    
+    def get_directory_index(self, case_id):
+        """卷宗目录的页码区间索引（按页码查找所在文书），查询失败时返回空索引"""
+        return DirectoryRangeIndex.from_directories(self.get_case_directories(case_id) or [],
+                                                    page_key='page_number')
+    
+    def get_directories_by_evidence_type(self, case_id, evidence_type):
+        """获取卷宗中某一证据类型的目录项（按 case_id + evidence_type 索引过滤）"""
+        return self.db.execute_prepared(self.EVIDENCE_TYPE_QUERY, (case_id, evidence_type))
+    
+    def get_evidence_type_counts(self, case_id):
+        """卷宗中各证据类型的目录项数量：{类型: 数量}（未分类的不计）"""
         query = """
-            SELECT 
-                id,
-                sequence_number,
-                file_name,
-                page_number,
-                end_page,
-                sort_order,
-                is_custom
+            SELECT evidence_type, COUNT(*) AS item_count
             FROM case_directories
-            WHERE case_id = %s
-            ORDER BY sort_order, CAST(sequence_number AS UNSIGNED), sequence_number
+            WHERE case_id = %s AND evidence_type IS NOT NULL
+            GROUP BY evidence_type
+        """
+        result = self.db.execute_query(query, (case_id,))
+        return {row['evidence_type']: row['item_count'] for row in result or []}
+    
+    def set_evidence_types(self, assignments, chunk_size=None):
+        """批量写入目录项的证据类型，assignments 为 [(目录项ID, 类型或 None)]"""
+        query = "UPDATE case_directories SET evidence_type = %s WHERE id = %s"
+        chunk_size = chunk_size or self.BATCH_CHUNK_SIZE
+        rows = [(evidence_type, item_id) for item_id, evidence_type in assignments]
+        try:
+            with self.db.transaction() as cursor:
+                for start in range(0, len(rows), chunk_size):
+                    cursor.executemany(query, rows[start:start + chunk_size])
+            return True
+        except Error as e:
+            print(f"更新证据类型错误: {e}")
+            return False
+    
+    def classify_case_directories(self, case_id, pages=None, classifier=None, only_unclassified=False):
+        """对卷宗已保存的目录项批量分类并写回数据库，返回分类的目录项数，失败时返回 -1
+        
+        pages 为PDF提取结果的页面列表；没有提供时只按文书名称分类。
+        only_unclassified 为 True 时保留已有的分类结果。
         """
-        return self.db.execute_query(query, (case_id,))
+        # 分类器依赖 NumPy，只在需要时导入
+        from evidence_classifier import get_classifier
+        
+        rows = self.get_case_directories(case_id)
+        if rows is None:
+            return -1
+        if only_unclassified:
+            rows = [row for row in rows if row['evidence_type'] is None]
+        directories = [{'title': row['file_name'], 'page': row['page_number'], 'end_page': row['end_page']}
+                       for row in rows]
+        classified = (classifier or get_classifier()).classify_directories(directories, pages)
+        assignments = [(row['id'], directory['evidence_type']) for row, directory in zip(rows, classified)]
+        return len(assignments) if self.set_evidence_types(assignments) else -1
+    
+    def iter_case_directories(self, case_id, batch_size=None):
+        """流式读取卷宗目录（逐行返回 namedtuple，用于导出或扫描目录很多的卷宗）"""
+        return self.db.iter_query(self.CASE_DIRECTORIES_QUERY, (case_id,), batch_size)
+    
+    def search_directories(self, user_id, keyword, case_id=None, limit=50, offset=0):
+        """按文件名称检索目录项，可限定在某个卷宗内"""
+        keyword = keyword.strip()
+        if not keyword:
+            return []
+        
+        case_filter = "AND cd.case_id = %s" if case_id is not None else ""
+        escape = LIKE_ESCAPE[self.db.dialect]
+        if len(keyword) >= CaseManager.FULLTEXT_MIN_LENGTH and self.db.dialect == 'sqlite':
+            # SQLite 使用 FTS5 中的字符二元组（见 sqlite_schema.sql）
+            query = f"""
+                SELECT 
+                    cd.id,
+                    cd.case_id,
+                    c.case_name,
+                    cd.sequence_number,
+                    cd.file_name,
+                    cd.page_number,
+                    cd.end_page,
+                    -bm25(case_directories_fts) AS relevance
+                FROM case_directories_fts
+                JOIN case_directories cd ON cd.id = case_directories_fts.rowid
+                JOIN cases c ON c.id = cd.case_id
+                WHERE case_directories_fts MATCH %s AND c.created_by = %s AND c.status = 'active' {case_filter}
+                ORDER BY relevance DESC, cd.case_id, cd.page_number
+                LIMIT %s OFFSET %s
+            """
+            params = [sqlite_backend.fts_phrase(keyword), user_id]
+        elif len(keyword) >= CaseManager.FULLTEXT_MIN_LENGTH:
+            phrase = fulltext_phrase(keyword)
+            match = "MATCH(cd.file_name) AGAINST (%s IN BOOLEAN MODE)"
+            query = f"""
+                SELECT 
+                    cd.id,
+                    cd.case_id,
+                    c.case_name,
+                    cd.sequence_number,
+                    cd.file_name,
+                    cd.page_number,
+                    cd.end_page,
+                    {match} AS relevance
+                FROM case_directories cd
+                JOIN cases c ON c.id = cd.case_id
+                WHERE {match} AND c.created_by = %s AND c.status = 'active' {case_filter}
+                ORDER BY relevance DESC, cd.case_id, cd.page_number
+                LIMIT %s OFFSET %s
+            """
+            params = [phrase, phrase, user_id]
+        elif case_id is not None:
+            # 单字关键词无法使用全文索引，只在指定卷宗内做前缀匹配，按目录顺序（idx_directories_case_order）返回
+            query = f"""
+                SELECT 
+                    cd.id,
+                    cd.case_id,
+                    c.case_name,
+                    cd.sequence_number,
+                    cd.file_name,
+                    cd.page_number,
+                    cd.end_page,
+                    0 AS relevance
+                FROM case_directories cd
+                JOIN cases c ON c.id = cd.case_id
+                WHERE cd.file_name LIKE %s{escape} AND c.created_by = %s AND c.status = 'active' {case_filter}
+                ORDER BY cd.sort_order
+                LIMIT %s OFFSET %s
+            """
+            params = [escape_like(keyword) + '%', user_id]
+        else:
+            return []
+        
+        if case_id is not None:
+            params.append(case_id)
+        params.extend([limit, offset])
+        return self.db.execute_query(query, tuple(params))
     
     def update_directory_item(self, item_id, sequence_number, file_name, page_number, sort_order, end_page=None):
         """更新目录项"""
@@ -265,40 +1332,235 @@ class DirectoryManager:
     
     def delete_directory_item(self, item_id):
         """删除目录项"""
-        query = "DELETE FROM case_directories WHERE id = %s"
-        return self.db.execute_update(query, (item_id,))
+        try:
+            with self.db.transaction() as cursor:
+                cursor.execute(f"SELECT case_id FROM case_directories WHERE id = %s {self.LOCK_CLAUSE[self.db.dialect]}",
+                               (item_id,))
+                row = cursor.fetchone()
+                if row is None:
+                    return 0
+                cursor.execute("DELETE FROM case_directories WHERE id = %s", (item_id,))
+                affected_rows = cursor.rowcount
+                self._adjust_directory_count(cursor, row[0], -affected_rows)
+            return affected_rows
+        except Error as e:
+            print(f"更新执行错误: {e}")
+            return -1
     
     def clear_case_directories(self, case_id):
         """清空卷宗目录"""
-        query = "DELETE FROM case_directories WHERE case_id = %s"
-        return self.db.execute_update(query, (case_id,))
+        try:
+            with self.db.transaction() as cursor:
+                cursor.execute("DELETE FROM case_directories WHERE case_id = %s", (case_id,))
+                affected_rows = cursor.rowcount
+                cursor.execute(self.CLEAR_COUNT_QUERIES[self.db.dialect], (datetime.now(), case_id))
+            return affected_rows
+        except Error as e:
+            print(f"更新执行错误: {e}")
+            return -1
     
-    def batch_insert_directories(self, case_id, directories):
-        """批量插入目录项"""
+    def batch_insert_directories(self, case_id, directories, chunk_size=None, total_pages=None):
+        """批量插入目录项（按 chunk_size 分块，每块一次多行 INSERT）
+        
+        缺少结束页的目录项按下一项的起始页和PDF总页数 total_pages 推算结束页。
+        """
         query = """
-            INSERT INTO case_directories (case_id, sequence_number, file_name, page_number, sort_order)
-            VALUES (%s, %s, %s, %s, %s)
+            INSERT INTO case_directories (case_id, sequence_number, file_name, page_number, end_page, sort_order, is_custom, evidence_type)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
         """
+        chunk_size = chunk_size or self.BATCH_CHUNK_SIZE
+        directories = infer_end_pages(directories, total_pages)
+        rows = [self._directory_params(case_id, i, directory) for i, directory in enumerate(directories)]
         
         try:
-            cursor = self.db.connection.cursor()
-            for i, directory in enumerate(directories):
-                params = (
-                    case_id,
-                    directory.get('number', str(i+1)),
-                    directory.get('title', ''),
-                    directory.get('page', 1),
-                    i
-                )
-                cursor.execute(query, params)
-            
-            self.db.connection.commit()
-            cursor.close()
+            with self.db.transaction() as cursor:
+                for start in range(0, len(rows), chunk_size):
+                    cursor.executemany(query, rows[start:start + chunk_size])
+                self._adjust_directory_count(cursor, case_id, len(rows))
             return True
         except Error as e:
             print(f"批量插入错误: {e}")
-            self.db.connection.rollback()
             return False
+    
+    def replace_case_directories(self, case_id, directories, chunk_size=None, total_pages=None):
+        """用新的目录列表替换卷宗目录（只写入差异部分）
+        
+        以（目录序号, 文件名称）匹配已有目录项：内容未变的保留，变化的更新，
+        多出的插入，不再存在的删除，全部在一个事务内完成。
+        缺少结束页的目录项与 batch_insert_directories 一样推算结束页。
+        返回各类变更的数量，失败时返回 None。
+        """
+        select_query = f"""
+            SELECT id, sequence_number, file_name, page_number, end_page, sort_order, is_custom, evidence_type
+            FROM case_directories
+            WHERE case_id = %s
+            {self.LOCK_CLAUSE[self.db.dialect]}
+        """
+        insert_query = """
+            INSERT INTO case_directories (case_id, sequence_number, file_name, page_number, end_page, sort_order, is_custom, evidence_type)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+        """
+        update_query = """
+            UPDATE case_directories
+            SET page_number = %s, end_page = %s, sort_order = %s, is_custom = %s, evidence_type = %s, updated_at = %s
+            WHERE id = %s
+        """
+        chunk_size = chunk_size or self.BATCH_CHUNK_SIZE
+        directories = infer_end_pages(directories, total_pages)
+        
+        try:
+            with self.db.transaction() as cursor:
+                cursor.execute(select_query, (case_id,))
+                existing = {}
+                for item_id, sequence_number, file_name, page_number, end_page, sort_order, is_custom, evidence_type in cursor.fetchall():
+                    existing.setdefault((sequence_number, file_name), []).append(
+                        (item_id, (page_number, end_page, sort_order, bool(is_custom), evidence_type)))
+                
+                inserts = []
+                updates = []
+                unchanged = 0
+                now = datetime.now()
+                for i, directory in enumerate(directories):
+                    params = self._directory_params(case_id, i, directory)
+                    _, sequence_number, file_name, page_number, end_page, sort_order, is_custom, evidence_type = params
+                    candidates = existing.get((sequence_number, file_name))
+                    if not candidates:
+                        inserts.append(params)
+                        continue
+                    item_id, old_values = candidates.pop(0)
+                    new_values = (page_number, end_page, sort_order, bool(is_custom), evidence_type)
+                    if old_values == new_values:
+                        unchanged += 1
+                    else:
+                        updates.append(new_values + (now, item_id))
+                
+                deletes = [item_id for candidates in existing.values() for item_id, _ in candidates]
+                for start in range(0, len(deletes), chunk_size):
+                    chunk = deletes[start:start + chunk_size]
+                    placeholders = ", ".join(["%s"] * len(chunk))
+                    cursor.execute(f"DELETE FROM case_directories WHERE id IN ({placeholders})", chunk)
+                if updates:
+                    cursor.executemany(update_query, updates)
+                for start in range(0, len(inserts), chunk_size):
+                    cursor.executemany(insert_query, inserts[start:start + chunk_size])
+                if inserts or deletes:
+                    self._adjust_directory_count(cursor, case_id, len(inserts) - len(deletes))
+            
+            return {
+                'inserted': len(inserts),
+                'updated': len(updates),
+                'deleted': len(deletes),
+                'unchanged': unchanged
+            }
+        except Error as e:
+            print(f"替换目录错误: {e}")
+            return None
+    
+    def _adjust_directory_count(self, cursor, case_id, delta):
+        """在当前事务中调整卷宗的目录项数量"""
+        cursor.execute(self.ADJUST_COUNT_QUERIES[self.db.dialect], (delta, datetime.now(), case_id))
+    
+    @staticmethod
+    def _directory_params(case_id, index, directory):
+        """将提取到的目录字典转换为 case_directories 的插入参数"""
+        return (
+            case_id,
+            str(directory.get('number', index + 1)),
+            directory.get('title', ''),
+            directory.get('page', 1),
+            directory.get('end_page'),
+            directory.get('sort_order', index),
+            bool(directory.get('is_custom', False)),
+            directory.get('evidence_type')
+        )
+
+class CaseFileManager:
+    """卷宗PDF文件管理（内容相同的文件只登记一次，可被多个卷宗引用）"""
+    
+    CASE_FILES_QUERY = """
+        SELECT 
+            cf.id,
+            cf.file_id,
+            cf.original_name,
+            cf.sort_order,
+            f.sha256,
+            f.size_bytes,
+            f.page_count,
+            f.storage_path
+        FROM case_files cf
+        JOIN pdf_files f ON f.id = cf.file_id
+        WHERE cf.case_id = %s
+        ORDER BY cf.sort_order, cf.id
+    """
+    
+    # 把文件加入卷宗，已加入时只更新文件名和顺序
+    ATTACH_FILE_QUERIES = {
+        'mysql': """
+            INSERT INTO case_files (case_id, file_id, original_name, sort_order, created_at)
+            VALUES (%s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE original_name = VALUES(original_name), sort_order = VALUES(sort_order)
+        """,
+        'sqlite': """
+            INSERT INTO case_files (case_id, file_id, original_name, sort_order, created_at)
+            VALUES (%s, %s, %s, %s, %s)
+            ON CONFLICT (case_id, file_id) DO UPDATE SET original_name = excluded.original_name, sort_order = excluded.sort_order
+        """
+    }
+    
+    def __init__(self, db_manager):
+        self.db = db_manager
+    
+    def register_file(self, sha256, size_bytes, page_count, storage_path):
+        """登记文件内容，已登记过相同内容时返回已有的文件ID，失败时返回 -1"""
+        params = (sha256, size_bytes, page_count, storage_path, datetime.now())
+        if self.db.dialect == 'sqlite':
+            # SQLite 没有 LAST_INSERT_ID(expr)，内容已登记时不插入，再按哈希查出ID
+            query = """
+                INSERT INTO pdf_files (sha256, size_bytes, page_count, storage_path, created_at)
+                VALUES (%s, %s, %s, %s, %s)
+                ON CONFLICT (sha256) DO NOTHING
+            """
+            if self.db.execute_update(query, params) < 0:
+                return -1
+            existing = self.find_file(sha256)
+            return existing['id'] if existing else -1
+        query = """
+            INSERT INTO pdf_files (sha256, size_bytes, page_count, storage_path, created_at)
+            VALUES (%s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE id = LAST_INSERT_ID(id)
+        """
+        return self.db.execute_insert(query, params)
+    
+    def find_file(self, sha256):
+        """按内容哈希查找已登记的文件"""
+        query = """
+            SELECT id, sha256, size_bytes, page_count, storage_path
+            FROM pdf_files
+            WHERE sha256 = %s
+        """
+        result = self.db.execute_query(query, (sha256,))
+        return result[0] if result else None
+    
+    def attach_file(self, case_id, file_id, original_name, sort_order=0):
+        """把文件加入卷宗（已加入时只更新文件名和顺序）"""
+        query = self.ATTACH_FILE_QUERIES[self.db.dialect]
+        return self.db.execute_update(query, (case_id, file_id, original_name, sort_order, datetime.now())) >= 0
+    
+    def detach_file(self, case_id, file_id):
+        """从卷宗中移除文件（文件内容仍保留，可能被其他卷宗引用）"""
+        query = "DELETE FROM case_files WHERE case_id = %s AND file_id = %s"
+        return self.db.execute_update(query, (case_id, file_id)) > 0
+    
+    def get_case_files(self, case_id):
+        """获取卷宗的文件列表（含页数和存储位置）"""
+        return self.db.execute_query(self.CASE_FILES_QUERY, (case_id,))
+    
+    def next_sort_order(self, case_id):
+        """卷宗中下一个文件的排序号"""
+        result = self.db.execute_query(
+            "SELECT COALESCE(MAX(sort_order) + 1, 0) AS next_order FROM case_files WHERE case_id = %s",
+            (case_id,))
+        return int(result[0]['next_order']) if result else 0
 
 # 使用示例
 if __name__ == "__main__":
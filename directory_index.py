@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+目录页码区间
+- infer_end_pages: 按起始页排序后，用下一项的起始页和PDF总页数推算每个目录项的结束页
+- DirectoryRangeIndex: 目录项页码区间的内存索引（有序数组 + 二分查找），
+  浏览PDF时按页码 O(log n) 找到当前所在的文书
+"""
+
+from bisect import bisect_left, bisect_right
+
+
+def infer_end_pages(directories, total_pages=None):
+    """返回补全了 end_page 的目录列表副本（保持原有顺序）
+
+    已有 end_page（且不小于起始页）的目录项保持不变；其余目录项的结束页为
+    下一个起始页更大的目录项的起始页减一，与下一项起始于同一页时结束页就是起始页。
+    最后一个文书结束于 total_pages，未知总页数时保持为空。
+    """
+    result = [dict(directory) for directory in directories]
+    ordered = sorted((d for d in result if isinstance(d.get('page'), int) and d['page'] > 0),
+                     key=lambda d: d['page'])
+
+    next_start = None
+    for directory in reversed(ordered):
+        start = directory['page']
+        end_page = directory.get('end_page')
+        if not (isinstance(end_page, int) and end_page >= start):
+            if next_start is not None:
+                directory['end_page'] = max(start, next_start - 1)
+            elif total_pages and total_pages >= start:
+                directory['end_page'] = total_pages
+            else:
+                directory['end_page'] = None
+        if next_start is None or start < next_start:
+            next_start = start
+    return result
+
+
+class DirectoryRangeIndex:
+    """目录项页码区间索引
+
+    区间按起始页排序保存在并行数组中，find(页码) 用二分查找定位，
+    不在任何区间内（目录之前的封面页、区间之间的空隙）时返回 None。
+    区间可以重叠（例如手工设置了结束页的多页文书中嵌套一页的目录项），
+    max_ends 为结束页的前缀最大值，用于判断更早开始的区间是否覆盖该页。
+    """
+
+    def __init__(self, ranges):
+        """ranges: 可迭代的 (起始页, 结束页, 目录项)，结束页为 None 表示延续到下一项之前"""
+        ranges = sorted(ranges, key=lambda entry: entry[0])
+        self.starts = [start for start, _, _ in ranges]
+        self.items = [item for _, _, item in ranges]
+        self.ends = []
+        for i, (start, end, _) in enumerate(ranges):
+            if end is None:
+                end = self.starts[i + 1] - 1 if i + 1 < len(ranges) else float('inf')
+            self.ends.append(max(start, end))
+        self.max_ends = []
+        for end in self.ends:
+            self.max_ends.append(max(end, self.max_ends[-1]) if self.max_ends else end)
+
+    @classmethod
+    def from_directories(cls, directories, page_key='page', end_key='end_page'):
+        """从目录字典构建（DirectoryManager 查询到的行使用 page_key='page_number'）"""
+        return cls((directory[page_key], directory.get(end_key), directory)
+                   for directory in directories
+                   if isinstance(directory.get(page_key), int) and directory[page_key] > 0)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def find_position(self, page_number):
+        """页码所在目录项在有序数组中的位置，找不到时返回 -1
+
+        多个目录项起始于同一页时返回其中最后一项（前面的项通常只占这一页）；
+        多个区间覆盖该页时返回起始页最大的一项（最内层的文书）。
+        """
+        i = bisect_right(self.starts, page_number) - 1
+        if i < 0:
+            return -1
+        if self.ends[i] >= page_number:
+            return i
+        # 起始页最近的区间已经结束：前缀最大值中第一个不小于页码的位置是最早覆盖该页的区间，
+        # 没有时该页不在任何区间内；有时从 i 向前找最近的覆盖区间（只经过嵌套在其中的目录项）
+        first = bisect_left(self.max_ends, page_number, 0, i)
+        if first >= i:
+            return -1
+        while self.ends[i] < page_number:
+            i -= 1
+        return i
+
+    def find(self, page_number):
+        """页码所在的目录项，找不到时返回 None"""
+        i = self.find_position(page_number)
+        return self.items[i] if i >= 0 else None
@@ -14,8 +14,18 @@ import pdfplumber
 import fitz  # PyMuPDF
 from PIL import Image, ImageTk
 import io
-from database_config import DatabaseManager, CaseManager, DirectoryManager
-from database_config_enhanced import EnhancedCaseManager, PDFFileManager, EnhancedDirectoryManager
+import queue
+import threading
+from bisect import bisect_right
+from database_config import DatabaseManager, CaseManager, DirectoryManager, ConcurrentModificationError, Error
+from pdf_extraction import get_extraction_engine
+from page_cache import PageRenderCache
+from extraction_cache import ExtractionCache
+from pdf_renderer import TiledPageRenderer
+from file_import import FileImporter, ImportCancelled
+from directory_index import DirectoryRangeIndex, infer_end_pages
+from evidence_classifier import get_classifier
+from passage_index import PassageIndex
 
 class ToolTip:
     """创建工具提示框"""
@@ -67,20 +77,34 @@ class EditCasePage:
         self.case_manager = CaseManager(db_manager)
         self.directory_manager = DirectoryManager(db_manager)
         
-        # PDF缓存字典
-        self.pdf_cache = {}
+        # PDF页面渲染缓存（按字节预算LRU淘汰，后台预取相邻页）
+        self.page_cache = PageRenderCache()
         
         self.current_pdf_file_id = None  # 当前加载的PDF文件ID
         self.is_loading = False  # 加载状态标志
-        self.pdf_cache = {}  # PDF预加载缓存
-        self.pdf_images = []  # 初始化PDF图像引用列表
+        self.extraction_job = None  # 后台PDF提取任务
+        self.extraction_cache = ExtractionCache()  # 按内容哈希持久化的提取结果缓存
+        self.file_importer = FileImporter(db_manager, extraction_cache=self.extraction_cache)
+        self.import_cancel = threading.Event()  # 关闭窗口时取消正在进行的导入
+        self.import_queue = None  # 后台导入线程发回的进度和结果
+        self.classify_queue = None  # 后台证据类型分类线程发回的结果
+        self.page_count = None  # 当前PDF的总页数
+        self.current_pdf_path = None  # 当前提取完成的PDF路径
+        self.page_start_lines = []  # 文本区中每页起始的行号（升序），与 page_numbers 对应
+        self.page_numbers = []
+        self.directory_index = DirectoryRangeIndex([])  # 目录项页码区间索引
+        self.view_page = None  # 文本区顶部当前显示的页码
+        self.toc_saved = False  # 目录表格与数据库一致时为 True，证据类型筛选直接查询数据库
+        self.extraction_result = None  # 最近一次提取结果，卷宗保存后加入段落检索索引
+        self.passage_index = None  # 卷宗问答使用的段落检索索引（按需打开）
         
         # 创建编辑窗口
         self.create_edit_window()
         
-        # 如果有卷宗数据，加载它
+        # 如果有卷宗数据，从数据库读取最新内容并加载（卷宗列表中的数据可能已过期）
         if self.case_data:
-            self.load_case_data()
+            self.case_data = self.case_manager.get_case_by_id(self.case_data['id'], self.current_user['id']) or self.case_data
+            self.reload_case()
         
     def create_edit_window(self):
         """创建编辑窗口"""
@@ -256,7 +280,7 @@ class EditCasePage:
                                   relief=tk.FLAT, bd=0,
                                   padx=15, pady=5,
                                   cursor='hand2',
-                                  command=self.save_case_info_to_database)
+                                  command=self.save_case)
         save_case_btn.pack(side=tk.RIGHT, padx=(0, 10))
         
         # 上部分：文件列表区域
@@ -397,13 +421,23 @@ class EditCasePage:
                                           bg='#ffffff', fg='#666666')
         self.current_file_label.pack(anchor='w', pady=(0, 10))
         
+        # 文本 / 页面预览切换
+        self.view_toggle_btn = tk.Button(upper_frame, text="🖼 页面预览",
+                                        command=self.toggle_page_view,
+                                        bg='#f8f9fa', fg='#333333',
+                                        font=('Microsoft YaHei', 9),
+                                        relief=tk.FLAT, bd=0,
+                                        padx=10, pady=2,
+                                        cursor='hand2')
+        self.view_toggle_btn.place(relx=1.0, y=0, anchor='ne')
+        
         # 文档显示容器
         doc_container = tk.Frame(upper_frame, bg='#ffffff')
         doc_container.pack(fill=tk.BOTH, expand=True)
         
         # 添加滚动条
-        doc_scrollbar = tk.Scrollbar(doc_container, orient=tk.VERTICAL)
-        doc_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.doc_scrollbar = tk.Scrollbar(doc_container, orient=tk.VERTICAL)
+        self.doc_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         
         # 文档显示区域
         self.doc_display = tk.Text(doc_container,
@@ -411,11 +445,21 @@ class EditCasePage:
                                   bg='#fafafa', fg='#333333',
                                   relief=tk.FLAT, bd=1,
                                   wrap=tk.WORD,
-                                  yscrollcommand=doc_scrollbar.set)
+                                  yscrollcommand=self.on_doc_scroll)
         self.doc_display.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         
         # 配置滚动条
-        doc_scrollbar.config(command=self.doc_display.yview)
+        self.doc_scrollbar.config(command=self.doc_display.yview)
+        
+        # 页面预览区域（渐进式分块渲染，切换到页面预览时替换文本区）
+        self.page_canvas = tk.Canvas(doc_container, bg='#e9ecef', highlightthickness=0)
+        self.page_renderer = TiledPageRenderer(self.page_canvas, cache=self.page_cache,
+                                               scrollbar=self.doc_scrollbar)
+        self.page_canvas.bind('<MouseWheel>',
+                              lambda event: self.page_canvas.yview_scroll(int(-1*(event.delta/120)), "units"))
+        self.page_canvas.bind('<Prior>', lambda event: self.page_renderer.next_page(-1))
+        self.page_canvas.bind('<Next>', lambda event: self.page_renderer.next_page(1))
+        self.page_view_active = False
         
         # 分隔线
         separator = tk.Frame(display_frame, bg='#dee2e6', height=2)
@@ -455,4 +499,515 @@ class EditCasePage:
         
         # 设置列宽
         self.toc_tree.column('序号', width=80, anchor='center')
-        self.toc_tree.column('名称', width=200, anchor='w')
\ No newline at end of file
+        self.toc_tree.column('名称', width=200, anchor='w')
+        
+        # 点击起始页跳转到对应页面
+        self.toc_tree.bind('<ButtonRelease-1>', self.on_toc_click, add='+')
+    
+    def create_chat_panel(self, parent):
+        """创建卷宗问答区域：按问题检索卷宗段落，点击引用跳转到原文页面"""
+        chat_frame = tk.Frame(parent, bg='#ffffff', relief=tk.RAISED, bd=2)
+        chat_frame.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        
+        chat_title = tk.Label(chat_frame, text="💬 卷宗问答",
+                             font=('Microsoft YaHei', 12, 'bold'),
+                             bg='#ffffff', fg='#333333')
+        chat_title.pack(anchor='w', padx=10, pady=(10, 5))
+        
+        # 输入区域
+        input_frame = tk.Frame(chat_frame, bg='#ffffff')
+        input_frame.pack(side=tk.BOTTOM, fill=tk.X, padx=10, pady=(5, 10))
+        
+        self.chat_entry = tk.Entry(input_frame, font=('Microsoft YaHei', 10),
+                                  relief=tk.SOLID, bd=1)
+        self.chat_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, ipady=4)
+        self.chat_entry.bind('<Return>', lambda event: self.ask_question())
+        
+        send_btn = tk.Button(input_frame, text="发送",
+                            command=self.ask_question,
+                            bg='#007bff', fg='white',
+                            font=('Microsoft YaHei', 10),
+                            relief=tk.FLAT, bd=0,
+                            padx=15, pady=3,
+                            cursor='hand2')
+        send_btn.pack(side=tk.RIGHT, padx=(5, 0))
+        
+        # 问答记录
+        self.chat_display = scrolledtext.ScrolledText(chat_frame,
+                                                      font=('Microsoft YaHei', 10),
+                                                      bg='#fafafa', fg='#333333',
+                                                      relief=tk.FLAT, bd=1,
+                                                      wrap=tk.WORD,
+                                                      state=tk.DISABLED)
+        self.chat_display.pack(fill=tk.BOTH, expand=True, padx=10)
+        self.chat_display.tag_configure('question', foreground='#007bff',
+                                        font=('Microsoft YaHei', 10, 'bold'))
+        self.chat_display.tag_configure('citation', foreground='#28a745', underline=True)
+        self.chat_display.tag_configure('hint', foreground='#999999')
+        self.chat_citations = 0  # 已插入的引用数，用作引用标签的序号
+    
+    def ask_question(self):
+        """检索与问题最相关的卷宗段落并显示引用"""
+        question = self.chat_entry.get().strip()
+        if not question:
+            return
+        self.chat_entry.delete(0, tk.END)
+        
+        self.chat_display.config(state=tk.NORMAL)
+        self.chat_display.insert(tk.END, f"问：{question}\n", 'question')
+        index = self.get_passage_index()
+        results = index.search(question, k=5) if index is not None else []
+        if index is None:
+            self.chat_display.insert(tk.END, "请先保存卷宗并添加PDF文件\n\n", 'hint')
+        elif not results:
+            self.chat_display.insert(tk.END, "卷宗中没有找到相关内容\n\n", 'hint')
+        for result in results:
+            # 每条引用一个标签，点击时跳转到对应文件的对应页
+            tag = f"citation{self.chat_citations}"
+            self.chat_citations += 1
+            self.chat_display.insert(tk.END, f"[{result['label']} 第{result['page']}页]", ('citation', tag))
+            self.chat_display.insert(tk.END, f" {result['text']}\n\n")
+            self.chat_display.tag_bind(tag, '<Button-1>',
+                                       lambda event, r=result: self.show_pdf_page(r['page'], path=r['path'],
+                                                                                  file_id=r['key']))
+            self.chat_display.tag_bind(tag, '<Enter>', lambda event: self.chat_display.config(cursor='hand2'))
+            self.chat_display.tag_bind(tag, '<Leave>', lambda event: self.chat_display.config(cursor=''))
+        self.chat_display.config(state=tk.DISABLED)
+        self.chat_display.see(tk.END)
+    
+    def get_passage_index(self):
+        """当前卷宗的段落检索索引，卷宗尚未保存时返回 None"""
+        if not self.case_data:
+            return None
+        if self.passage_index is None:
+            try:
+                self.passage_index = PassageIndex(self.case_data['id'])
+            except (OSError, ValueError) as e:
+                print(f"打开段落检索索引失败: {e}")
+                return None
+        return self.passage_index
+    
+    def index_extraction_result(self):
+        """在后台线程中把最近一次提取的文本加入段落检索索引（同一文件只索引一次）"""
+        result = self.extraction_result
+        index = self.get_passage_index()
+        if result is None or index is None:
+            return
+        key = result.get('sha256') or os.path.abspath(result['path'])
+        if index.has_document(key):
+            return
+        
+        def run():
+            try:
+                index.add_document(key, result['pages'], label=os.path.basename(result['path']),
+                                   path=result['path'])
+            except (OSError, ValueError) as e:
+                print(f"建立段落检索索引失败: {e}")
+        
+        threading.Thread(target=run, name='passage-index', daemon=True).start()
+    
+    def start_pdf_extraction(self, pdf_path):
+        """在后台进程池中提取PDF文本和目录，不阻塞界面"""
+        self.cancel_pdf_extraction()
+        
+        self.is_loading = True
+        self.current_file_label.config(text=f"正在提取: {os.path.basename(pdf_path)}")
+        self.doc_display.delete('1.0', tk.END)
+        self.page_start_lines = []
+        self.page_numbers = []
+        for item in self.toc_tree.get_children():
+            self.toc_tree.delete(item)
+        
+        try:
+            self.extraction_job = get_extraction_engine().extract(
+                pdf_path, self.window,
+                on_progress=self.on_extraction_progress,
+                on_toc=self.on_extraction_toc,
+                on_done=self.on_extraction_done,
+                on_error=self.on_extraction_error,
+                cache=self.extraction_cache)
+        except Exception as e:
+            self.on_extraction_error(e)
+    
+    def cancel_pdf_extraction(self):
+        """取消正在进行的PDF提取（进行中的证据类型分类结果也一并丢弃）"""
+        if self.extraction_job:
+            self.extraction_job.cancel()
+            self.extraction_job = None
+        self.classify_queue = None
+        self.is_loading = False
+    
+    def on_extraction_progress(self, pages_done, page_count):
+        """提取进度回调（Tk主线程）"""
+        name = os.path.basename(self.extraction_job.pdf_path)
+        self.current_file_label.config(text=f"正在提取: {name}  {pages_done}/{page_count} 页")
+    
+    def on_extraction_toc(self, rows):
+        """部分目录结果回调，先行显示已识别的目录行，返回插入的表格行"""
+        items = []
+        for row in rows:
+            # 证据类型作为表格行的标签，未保存的目录也可以按类型筛选
+            tags = (row['evidence_type'],) if row.get('evidence_type') else ()
+            items.append(self.toc_tree.insert('', tk.END, values=(row['number'], row['title'], row['page'], row.get('end_page') or ''),
+                                              tags=tags))
+        self.toc_saved = False
+        return items
+    
+    def on_extraction_done(self, result):
+        """提取完成回调，按页码顺序显示文本和目录"""
+        self.is_loading = False
+        self.extraction_job = None
+        self.current_file_label.config(
+            text=f"{os.path.basename(result['path'])}  共 {result['page_count']} 页")
+        
+        self.page_count = result['page_count']
+        self.current_pdf_path = result['path']
+        
+        self.doc_display.delete('1.0', tk.END)
+        self.page_start_lines = []
+        self.page_numbers = []
+        for page in result['pages']:
+            self.page_start_lines.append(int(self.doc_display.index('end-1c').split('.')[0]))
+            self.page_numbers.append(page['page'])
+            self.doc_display.insert(tk.END, f"—— 第 {page['page']} 页 ——\n{page['text']}\n")
+        
+        for item in self.toc_tree.get_children():
+            self.toc_tree.delete(item)
+        # 推算结束页后先显示目录，证据类型在后台按页码区间的正文批量分类，保存时一并写入数据库
+        toc = infer_end_pages(result['toc'], self.page_count)
+        items = self.on_extraction_toc(toc)
+        self.rebuild_directory_index()
+        self.classify_toc(items, toc, result['pages'])
+        
+        # 新增文件的文本加入卷宗问答的段落检索索引
+        self.extraction_result = result
+        self.index_extraction_result()
+    
+    def classify_toc(self, items, toc, pages):
+        """在后台线程中为目录分类证据类型（首次使用时还要构建分类器），完成后给对应的表格行加上标签"""
+        # 后台线程只使用局部变量中的队列：开始新的提取或关闭窗口时 self.classify_queue 被置为 None
+        classify_queue = self.classify_queue = queue.SimpleQueue()
+        
+        def run():
+            try:
+                classify_queue.put(get_classifier().classify_directories(toc, pages))
+            except Exception as e:
+                print(f"证据类型分类失败: {e}")
+                classify_queue.put(None)
+        
+        threading.Thread(target=run, name='evidence-classify', daemon=True).start()
+        self.window.after(100, self.poll_classify, classify_queue, items)
+    
+    def poll_classify(self, classify_queue, items):
+        """等待后台分类结果（已开始新的提取时丢弃）"""
+        if self.classify_queue is not classify_queue:
+            return
+        try:
+            rows = classify_queue.get_nowait()
+        except queue.Empty:
+            self.window.after(100, self.poll_classify, classify_queue, items)
+            return
+        self.classify_queue = None
+        if rows is None:
+            return
+        for item, row in zip(items, rows):
+            # 分类期间被删除的目录行跳过
+            if row['evidence_type'] and self.toc_tree.exists(item):
+                self.toc_tree.item(item, tags=(row['evidence_type'],))
+        self.toc_saved = False
+    
+    def upload_files(self):
+        """选择PDF文件，在后台线程中流式导入到卷宗（中断后再次导入同一批文件会从断点继续）"""
+        if not self.case_data:
+            messagebox.showinfo("提示", "请先保存卷宗信息，再添加PDF文件", parent=self.window)
+            return
+        if self.import_queue is not None:
+            messagebox.showinfo("提示", "正在导入文件，请稍候", parent=self.window)
+            return
+        paths = filedialog.askopenfilenames(parent=self.window, title="选择卷宗PDF文件",
+                                            filetypes=[("PDF文件", "*.pdf"), ("所有文件", "*.*")])
+        if not paths:
+            return
+        
+        case_id = self.case_data['id']
+        self.import_cancel.clear()
+        # 后台线程只使用局部变量中的队列：关闭窗口时 self.import_queue 被置为 None
+        import_queue = self.import_queue = queue.SimpleQueue()
+        
+        def progress(index, count, done, total):
+            import_queue.put(('progress', index, count, done, total))
+        
+        def run():
+            try:
+                results = self.file_importer.import_files(case_id, list(paths), progress, self.import_cancel)
+                import_queue.put(('done', results))
+            except ImportCancelled:
+                import_queue.put(('cancelled',))
+            except Exception as e:
+                import_queue.put(('error', e))
+        
+        threading.Thread(target=run, name='file-import', daemon=True).start()
+        self.window.after(100, self.poll_import)
+    
+    def poll_import(self):
+        """处理后台导入的进度消息（只显示最新的进度）"""
+        if self.import_queue is None:
+            return
+        latest = None
+        while True:
+            try:
+                message = self.import_queue.get_nowait()
+            except queue.Empty:
+                break
+            if message[0] != 'progress':
+                self.import_queue = None
+                self.on_import_finished(message)
+                return
+            latest = message
+        if latest:
+            _, index, count, done, total = latest
+            percent = done * 100 // total if total else 100
+            self.current_file_label.config(text=f"正在导入第 {index + 1}/{count} 个文件  {percent}%")
+        self.window.after(100, self.poll_import)
+    
+    def on_import_finished(self, message):
+        """导入结束：汇总结果，并提取第一个导入成功的文件"""
+        if message[0] == 'cancelled':
+            return
+        if message[0] == 'error':
+            self.current_file_label.config(text="导入失败")
+            messagebox.showerror("错误", f"导入PDF文件失败: {message[1]}", parent=self.window)
+            return
+        
+        results = message[1]
+        imported = [r for r in results if 'error' not in r]
+        failed = [r for r in results if 'error' in r]
+        duplicates = sum(1 for r in imported if r['duplicate'])
+        summary = f"已导入 {len(imported)} 个文件，共 {sum(r['page_count'] for r in imported)} 页"
+        if duplicates:
+            summary += f"（其中 {duplicates} 个与已有文件内容相同，未重复存储）"
+        if failed:
+            summary += "\n\n导入失败：\n" + "\n".join(f"{os.path.basename(r['path'])}: {r['error']}" for r in failed)
+        self.current_file_label.config(text=f"已导入 {len(imported)} 个文件")
+        messagebox.showinfo("导入完成", summary, parent=self.window)
+        if imported:
+            self.select_pdf_file(imported[0]['file_id'])
+            self.start_pdf_extraction(imported[0]['storage_path'])
+    
+    def show_pdf_page(self, page_number, path=None, file_id=None):
+        """切换到页面预览并显示某一页（先显示低分辨率预览，再逐块清晰化）
+        
+        默认显示当前PDF，问答引用的页面可能来自卷宗中的其他文件，通过 path 指定。
+        """
+        path = path or self.current_pdf_path
+        if not path or not os.path.exists(path):
+            return
+        if not self.page_view_active:
+            self.doc_display.pack_forget()
+            self.page_canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+            self.doc_scrollbar.config(command=self.page_canvas.yview)
+            self.view_toggle_btn.config(text="📄 文本")
+            self.page_view_active = True
+        if path != self.current_pdf_path:
+            file_id = file_id or path
+        else:
+            file_id = self.current_pdf_file_id
+        self.page_renderer.show_page(path, page_number, zoom=1.5, file_id=file_id)
+        self.page_canvas.yview_moveto(0)
+        self.page_canvas.focus_set()
+    
+    def show_text_view(self):
+        """切换回文本显示"""
+        if not self.page_view_active:
+            return
+        self.page_canvas.pack_forget()
+        self.doc_display.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.doc_scrollbar.config(command=self.doc_display.yview)
+        self.view_toggle_btn.config(text="🖼 页面预览")
+        self.page_view_active = False
+    
+    def toggle_page_view(self):
+        """在文本和页面预览之间切换，预览从文本区当前所在页开始"""
+        if self.page_view_active:
+            self.show_text_view()
+        else:
+            self.show_pdf_page(self.view_page or 1)
+    
+    def on_toc_click(self, event):
+        """点击目录表格的起始页列时跳转到该页"""
+        if self.toc_tree.identify_column(event.x) != '#3':
+            return
+        item = self.toc_tree.identify_row(event.y)
+        if not item:
+            return
+        page = self.toc_tree.item(item, 'values')[2]
+        if str(page).isdigit():
+            self.show_pdf_page(int(page))
+    
+    def on_evidence_type_click(self, evidence_type):
+        """在目录表格中选中某一证据类型的全部文书
+        
+        目录已保存时按 (case_id, evidence_type) 索引查询数据库，
+        否则使用表格行上的证据类型标签。
+        """
+        children = self.toc_tree.get_children()
+        if self.toc_saved and self.case_data:
+            rows = self.directory_manager.get_directories_by_evidence_type(self.case_data['id'], evidence_type) or []
+            # 保存时 sort_order 就是表格中的行号
+            items = [children[row['sort_order']] for row in rows if 0 <= row['sort_order'] < len(children)]
+        else:
+            items = list(self.toc_tree.tag_has(evidence_type))
+        
+        self.toc_tree.selection_set(items)
+        if not items:
+            self.current_file_label.config(text=f"没有分类为「{evidence_type}」的文书")
+            return
+        self.toc_tree.see(items[0])
+        self.current_file_label.config(text=f"{evidence_type}：{len(items)} 份文书")
+        if self.page_view_active:
+            page = self.toc_tree.item(items[0], 'values')[2]
+            if str(page).isdigit():
+                self.show_pdf_page(int(page))
+    
+    def rebuild_directory_index(self):
+        """目录表格变化后重建页码区间索引"""
+        self.directory_index = DirectoryRangeIndex.from_directories(self.collect_directories())
+        self.view_page = None
+    
+    def on_doc_scroll(self, first, last):
+        """文本区滚动：更新滚动条，并在目录表格中选中当前页所在的文书"""
+        self.doc_scrollbar.set(first, last)
+        if not self.page_start_lines:
+            return
+        line = int(self.doc_display.index('@0,0').split('.')[0])
+        i = bisect_right(self.page_start_lines, line) - 1
+        page_number = self.page_numbers[max(i, 0)]
+        if page_number == self.view_page:
+            return
+        self.view_page = page_number
+        
+        directory = self.directory_index.find(page_number)
+        if directory is None:
+            return
+        children = self.toc_tree.get_children()
+        if directory['sort_order'] < len(children):
+            item = children[directory['sort_order']]
+            self.toc_tree.selection_set(item)
+            self.toc_tree.see(item)
+    
+    def on_extraction_error(self, error):
+        """提取失败回调"""
+        self.is_loading = False
+        self.extraction_job = None
+        self.current_file_label.config(text="PDF提取失败")
+        messagebox.showerror("错误", f"PDF提取失败: {error}", parent=self.window)
+    
+    def select_pdf_file(self, file_id):
+        """切换当前PDF文件"""
+        self.current_pdf_file_id = file_id
+    
+    def collect_directories(self):
+        """从目录表格收集目录项"""
+        directories = []
+        for sort_order, item in enumerate(self.toc_tree.get_children()):
+            number, title, page, end_page = self.toc_tree.item(item, 'values')
+            directories.append({
+                'number': str(number),
+                'title': title,
+                'page': int(page) if str(page).isdigit() else 0,
+                'end_page': int(end_page) if str(end_page).isdigit() else None,
+                'sort_order': sort_order,
+                'evidence_type': next(iter(self.toc_tree.item(item, 'tags')), None)
+            })
+        return directories
+    
+    def save_case(self):
+        """保存卷宗：卷宗信息和目录在同一个事务中写入，任何一步失败整体回滚"""
+        case_name = self.case_name_entry.get().strip()
+        case_number = self.case_number_entry.get().strip()
+        description = self.case_desc_text.get('1.0', tk.END).strip()
+        if not case_name or not case_number:
+            messagebox.showerror("错误", "请输入案件编号和卷宗名称！", parent=self.window)
+            return
+        
+        directories = self.collect_directories()
+        user_id = self.current_user['id']
+        try:
+            with self.db_manager.unit_of_work():
+                if self.case_data:
+                    case_id = self.case_data['id']
+                    # 乐观并发：卷宗在打开之后被其他用户保存过时拒绝覆盖
+                    self.case_manager.update_case(case_id, case_name, description, user_id,
+                                                  expected_updated_at=self.case_data['updated_at'])
+                else:
+                    case_id = self.case_manager.create_case(case_name, case_number, description, user_id)
+                    if case_id <= 0:
+                        raise Error(msg="创建卷宗失败")
+                self.directory_manager.replace_case_directories(case_id, directories,
+                                                                total_pages=self.page_count)
+        except ConcurrentModificationError as e:
+            self.on_save_conflict(e)
+            return
+        except Error as e:
+            print(f"保存卷宗失败: {e}")
+            messagebox.showerror("错误", "保存卷宗失败，所有修改均未写入！", parent=self.window)
+            return
+        
+        # 重新读取卷宗，记录新的 updated_at 供下一次保存做并发检查
+        self.case_data = self.case_manager.get_case_by_id(case_id, user_id) or self.case_data
+        self.toc_saved = True
+        self.window.title("编辑卷宗")
+        # 新建的卷宗保存后才有ID，此时再为已提取的文件建立检索索引
+        self.index_extraction_result()
+        messagebox.showinfo("成功", "卷宗已保存！", parent=self.window)
+    
+    def on_save_conflict(self, error):
+        """保存冲突：重新读取卷宗，由用户选择以本次修改覆盖或载入最新内容"""
+        latest = self.case_manager.get_case_by_id(self.case_data['id'], self.current_user['id'])
+        if latest is None:
+            messagebox.showwarning("保存冲突", "卷宗已被删除，无法保存", parent=self.window)
+            return
+        # 记录最新的 updated_at，之后的保存以此做并发检查
+        self.case_data = latest
+        overwrite = messagebox.askyesno(
+            "保存冲突",
+            f"{error.msg}\n\n选择\"是\"以本次修改覆盖，选择\"否\"放弃本次修改并载入最新内容。",
+            parent=self.window)
+        if overwrite:
+            self.save_case()
+        else:
+            self.reload_case()
+    
+    def reload_case(self):
+        """用数据库中的卷宗信息和目录替换编辑中的内容"""
+        self.case_name_entry.delete(0, tk.END)
+        self.case_name_entry.insert(0, self.case_data['case_name'])
+        self.case_number_entry.delete(0, tk.END)
+        self.case_number_entry.insert(0, self.case_data['case_number'])
+        self.case_desc_text.delete('1.0', tk.END)
+        self.case_desc_text.insert('1.0', self.case_data.get('description') or '')
+        
+        for item in self.toc_tree.get_children():
+            self.toc_tree.delete(item)
+        rows = self.directory_manager.get_case_directories(self.case_data['id']) or []
+        self.on_extraction_toc([{
+            'number': row['sequence_number'],
+            'title': row['file_name'],
+            'page': row['page_number'],
+            'end_page': row['end_page'],
+            'evidence_type': row['evidence_type']
+        } for row in rows])
+        self.rebuild_directory_index()
+        self.toc_saved = True
+    
+    def on_closing(self):
+        """关闭窗口，先取消后台任务"""
+        self.import_cancel.set()
+        self.import_queue = None
+        self.cancel_pdf_extraction()
+        self.extraction_cache.close()
+        self.page_renderer.close()
+        self.page_cache.close()
+        if self.passage_index is not None:
+            self.passage_index.close()
+        self.window.destroy()
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+PDF提取结果持久化缓存
+以文件内容的SHA-256和提取器版本为键，把逐页文本、页面尺寸和识别出的目录行
+保存在程序目录下的SQLite文件中。再次打开相同内容的PDF时直接读取缓存，
+不再重新解析。缓存总大小超过上限时按最近访问时间淘汰。
+"""
+
+import os
+import sqlite3
+import threading
+import time
+
+from pdf_extraction import EXTRACTOR_VERSION
+
+# 默认缓存文件位置（程序目录下的 cache 文件夹）
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                  'cache', 'extraction_cache.sqlite3')
+
+# 默认缓存上限（字节，按文本和目录数据估算）
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+# 每页和每条目录行的固定开销估算（字节）
+PAGE_OVERHEAD = 64
+TOC_ROW_OVERHEAD = 48
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS documents (
+        cache_key TEXT PRIMARY KEY,
+        sha256 TEXT NOT NULL,
+        extractor_version INTEGER NOT NULL,
+        page_count INTEGER NOT NULL,
+        size_bytes INTEGER NOT NULL,
+        last_access REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_documents_last_access ON documents (last_access);
+    CREATE TABLE IF NOT EXISTS pages (
+        cache_key TEXT NOT NULL,
+        page INTEGER NOT NULL,
+        width REAL,
+        height REAL,
+        text TEXT,
+        PRIMARY KEY (cache_key, page)
+    ) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS toc_rows (
+        cache_key TEXT NOT NULL,
+        idx INTEGER NOT NULL,
+        number TEXT,
+        title TEXT,
+        page INTEGER,
+        source_page INTEGER,
+        PRIMARY KEY (cache_key, idx)
+    ) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS file_hashes (
+        path TEXT PRIMARY KEY,
+        size INTEGER NOT NULL,
+        mtime_ns INTEGER NOT NULL,
+        sha256 TEXT NOT NULL
+    );
+"""
+
+
+class ExtractionCache:
+    """基于内容哈希的PDF提取结果缓存（线程安全）"""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES,
+                 extractor_version=EXTRACTOR_VERSION):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.extractor_version = extractor_version
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    def cache_key(self, sha256):
+        return f"{sha256}:{self.extractor_version}"
+
+    def lookup_path(self, pdf_path):
+        """按文件路径查找缓存，只比较文件大小和修改时间，不计算哈希
+
+        文件发生变化时清除旧内容对应的缓存并返回 None。
+        """
+        try:
+            stat = os.stat(pdf_path)
+        except OSError:
+            return None
+        path = os.path.abspath(pdf_path)
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT size, mtime_ns, sha256 FROM file_hashes WHERE path = ?", (path,)).fetchone()
+            if row is None:
+                return None
+            size, mtime_ns, sha256 = row
+            if size != stat.st_size or mtime_ns != stat.st_mtime_ns:
+                # 文件已被修改，旧内容的缓存作废
+                with self._conn:
+                    self._conn.execute("DELETE FROM file_hashes WHERE path = ?", (path,))
+                    self._invalidate_locked(sha256)
+                return None
+        return self.load(sha256, pdf_path)
+
+    def load(self, sha256, pdf_path=None):
+        """按内容哈希读取缓存的提取结果，未命中返回 None"""
+        key = self.cache_key(sha256)
+        with self._lock:
+            document = self._conn.execute(
+                "SELECT page_count FROM documents WHERE cache_key = ?", (key,)).fetchone()
+            if document is None:
+                return None
+            pages = [
+                {'page': page, 'width': width, 'height': height, 'text': text}
+                for page, width, height, text in self._conn.execute(
+                    "SELECT page, width, height, text FROM pages WHERE cache_key = ? ORDER BY page", (key,))
+            ]
+            toc = [
+                {'number': number, 'title': title, 'page': page, 'source_page': source_page}
+                for number, title, page, source_page in self._conn.execute(
+                    "SELECT number, title, page, source_page FROM toc_rows WHERE cache_key = ? ORDER BY idx", (key,))
+            ]
+            with self._conn:
+                self._conn.execute("UPDATE documents SET last_access = ? WHERE cache_key = ?",
+                                   (time.time(), key))
+
+        return {
+            'path': pdf_path,
+            'sha256': sha256,
+            'page_count': document[0],
+            'pages': pages,
+            'toc': toc
+        }
+
+    def store(self, pdf_path, sha256, result):
+        """保存提取结果，并记录文件路径与内容哈希的对应关系"""
+        key = self.cache_key(sha256)
+        size_bytes = (
+            sum(len((page['text'] or '').encode('utf-8')) + PAGE_OVERHEAD for page in result['pages'])
+            + sum(len(row['title'].encode('utf-8')) + TOC_ROW_OVERHEAD for row in result['toc'])
+        )
+
+        with self._lock, self._conn:
+            self._record_path_locked(pdf_path, sha256)
+            self._delete_document_locked(key)
+            self._conn.execute(
+                "INSERT INTO documents (cache_key, sha256, extractor_version, page_count, size_bytes, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, sha256, self.extractor_version, result['page_count'], size_bytes, time.time()))
+            self._conn.executemany(
+                "INSERT INTO pages (cache_key, page, width, height, text) VALUES (?, ?, ?, ?, ?)",
+                [(key, page['page'], page['width'], page['height'], page['text']) for page in result['pages']])
+            self._conn.executemany(
+                "INSERT INTO toc_rows (cache_key, idx, number, title, page, source_page) VALUES (?, ?, ?, ?, ?, ?)",
+                [(key, i, row['number'], row['title'], row['page'], row.get('source_page'))
+                 for i, row in enumerate(result['toc'])])
+            self._evict_locked()
+
+    def remember_path(self, pdf_path, sha256):
+        """记录文件路径对应的内容哈希（相同内容的文件换了位置时使用）"""
+        with self._lock, self._conn:
+            self._record_path_locked(pdf_path, sha256)
+
+    def _record_path_locked(self, pdf_path, sha256):
+        try:
+            stat = os.stat(pdf_path)
+        except OSError:
+            return
+        self._conn.execute(
+            "INSERT OR REPLACE INTO file_hashes (path, size, mtime_ns, sha256) VALUES (?, ?, ?, ?)",
+            (os.path.abspath(pdf_path), stat.st_size, stat.st_mtime_ns, sha256))
+
+    def _invalidate_locked(self, sha256):
+        """删除某个内容哈希的全部缓存（仍有其他路径指向该内容时保留）"""
+        in_use = self._conn.execute(
+            "SELECT 1 FROM file_hashes WHERE sha256 = ? LIMIT 1", (sha256,)).fetchone()
+        if in_use:
+            return
+        for (key,) in self._conn.execute(
+                "SELECT cache_key FROM documents WHERE sha256 = ?", (sha256,)).fetchall():
+            self._delete_document_locked(key)
+
+    def _delete_document_locked(self, key):
+        self._conn.execute("DELETE FROM pages WHERE cache_key = ?", (key,))
+        self._conn.execute("DELETE FROM toc_rows WHERE cache_key = ?", (key,))
+        self._conn.execute("DELETE FROM documents WHERE cache_key = ?", (key,))
+
+    def _evict_locked(self):
+        """缓存超过上限时，按最近访问时间淘汰最旧的文档"""
+        total = self._conn.execute("SELECT COALESCE(SUM(size_bytes), 0) FROM documents").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size_bytes in self._conn.execute(
+                "SELECT cache_key, size_bytes FROM documents ORDER BY last_access").fetchall():
+            self._delete_document_locked(key)
+            total -= size_bytes
+            if total <= self.max_bytes:
+                break
+        self._conn.execute(
+            "DELETE FROM file_hashes WHERE sha256 NOT IN (SELECT sha256 FROM documents)")
+
+    def stats(self):
+        """缓存统计信息"""
+        with self._lock:
+            documents, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM documents").fetchone()
+        return {'documents': documents, 'bytes': total, 'max_bytes': self.max_bytes}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
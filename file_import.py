@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+卷宗PDF文件导入
+把选中的PDF流式复制到程序管理的存储目录，复制的同时计算SHA-256：
+
+- 只使用一块固定大小的缓冲区（IMPORT_CONFIG['buffer_bytes']），不整文件读入内存，
+  内存占用与文件大小和文件数量无关
+- 存储按内容哈希命名（storage/objects/ab/<sha256>.pdf），内容相同的文件
+  无论来自哪个卷宗都只保存一份，数据库中 pdf_files 也只登记一次
+- 每个文件登记页数，通过 case_files 加入卷宗
+- 每个卷宗一份导入日志（storage/journal/case_<id>.jsonl），中断后重新导入同一批文件时：
+  已完成的文件直接跳过，复制到一半的文件先校验已复制的部分再从断点继续
+"""
+
+import hashlib
+import json
+import os
+import threading
+
+import fitz  # PyMuPDF
+
+from database_config import CaseFileManager, Error
+
+IMPORT_CONFIG = {
+    # 存储目录（objects: 按内容保存的文件，incoming: 复制中的文件，journal: 导入日志）
+    'storage_root': os.path.join(os.path.dirname(os.path.abspath(__file__)), 'storage'),
+    # 复制和计算哈希使用的缓冲区大小，也就是导入过程的内存上限
+    'buffer_bytes': 4 * 1024 * 1024,
+}
+
+
+class ImportCancelled(Exception):
+    """导入被取消"""
+
+
+def source_key(path, size, mtime_ns):
+    """源文件的标识（路径 + 大小 + 修改时间），用于断点续传和日志匹配"""
+    return hashlib.sha1(f"{os.path.abspath(path)}|{size}|{mtime_ns}".encode('utf-8')).hexdigest()
+
+
+def count_pages(path):
+    """读取PDF页数（只解析交叉引用表和页面树，不加载页面内容）"""
+    with fitz.open(path, filetype='pdf') as doc:
+        return doc.page_count
+
+
+class ImportJournal:
+    """按卷宗记录导入进度的追加式日志（JSON Lines）"""
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}  # 源文件标识 -> 最新记录
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # 中断时可能留下不完整的最后一行
+                        continue
+                    self.entries[entry['key']] = entry
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    def record(self, key, **fields):
+        """追加一条记录（与该文件之前的记录合并），写入后立即落盘"""
+        entry = {**self.entries.get(key, {}), **fields, 'key': key}
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        self.entries[key] = entry
+        return entry
+
+
+class FileImporter:
+    """把PDF文件导入卷宗（import_files 可在后台线程中调用）"""
+
+    def __init__(self, db_manager, storage_root=None, buffer_bytes=None, extraction_cache=None):
+        self.db = db_manager
+        self.file_manager = CaseFileManager(db_manager)
+        self.storage_root = storage_root or IMPORT_CONFIG['storage_root']
+        self.buffer_bytes = buffer_bytes or IMPORT_CONFIG['buffer_bytes']
+        # 可选的 ExtractionCache：登记存储文件的哈希，之后提取时不必重新计算
+        self.extraction_cache = extraction_cache
+
+        self.objects_dir = os.path.join(self.storage_root, 'objects')
+        self.incoming_dir = os.path.join(self.storage_root, 'incoming')
+        self.journal_dir = os.path.join(self.storage_root, 'journal')
+        for directory in (self.objects_dir, self.incoming_dir, self.journal_dir):
+            os.makedirs(directory, exist_ok=True)
+
+        # 整个导入过程复用的唯一缓冲区
+        self._buffer = bytearray(self.buffer_bytes)
+        self._lock = threading.Lock()
+
+    def object_path(self, sha256):
+        """内容哈希对应的存储位置"""
+        return os.path.join(self.objects_dir, sha256[:2], f"{sha256}.pdf")
+
+    def import_files(self, case_id, paths, progress=None, cancel_event=None):
+        """导入一批文件到卷宗，返回每个文件的结果字典
+
+        成功: {'path', 'file_id', 'sha256', 'size', 'page_count', 'storage_path', 'duplicate', 'resumed'}
+        失败: {'path', 'error'}
+        progress(文件序号, 文件数, 已复制字节, 文件字节数) 在调用线程中回调。
+        取消时抛出 ImportCancelled，已导入的文件保留，复制到一半的文件下次继续。
+        """
+        with self._lock:
+            journal = ImportJournal(os.path.join(self.journal_dir, f"case_{case_id}.jsonl"))
+            sort_order = self.file_manager.next_sort_order(case_id)
+            results = []
+            for index, path in enumerate(paths):
+                try:
+                    result = self._import_one(case_id, path, sort_order, journal, cancel_event,
+                                              lambda done, total: progress and progress(index, len(paths), done, total))
+                    sort_order += 1
+                except ImportCancelled:
+                    raise
+                except (OSError, RuntimeError, ValueError, Error) as e:
+                    print(f"导入文件失败 {path}: {e}")
+                    result = {'path': path, 'error': str(e)}
+                results.append(result)
+            return results
+
+    def _import_one(self, case_id, path, sort_order, journal, cancel_event, progress):
+        stat = os.stat(path)
+        key = source_key(path, stat.st_size, stat.st_mtime_ns)
+        entry = journal.get(key)
+        if entry and entry['state'] == 'attached' and os.path.exists(entry['storage_path']):
+            progress(stat.st_size, stat.st_size)
+            return self._result(path, entry, duplicate=entry['duplicate'], resumed=True)
+
+        if entry and entry['state'] == 'stored' and os.path.exists(entry['storage_path']):
+            # 上次已复制完成，只差登记
+            resumed = True
+        else:
+            sha256, size, page_count, duplicate, resumed = self._store(path, key, stat.st_size,
+                                                                       cancel_event, progress)
+            entry = journal.record(key, state='stored', source=os.path.abspath(path), sha256=sha256,
+                                   size=size, page_count=page_count,
+                                   storage_path=self.object_path(sha256), duplicate=duplicate)
+
+        file_id = self._register(case_id, path, entry, sort_order)
+        entry = journal.record(key, state='attached', file_id=file_id)
+        if self.extraction_cache is not None:
+            self.extraction_cache.remember_path(entry['storage_path'], entry['sha256'])
+        return self._result(path, entry, duplicate=entry['duplicate'], resumed=resumed)
+
+    def _store(self, path, key, size, cancel_event, progress):
+        """流式复制到 incoming 并计算哈希，完成后按内容哈希移入 objects
+
+        返回 (sha256, 字节数, 页数, 是否与已有文件内容相同, 是否从断点继续)。
+        """
+        part_path = os.path.join(self.incoming_dir, f"{key}.part")
+        digest = hashlib.sha256()
+        view = memoryview(self._buffer)
+        copied = 0
+        resumed = False
+
+        # 断点续传：已复制的部分重新计算哈希（同样只用固定缓冲区）
+        if os.path.exists(part_path):
+            if os.path.getsize(part_path) <= size:
+                with open(part_path, 'rb') as part:
+                    while True:
+                        n = part.readinto(self._buffer)
+                        if not n:
+                            break
+                        digest.update(view[:n])
+                        copied += n
+                resumed = copied > 0
+            else:
+                os.remove(part_path)
+
+        with open(path, 'rb') as source, open(part_path, 'ab') as target:
+            source.seek(copied)
+            while True:
+                if cancel_event is not None and cancel_event.is_set():
+                    raise ImportCancelled()
+                n = source.readinto(self._buffer)
+                if not n:
+                    break
+                digest.update(view[:n])
+                target.write(view[:n])
+                copied += n
+                progress(copied, size)
+            target.flush()
+            os.fsync(target.fileno())
+
+        sha256 = digest.hexdigest()
+        try:
+            # 先确认是可以打开的PDF再放入存储
+            page_count = count_pages(part_path)
+        except RuntimeError:
+            os.remove(part_path)
+            raise
+        object_path = self.object_path(sha256)
+        if os.path.exists(object_path) and os.path.getsize(object_path) == copied:
+            os.remove(part_path)
+            return sha256, copied, page_count, True, resumed
+        os.makedirs(os.path.dirname(object_path), exist_ok=True)
+        os.replace(part_path, object_path)
+        return sha256, copied, page_count, False, resumed
+
+    def _register(self, case_id, path, entry, sort_order):
+        """在同一个事务中登记文件内容并加入卷宗"""
+        with self.db.unit_of_work():
+            file_id = self.file_manager.register_file(entry['sha256'], entry['size'], entry['page_count'],
+                                                      os.path.relpath(entry['storage_path'], self.storage_root))
+            if file_id <= 0 or not self.file_manager.attach_file(case_id, file_id, os.path.basename(path),
+                                                                 sort_order):
+                raise RuntimeError("登记文件失败")
+        return file_id
+
+    @staticmethod
+    def _result(path, entry, duplicate, resumed):
+        return {
+            'path': path,
+            'file_id': entry.get('file_id'),
+            'sha256': entry['sha256'],
+            'size': entry['size'],
+            'page_count': entry['page_count'],
+            'storage_path': entry['storage_path'],
+            'duplicate': duplicate,
+            'resumed': resumed,
+        }
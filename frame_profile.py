@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+按钮悬停帧耗时分析
+python main.py --profile-hover 会在一个窗口中创建若干渐变按钮，依次对每个按钮触发
+<Enter>/<Leave> 事件并等待重绘完成，统计每一帧（事件处理加重绘）的耗时：
+
+- 当前的 GradientButton：背景图像按尺寸和颜色缓存，悬停时只切换图像
+- 旧的逐行绘制方式：每次悬停删除全部画布元素，按高度逐行重新创建线条
+
+同时输出首次渲染渐变图像（缓存未命中）的耗时。需要图形界面环境。
+"""
+
+import statistics
+import time
+
+import tkinter as tk
+
+# 默认的按钮数量和每个按钮的悬停次数
+BUTTON_COUNT = 40
+HOVER_ROUNDS = 10
+
+BUTTON_COLUMNS = 5
+
+
+def draw_gradient_lines(button, hover=False):
+    """旧的绘制方式：删除全部元素后逐行创建渐变线条（仅用于对比）"""
+    button.delete("all")
+
+    start_rgb = button.hex_to_rgb(button.start_color)
+    end_rgb = button.hex_to_rgb(button.end_color)
+    if hover:
+        start_rgb = tuple(min(255, c + 20) for c in start_rgb)
+        end_rgb = tuple(min(255, c + 20) for c in end_rgb)
+
+    for i in range(button.height):
+        factor = i / button.height
+        color_hex = button.rgb_to_hex(button.interpolate_color(start_rgb, end_rgb, factor))
+        button.create_line(0, i, button.width, i, fill=color_hex)
+
+    button.create_rectangle(0, 0, button.width, button.height, outline="#2c5aa0", width=1)
+    button.create_text(button.width // 2, button.height // 2, text=button.text,
+                       fill=button.text_color, font=("Arial", 10, "bold"))
+
+
+def summarize(timings):
+    timings = sorted(timings)
+    return {
+        'frames': len(timings),
+        'p50_ms': timings[len(timings) // 2],
+        'p95_ms': timings[min(len(timings) - 1, int(len(timings) * 0.95))],
+        'max_ms': timings[-1],
+        'mean_ms': statistics.fmean(timings)
+    }
+
+
+def measure_hover(root, button_class, count=BUTTON_COUNT, rounds=HOVER_ROUNDS):
+    """创建 count 个按钮，每个按钮悬停 rounds 次，返回每帧耗时（毫秒）的统计"""
+    frame = tk.Frame(root)
+    frame.pack()
+    buttons = [button_class(frame, f"按钮{i + 1}", width=120, height=35) for i in range(count)]
+    for i, button in enumerate(buttons):
+        button.grid(row=i // BUTTON_COLUMNS, column=i % BUTTON_COLUMNS, padx=2, pady=2)
+    root.update()
+
+    timings = []
+    for _ in range(rounds):
+        for button in buttons:
+            for sequence in ("<Enter>", "<Leave>"):
+                start = time.perf_counter()
+                button.event_generate(sequence)
+                root.update_idletasks()
+                timings.append((time.perf_counter() - start) * 1000)
+    frame.destroy()
+    root.update()
+    return summarize(timings)
+
+
+def measure_first_render(root, button_class, gradient_cache, count=BUTTON_COUNT):
+    """清空渐变图像缓存后创建按钮的耗时（毫秒）：(首个按钮, 其余按钮平均)"""
+    gradient_cache.clear()
+    frame = tk.Frame(root)
+    frame.pack()
+    timings = []
+    for i in range(count):
+        start = time.perf_counter()
+        button = button_class(frame, f"按钮{i + 1}", width=120, height=35)
+        button.draw_gradient(hover=True)
+        button.draw_gradient(hover=False)
+        timings.append((time.perf_counter() - start) * 1000)
+    frame.destroy()
+    return timings[0], statistics.fmean(timings[1:]) if count > 1 else timings[0]
+
+
+def profile_hover(button_class, gradient_cache, count=BUTTON_COUNT, rounds=HOVER_ROUNDS):
+    """输出缓存图像和逐行绘制两种方式的悬停帧耗时"""
+    legacy_class = type('LegacyGradientButton', (button_class,), {'draw_gradient': draw_gradient_lines})
+    root = tk.Tk()
+    root.title("按钮悬停帧耗时分析")
+    try:
+        first, others = measure_first_render(root, button_class, gradient_cache, count)
+        cached = measure_hover(root, button_class, count, rounds)
+        legacy = measure_hover(root, legacy_class, count, rounds)
+    finally:
+        root.destroy()
+
+    print(f"{count} 个按钮，每个悬停 {rounds} 次（每次 <Enter> 和 <Leave> 各一帧）")
+    print(f"首次渲染渐变图像: {first:.2f} ms，之后的按钮共用缓存: 平均 {others:.3f} ms")
+    print(f"{'方式':<12}{'帧数':>8}{'p50 ms':>10}{'p95 ms':>10}{'最大 ms':>10}")
+    for name, result in (('缓存图像', cached), ('逐行绘制', legacy)):
+        print(f"{name:<12}{result['frames']:>8}{result['p50_ms']:>10.3f}"
+              f"{result['p95_ms']:>10.3f}{result['max_ms']:>10.3f}")
+    if legacy['p50_ms'] > 0:
+        print(f"p50 帧耗时降低为逐行绘制的 {cached['p50_ms'] / legacy['p50_ms']:.1%}")
+    return 0
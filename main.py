@@ -2,8 +2,10 @@ import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 import os
 import sys
-from edit_case_page import EditCasePage
+import threading
 from database_config import DatabaseManager, UserManager, CaseManager
+from case_list_model import CaseListModel, CaseSearchModel
+from async_db import AsyncDatabase
 
 class ToolTip:
     """工具提示类"""
@@ -32,8 +34,12 @@ class ToolTip:
             self.tooltip.destroy()
             self.tooltip = None
 
+# 渐变按钮背景图像缓存：(Tk解释器, 宽, 高, 起始色, 结束色, 是否悬停) -> PhotoImage，
+# 尺寸和颜色相同的按钮共用同一张图像，每种状态只渲染一次
+_gradient_images = {}
+
 class GradientButton(tk.Canvas):
-    """渐变按钮类"""
+    """渐变按钮类（正常和悬停两种背景各渲染一次，悬停时只切换图像）"""
     def __init__(self, parent, text, command=None, width=120, height=35, 
                  start_color="#4a90e2", end_color="#357abd", text_color="white", **kwargs):
         super().__init__(parent, width=width, height=height, highlightthickness=0, **kwargs)
@@ -45,6 +51,7 @@ class GradientButton(tk.Canvas):
         self.start_color = start_color
         self.end_color = end_color
         self.text_color = text_color
+        self.image_item = None
         
         self.draw_gradient()
         self.bind("<Button-1>", self.on_click)
@@ -64,10 +71,16 @@ class GradientButton(tk.Canvas):
         """颜色插值"""
         return tuple(int(start_rgb[i] + (end_rgb[i] - start_rgb[i]) * factor) for i in range(3))
     
-    def draw_gradient(self, hover=False):
-        """绘制渐变背景"""
-        self.delete("all")
-        
+    def gradient_image(self, hover=False):
+        """获取渐变背景图像（缓存中没有时渲染）"""
+        key = (self.tk, self.width, self.height, self.start_color, self.end_color, hover)
+        image = _gradient_images.get(key)
+        if image is None:
+            image = _gradient_images[key] = self.render_gradient(hover)
+        return image
+    
+    def render_gradient(self, hover=False):
+        """把渐变渲染为 PhotoImage（每行一种颜色，整行一次写入）"""
         start_rgb = self.hex_to_rgb(self.start_color)
         end_rgb = self.hex_to_rgb(self.end_color)
         
@@ -76,12 +89,22 @@ class GradientButton(tk.Canvas):
             start_rgb = tuple(min(255, c + 20) for c in start_rgb)
             end_rgb = tuple(min(255, c + 20) for c in end_rgb)
         
-        # 绘制渐变
+        image = tk.PhotoImage(master=self, width=self.width, height=self.height)
         for i in range(self.height):
             factor = i / self.height
-            color_rgb = self.interpolate_color(start_rgb, end_rgb, factor)
-            color_hex = self.rgb_to_hex(color_rgb)
-            self.create_line(0, i, self.width, i, fill=color_hex)
+            color_hex = self.rgb_to_hex(self.interpolate_color(start_rgb, end_rgb, factor))
+            image.put(color_hex, to=(0, i, self.width, i + 1))
+        return image
+    
+    def draw_gradient(self, hover=False):
+        """绘制渐变背景（首次绘制时创建画布元素，之后只切换背景图像）"""
+        image = self.gradient_image(hover)
+        if self.image_item is not None:
+            self.itemconfig(self.image_item, image=image)
+            return
+        
+        self.delete("all")
+        self.image_item = self.create_image(0, 0, image=image, anchor="nw")
         
         # 绘制圆角效果（简化版）
         self.create_rectangle(0, 0, self.width, self.height, outline="#2c5aa0", width=1)
@@ -102,7 +125,158 @@ class GradientButton(tk.Canvas):
         self.draw_gradient(hover=False)
         self.config(cursor="")
 
+class VirtualCaseList(tk.Frame):
+    """虚拟化卷宗列表：只为可见行创建画布元素，适合上万条卷宗"""
+    def __init__(self, parent, row_height=24, font=('Arial', 10), **kwargs):
+        super().__init__(parent, **kwargs)
+        
+        self.model = None
+        self.load_more_callback = None  # 需要下一页时调用 callback(model)，为 None 时同步加载
+        self.row_height = row_height
+        self.font = font
+        self.top = 0  # 顶部可见位置（像素）
+        self.selected_id = None
+        self.row_items = []  # 复用的 (背景矩形, 文本) 画布元素
+        
+        self.scrollbar = ttk.Scrollbar(self, command=self.yview)
+        self.scrollbar.pack(side='right', fill='y')
+        self.canvas = tk.Canvas(self, bg='white', highlightthickness=0)
+        self.canvas.pack(side='left', fill='both', expand=True)
+        
+        self.canvas.bind('<Configure>', lambda e: self.redraw())
+        self.canvas.bind('<MouseWheel>', self.on_mousewheel)
+        self.canvas.bind('<Button-4>', lambda e: self.yview('scroll', -3, 'units'))
+        self.canvas.bind('<Button-5>', lambda e: self.yview('scroll', 3, 'units'))
+        self.canvas.bind('<Button-1>', self.on_click)
+    
+    def bind_rows(self, sequence, callback):
+        """绑定行事件（双击、右键等）"""
+        self.canvas.bind(sequence, callback, add='+')
+    
+    def set_model(self, model):
+        """设置数据模型并回到顶部"""
+        self.model = model
+        self.top = 0
+        self.selected_id = None
+        self.redraw()
+    
+    def visible_rows(self):
+        return max(1, self.canvas.winfo_height() // self.row_height + 1)
+    
+    def content_height(self):
+        return len(self.model) * self.row_height if self.model is not None else 0
+    
+    def max_top(self):
+        return max(0, self.content_height() - self.canvas.winfo_height())
+    
+    def yview(self, *args):
+        """滚动条协议：moveto / scroll"""
+        if self.model is None:
+            return
+        if args[0] == 'moveto':
+            self.top = float(args[1]) * self.content_height()
+        elif args[0] == 'scroll':
+            amount = int(args[1])
+            step = self.canvas.winfo_height() if args[2] == 'pages' else self.row_height
+            self.top += amount * step
+        self.top = int(min(max(0, self.top), self.max_top()))
+        self.redraw()
+    
+    def on_mousewheel(self, event):
+        self.yview('scroll', int(-3 * (event.delta / 120)), 'units')
+    
+    def redraw(self):
+        """只绘制当前可见的行"""
+        if self.model is None:
+            for bg, text in self.row_items:
+                self.canvas.itemconfigure(bg, state='hidden')
+                self.canvas.itemconfigure(text, state='hidden')
+            self.scrollbar.set(0, 1)
+            return
+        
+        first = self.top // self.row_height
+        count = self.visible_rows()
+        
+        # 接近已加载数据的末尾时继续加载下一页
+        if first + count * 2 >= len(self.model) and self.model.has_more:
+            if self.load_more_callback:
+                self.load_more_callback(self.model)
+            else:
+                self.model.load_more()
+        
+        width = self.canvas.winfo_width()
+        while len(self.row_items) < count:
+            bg = self.canvas.create_rectangle(0, 0, 0, 0, width=0)
+            text = self.canvas.create_text(0, 0, anchor='w', font=self.font)
+            self.row_items.append((bg, text))
+        
+        for slot, (bg, text) in enumerate(self.row_items):
+            index = first + slot
+            if slot >= count or index >= len(self.model):
+                self.canvas.itemconfigure(bg, state='hidden')
+                self.canvas.itemconfigure(text, state='hidden')
+                continue
+            case = self.model.row(index)
+            y = index * self.row_height - self.top
+            selected = case['id'] == self.selected_id
+            self.canvas.coords(bg, 0, y, width, y + self.row_height)
+            self.canvas.itemconfigure(bg, state='normal', fill='#cce5ff' if selected else 'white')
+            self.canvas.coords(text, 6, y + self.row_height // 2)
+            # 显示格式：卷宗名称 (案件编号)
+            self.canvas.itemconfigure(text, state='normal',
+                                      text=f"{case['case_name']} ({case['case_number']})")
+        
+        total = self.content_height()
+        if total:
+            self.scrollbar.set(self.top / total, min(1.0, (self.top + self.canvas.winfo_height()) / total))
+        else:
+            self.scrollbar.set(0, 1)
+    
+    def nearest(self, y):
+        """与画布y坐标最近的行位置"""
+        if self.model is None or not len(self.model):
+            return -1
+        return min(len(self.model) - 1, max(0, int((self.top + y) // self.row_height)))
+    
+    def select_at(self, y):
+        """选中y坐标所在的行"""
+        index = self.nearest(y)
+        self.selected_id = self.model.row(index)['id'] if index >= 0 else None
+        self.redraw()
+    
+    def on_click(self, event):
+        self.select_at(event.y)
+    
+    def selected_case(self):
+        """当前选中的卷宗数据"""
+        if self.model is not None and self.selected_id in self.model.cases:
+            return self.model.cases[self.selected_id]
+        return None
+
+def load_edit_case_page():
+    """导入编辑卷宗页面
+    
+    编辑页面依赖的PDF处理库（PyMuPDF、pdfplumber、PyPDF2、Pillow）导入较慢，
+    推迟到第一次打开卷宗时才导入，登录后在后台线程中预先加载。
+    """
+    from edit_case_page import EditCasePage
+    return EditCasePage
+
+def warm_up_edit_case_page():
+    """后台预加载编辑卷宗页面"""
+    try:
+        load_edit_case_page()
+    except Exception as e:
+        print(f"预加载编辑卷宗页面失败: {e}")
+
 class LawyerAssistantApp:
+    # 检索框输入停止多久后才发起查询（毫秒）
+    SEARCH_DEBOUNCE_MS = 300
+    # 过期会话的清理间隔（毫秒），启动时先清理一次
+    SESSION_REAP_INTERVAL_MS = 60 * 60 * 1000
+    # 登录认证的超时时间（秒）
+    LOGIN_TIMEOUT = 30
+    
     def __init__(self):
         self.root = tk.Tk()
         self.root.title("律师助手 - 卷宗管理系统")
@@ -124,10 +298,24 @@ class LawyerAssistantApp:
         
         self.user_manager = UserManager(self.db_manager)
         self.case_manager = CaseManager(self.db_manager)
+        # 数据库调用在后台线程执行，结果交回界面线程
+        self.async_db = AsyncDatabase(self.root)
         
         # 当前用户信息
         self.current_user = None
         self.current_session_token = None
+        self.case_list_model = None
+        self.search_after_id = None
+        self.login_pending = False
+        
+        # 定期清理过期会话
+        self.reap_expired_sessions()
+        
+        # 离线单机版：网络恢复后在后台把本地修改推送到中心数据库
+        self.sync_worker = None
+        if self.db_manager.dialect == 'sqlite':
+            from offline_sync import SyncWorker
+            self.sync_worker = SyncWorker(self.db_manager).start()
         
         # 设置样式
         self.setup_styles()
@@ -206,16 +394,37 @@ class LawyerAssistantApp:
             messagebox.showerror("错误", "请输入用户名和密码！")
             return
         
-        # 验证用户
-        user = self.user_manager.authenticate_user(username, password)
-        if user:
-            self.current_user = user
-            # 创建会话
-            self.current_session_token = self.user_manager.create_session(user['id'])
-            print(f"用户登录成功: {user['username']} ({user['full_name']})")
-            self.show_main_interface()
-        else:
+        # 密码哈希在线程池中计算，避免阻塞界面
+        if self.login_pending:
+            return
+        self.login_pending = True
+        self.async_db.watch(self.user_manager.authenticate_user_async(username, password),
+                            timeout=self.LOGIN_TIMEOUT,
+                            on_success=self.on_authenticated, on_error=self.on_login_error)
+    
+    def on_authenticated(self, user):
+        """认证完成：创建会话"""
+        if not user:
+            self.login_pending = False
             messagebox.showerror("错误", "用户名或密码错误！")
+            return
+        self.async_db.submit(self.user_manager.create_session, user['id'],
+                             on_success=lambda token: self.on_session_created(user, token),
+                             on_error=self.on_login_error)
+    
+    def on_session_created(self, user, token):
+        """会话创建完成：进入主界面"""
+        self.login_pending = False
+        self.current_user = user
+        self.current_session_token = token
+        print(f"用户登录成功: {user['username']} ({user['full_name']})")
+        self.show_main_interface()
+        threading.Thread(target=warm_up_edit_case_page, daemon=True).start()
+    
+    def on_login_error(self, error):
+        self.login_pending = False
+        print(f"用户认证错误: {error}")
+        messagebox.showerror("错误", "登录失败，请检查数据库连接！")
     
     def show_main_interface(self):
         """显示主界面"""
@@ -288,22 +497,26 @@ class LawyerAssistantApp:
                              font=('Arial', 12, 'bold'), fg='#333', bg='#f8f9fa')
         list_title.pack(pady=(20, 10))
         
+        # 检索框（输入时自动检索）
+        search_frame = tk.Frame(nav_frame, bg='#f8f9fa')
+        search_frame.pack(fill='x', padx=10, pady=(0, 8))
+        tk.Label(search_frame, text="🔍", font=('Arial', 10), bg='#f8f9fa').pack(side='left')
+        self.search_entry = tk.Entry(search_frame, font=('Arial', 10))
+        self.search_entry.pack(side='left', fill='x', expand=True, padx=(5, 0))
+        self.search_entry.bind('<KeyRelease>', self.schedule_case_search)
+        ToolTip(self.search_entry, "按卷宗名称、案号、描述或目录文件名称检索")
+        
         # 卷宗列表框架
         list_frame = tk.Frame(nav_frame, bg='#f8f9fa')
         list_frame.pack(fill='both', expand=True, padx=10, pady=(0, 10))
         
-        # 滚动条
-        scrollbar = ttk.Scrollbar(list_frame)
-        scrollbar.pack(side='right', fill='y')
-        
-        # 卷宗列表
-        self.case_listbox = tk.Listbox(list_frame, yscrollcommand=scrollbar.set,
-                                      font=('Arial', 10), selectmode='single')
-        self.case_listbox.pack(side='left', fill='both', expand=True)
-        scrollbar.config(command=self.case_listbox.yview)
+        # 卷宗列表（虚拟化，只绘制可见行）
+        self.case_list = VirtualCaseList(list_frame, bg='#f8f9fa')
+        self.case_list.load_more_callback = self.load_more_cases
+        self.case_list.pack(fill='both', expand=True)
         
         # 绑定双击事件
-        self.case_listbox.bind('<Double-Button-1>', self.open_case)
+        self.case_list.bind_rows('<Double-Button-1>', self.open_case)
         
         # 右键菜单
         self.create_context_menu()
@@ -359,14 +572,12 @@ class LawyerAssistantApp:
         self.context_menu.add_command(label="删除卷宗", command=self.delete_case)
         
         # 绑定右键事件
-        self.case_listbox.bind('<Button-3>', self.show_context_menu)
+        self.case_list.bind_rows('<Button-3>', self.show_context_menu)
     
     def show_context_menu(self, event):
         """显示右键菜单"""
         # 选中右键点击的项目
-        index = self.case_listbox.nearest(event.y)
-        self.case_listbox.selection_clear(0, tk.END)
-        self.case_listbox.selection_set(index)
+        self.case_list.select_at(event.y)
         
         # 显示菜单
         try:
@@ -375,29 +586,78 @@ class LawyerAssistantApp:
             self.context_menu.grab_release()
     
     def load_user_cases(self):
-        """加载用户卷宗列表"""
-        cases = self.case_manager.get_user_cases(self.current_user['id'])
-        
-        # 清空列表
-        self.case_listbox.delete(0, tk.END)
-        
-        # 存储卷宗数据
-        self.cases_data = {}
+        """加载用户卷宗列表（首次加载第一页，之后只刷新有变化的卷宗）"""
+        if self.case_list_model is None or self.case_list_model.user_id != self.current_user['id']:
+            self.case_list_model = CaseListModel(self.case_manager, self.current_user['id'])
+            self.case_list.set_model(self.case_list_model)
+            self.load_more_cases(self.case_list_model)
+            return
         
-        print(f"查询到 {len(cases)} 个卷宗")
+        model = self.case_list_model
+        if model.last_updated_at is None:
+            self.load_more_cases(model)
+            return
+        # 同一时间点之后的刷新请求合并为一次查询
+        since = model.last_updated_at
+        self.async_db.submit(model.fetch_changes, since, key=('fetch_changes', id(model), since),
+                             on_success=lambda rows: self.on_cases_changed(model, rows))
+    
+    def on_cases_changed(self, model, rows):
+        """增量刷新结果返回"""
+        if model is not self.case_list_model:
+            return
+        model.apply_changes(rows)
+        if self.search_entry.get().strip():
+            self.run_case_search()
+        else:
+            self.case_list.redraw()
+    
+    def load_more_cases(self, model):
+        """后台加载列表模型的下一页（相同分页位置的请求只查询一次）"""
+        if not model.has_more:
+            return
+        cursor = model.page_cursor
+        self.async_db.submit(model.fetch_page, cursor, key=('fetch_page', id(model), cursor),
+                             on_success=lambda rows: self.on_cases_loaded(model, cursor, rows))
+    
+    def on_cases_loaded(self, model, cursor, rows):
+        """分页结果返回"""
+        if self.current_user is None:
+            return
+        if model.apply_page(rows, cursor) and self.case_list.model is model:
+            self.case_list.redraw()
+    
+    def schedule_case_search(self, event=None):
+        """输入停止一段时间后再检索，避免每次按键都查询数据库"""
+        if self.search_after_id:
+            self.root.after_cancel(self.search_after_id)
+        self.search_after_id = self.root.after(self.SEARCH_DEBOUNCE_MS, self.run_case_search)
+    
+    def run_case_search(self):
+        """执行检索，关键词为空时恢复完整卷宗列表"""
+        self.search_after_id = None
+        keyword = self.search_entry.get().strip()
+        if not keyword:
+            if self.case_list.model is not self.case_list_model:
+                self.case_list.set_model(self.case_list_model)
+            return
         
-        for case in cases:
-            # 显示格式：卷宗名称 (案件编号)
-            display_text = f"{case['case_name']} ({case['case_number']})"
-            self.case_listbox.insert(tk.END, display_text)
-            
-            # 存储完整数据
-            self.cases_data[display_text] = case
-            print(f"创建卷宗行: {display_text}")
+        model = CaseSearchModel(self.case_manager, self.current_user['id'], keyword)
+        self.async_db.submit(model.fetch_page, model.page_cursor,
+                             key=('search_cases', self.current_user['id'], keyword),
+                             on_success=lambda rows: self.on_search_results(model, rows))
+    
+    def on_search_results(self, model, rows):
+        """检索结果返回（关键词已变化时丢弃）"""
+        if self.current_user is None or model.keyword != self.search_entry.get().strip():
+            return
+        model.apply_page(rows, 0)
+        self.case_list.set_model(model)
     
     def new_case(self):
         """新建卷宗"""
         # 打开编辑卷宗页面（新建模式）
+        EditCasePage = load_edit_case_page()
         edit_page = EditCasePage(self.root, self.db_manager, self.current_user)
         
         # 等待窗口关闭
@@ -408,15 +668,13 @@ class LawyerAssistantApp:
     
     def open_case(self, event=None):
         """打开卷宗"""
-        selection = self.case_listbox.curselection()
-        if not selection:
-            return
-        
-        case_text = self.case_listbox.get(selection[0])
-        case_data = self.cases_data.get(case_text)
+        if event is not None:
+            self.case_list.select_at(event.y)
+        case_data = self.case_list.selected_case()
         
         if case_data:
             # 打开编辑卷宗页面（查看/编辑模式）
+            EditCasePage = load_edit_case_page()
             edit_page = EditCasePage(self.root, self.db_manager, self.current_user, case_data)
             
             # 等待窗口关闭
@@ -431,12 +689,7 @@ class LawyerAssistantApp:
     
     def delete_case(self):
         """删除卷宗"""
-        selection = self.case_listbox.curselection()
-        if not selection:
-            return
-        
-        case_text = self.case_listbox.get(selection[0])
-        case_data = self.cases_data.get(case_text)
+        case_data = self.case_list.selected_case()
         
         if case_data:
             # 确认删除
@@ -444,35 +697,66 @@ class LawyerAssistantApp:
                                        f"确定要删除卷宗 '{case_data['case_name']}' 吗？\n\n此操作不可恢复！")
             if result:
                 # 执行删除
-                if self.case_manager.delete_case(case_data['id'], self.current_user['id']):
-                    messagebox.showinfo("成功", "卷宗已删除！")
-                    self.load_user_cases()  # 刷新列表
-                else:
-                    messagebox.showerror("错误", "删除卷宗失败！")
+                self.async_db.submit(self.case_manager.delete_case, case_data['id'], self.current_user['id'],
+                                     on_success=lambda affected: self.on_case_deleted(case_data, affected),
+                                     on_error=lambda error: self.on_case_deleted(case_data, -1))
+    
+    def on_case_deleted(self, case_data, affected):
+        """删除结果返回"""
+        if affected > 0:
+            messagebox.showinfo("成功", "卷宗已删除！")
+            self.case_list_model.remove(case_data['id'])
+            self.case_list.model.remove(case_data['id'])
+            self.load_user_cases()  # 刷新列表
+        else:
+            messagebox.showerror("错误", "删除卷宗失败！")
     
     def logout(self):
         """用户登出"""
         # 清除会话
         if self.current_session_token:
-            self.user_manager.logout_user(self.current_session_token)
+            self.async_db.submit(self.user_manager.logout_user, self.current_session_token)
         
         self.current_user = None
         self.current_session_token = None
+        self.case_list_model = None
+        if self.search_after_id:
+            self.root.after_cancel(self.search_after_id)
+            self.search_after_id = None
         
         # 返回登录界面
         self.show_login()
     
+    def reap_expired_sessions(self):
+        """在后台线程中分批清理过期会话，并安排下一次清理"""
+        threading.Thread(target=self.user_manager.reap_expired_sessions, daemon=True).start()
+        self.root.after(self.SESSION_REAP_INTERVAL_MS, self.reap_expired_sessions)
+    
     def run(self):
         """运行应用"""
         try:
             self.root.mainloop()
         finally:
             # 清理资源
+            if getattr(self, 'sync_worker', None):
+                self.sync_worker.stop()
+            if hasattr(self, 'async_db'):
+                self.async_db.close()
             if hasattr(self, 'db_manager'):
                 self.db_manager.disconnect()
 
 def main():
     """主函数"""
+    if '--profile-startup' in sys.argv:
+        from startup_profile import profile_startup
+        sys.exit(profile_startup(__file__))
+    if '--profile-startup-child' in sys.argv:
+        from startup_profile import run_child
+        sys.exit(run_child(LawyerAssistantApp, load_edit_case_page))
+    if '--profile-hover' in sys.argv:
+        from frame_profile import profile_hover
+        sys.exit(profile_hover(GradientButton, _gradient_images))
+    
     app = LawyerAssistantApp()
     app.run()
 
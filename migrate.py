@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+数据库迁移工具
+按版本号顺序执行 migrations 目录下的 SQL 文件（文件名格式：0001_说明.sql），
+已执行的版本记录在 schema_migrations 表中，不会重复执行。
+
+用法:
+    python migrate.py            执行全部未执行的迁移
+    python migrate.py --status   查看迁移状态
+    python migrate.py --check    对管理类查询执行 EXPLAIN，存在全表扫描或 filesort 时返回非零退出码
+    python migrate.py --reconcile-directory-counts
+                                 按目录表重新计算 cases.directory_count
+    python migrate.py --classify-evidence
+                                 按文书名称为尚未分类的已有目录项批量分类证据类型
+"""
+
+import fnmatch
+import os
+import re
+import sys
+from contextlib import contextmanager
+from datetime import datetime
+
+from database_config import DatabaseManager, UserManager, CaseManager, DirectoryManager, CaseFileManager, Error
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+
+MIGRATION_FILE_PATTERN = re.compile(r'^(\d+)_(.+)\.sql$')
+
+
+def split_sql(text):
+    """把 SQL 文件拆分为单条语句（去掉 -- 注释行）"""
+    lines = [line for line in text.splitlines() if not line.strip().startswith('--')]
+    return [statement.strip() for statement in '\n'.join(lines).split(';') if statement.strip()]
+
+
+class MigrationRunner:
+    """数据库迁移执行器"""
+
+    def __init__(self, db_manager, migrations_dir=MIGRATIONS_DIR):
+        self.db = db_manager
+        self.migrations_dir = migrations_dir
+
+    def ensure_table(self):
+        """创建迁移记录表"""
+        query = """
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INT PRIMARY KEY,
+                name VARCHAR(255) NOT NULL,
+                applied_at DATETIME NOT NULL
+            )
+        """
+        return self.db.execute_update(query) >= 0
+
+    def discover(self):
+        """按版本号排序列出全部迁移文件"""
+        migrations = []
+        for file_name in os.listdir(self.migrations_dir):
+            match = MIGRATION_FILE_PATTERN.match(file_name)
+            if match:
+                migrations.append((int(match.group(1)), match.group(2),
+                                   os.path.join(self.migrations_dir, file_name)))
+        return sorted(migrations)
+
+    def applied_versions(self):
+        """已执行的迁移版本"""
+        result = self.db.execute_query("SELECT version FROM schema_migrations")
+        return {row['version'] for row in result or []}
+
+    def pending(self):
+        """尚未执行的迁移"""
+        applied = self.applied_versions()
+        return [migration for migration in self.discover() if migration[0] not in applied]
+
+    def apply(self, migration):
+        """执行一个迁移文件
+
+        MySQL 的 DDL 会隐式提交，迁移中途失败时已执行的语句不会回滚，
+        需根据错误信息手工处理后再重新运行。
+        """
+        version, name, path = migration
+        with open(path, encoding='utf-8') as f:
+            statements = split_sql(f.read())
+
+        try:
+            with self.db.checkout() as connection:
+                cursor = connection.cursor()
+                for statement in statements:
+                    cursor.execute(statement)
+                    if cursor.with_rows:
+                        cursor.fetchall()
+                cursor.execute(
+                    "INSERT INTO schema_migrations (version, name, applied_at) VALUES (%s, %s, %s)",
+                    (version, name, datetime.now()))
+                connection.commit()
+                cursor.close()
+            return True
+        except Error as e:
+            print(f"迁移 {version:04d}_{name} 执行错误: {e}")
+            return False
+
+    def migrate(self):
+        """执行全部未执行的迁移，返回成功执行的数量"""
+        if not self.ensure_table():
+            return 0
+        count = 0
+        for migration in self.pending():
+            print(f"执行迁移 {migration[0]:04d}_{migration[1]} ...")
+            if not self.apply(migration):
+                break
+            count += 1
+        return count
+
+
+class QueryRecorder:
+    """代替 DatabaseManager 记录管理类方法发出的 SQL，而不真正执行"""
+
+    def __init__(self, dialect='mysql'):
+        self.statements = []
+        self.dialect = dialect
+
+    def execute_query(self, query, params=None):
+        self.statements.append((query, params))
+        return []
+
+    def execute_update(self, query, params=None):
+        self.statements.append((query, params))
+        return 0
+
+    def execute_insert(self, query, params=None):
+        self.statements.append((query, params))
+        return 0
+
+    def execute_prepared(self, query, params=None):
+        self.statements.append((query, params))
+        return []
+
+    def iter_query(self, query, params=None, batch_size=None):
+        self.statements.append((query, params))
+        return iter(())
+
+    @contextmanager
+    def transaction(self):
+        yield RecordingCursor(self.statements)
+
+
+class RecordingCursor:
+    """记录事务内执行的语句"""
+
+    def __init__(self, statements):
+        self.statements = statements
+        self.lastrowid = 0
+        self.rowcount = 0
+
+    def execute(self, query, params=None):
+        self.statements.append((query, params))
+
+    def executemany(self, query, seq_params):
+        for params in seq_params[:1]:
+            self.statements.append((query, params))
+
+    def fetchone(self):
+        return None
+
+    def fetchall(self):
+        return []
+
+
+def record_manager_queries():
+    """调用各管理类方法，收集它们发出的查询语句"""
+    recorder = QueryRecorder()
+    now = datetime.now()
+
+    user_manager = UserManager(recorder)
+    user_manager.authenticate_user('admin', 'password')
+    user_manager.update_last_login(1)
+    user_manager.validate_session('token')
+    user_manager.logout_user('token')
+    user_manager.set_user_status(1, 'inactive')
+    user_manager.reap_expired_sessions(max_batches=1)
+
+    case_manager = CaseManager(recorder)
+    case_manager.get_user_cases(1)
+    case_manager.get_user_cases_page(1)
+    case_manager.get_user_cases_page(1, (now, 1))
+    case_manager.get_user_cases_changed_since(1, now)
+    case_manager.search_cases(1, '询问笔录')
+    case_manager.get_case_by_id(1, 1)
+    case_manager.reconcile_directory_counts(1)
+    case_manager.update_case(1, '卷宗', '描述', 1)
+    case_manager.delete_case(1, 1)
+
+    directory_manager = DirectoryManager(recorder)
+    directory_manager.get_case_directories(1)
+    directory_manager.iter_case_directories(1)
+    directory_manager.add_directory_item(1, '1', '起诉意见书', 1)
+    directory_manager.search_directories(1, '询问笔录')
+    directory_manager.search_directories(1, '询', case_id=1)
+    directory_manager.update_directory_item(1, '1', '起诉意见书', 1, 0)
+    directory_manager.delete_directory_item(1)
+    directory_manager.clear_case_directories(1)
+    directory_manager.replace_case_directories(1, [])
+    directory_manager.get_directories_by_evidence_type(1, '书证')
+    directory_manager.get_evidence_type_counts(1)
+
+    file_manager = CaseFileManager(recorder)
+    file_manager.find_file('0' * 64)
+    file_manager.get_case_files(1)
+    file_manager.next_sort_order(1)
+    file_manager.detach_file(1, 1)
+
+    return recorder.statements
+
+
+# --check 允许的全表扫描 / filesort：(表名, 类型 'ALL' 或 'filesort', 语句片段, 原因)
+# 表名为 EXPLAIN 结果中的 table 列（语句中有别名时为别名，派生表为 <derivedN>，可用 * 通配），
+# 语句片段按空白合并后匹配
+EXPLAIN_ALLOWLIST = [
+    ('cd', 'filesort', 'MATCH(cd.file_name) AGAINST',
+     "全文检索结果按相关度排序，无法由索引提供顺序"),
+    ('<derived*>', 'ALL', 'FROM ( SELECT id, MAX(tier) AS tier',
+     "search_cases 对各分支命中的 id 分组合并，需要扫描物化的临时结果（行数受检索命中数限制）"),
+    ('<derived*>', 'filesort', 'FROM ( SELECT id, MAX(tier) AS tier',
+     "search_cases 按匹配层级和相关度排序，这两列在查询中计算得到，无法由索引提供顺序"),
+]
+
+
+def allowlisted(table, kind, statement):
+    """返回该项被豁免的原因，没有豁免时返回 None"""
+    for allowed_table, allowed_kind, fragment, reason in EXPLAIN_ALLOWLIST:
+        if fnmatch.fnmatchcase(table, allowed_table) and kind == allowed_kind and fragment in statement:
+            return reason
+    return None
+
+
+def explain_manager_queries(db_manager):
+    """对管理类查询执行 EXPLAIN
+
+    返回 (问题列表, 提示列表)：任何表的全表扫描（type=ALL，不论是否有可用索引）
+    和 Using filesort 都记为问题；EXPLAIN_ALLOWLIST 中豁免的项记为提示。
+    """
+    problems = []
+    notes = []
+    seen = set()
+    for query, params in record_manager_queries():
+        statement = ' '.join(query.split())
+        if statement.upper().startswith('INSERT') or statement in seen:
+            continue
+        seen.add(statement)
+
+        plan = db_manager.execute_query("EXPLAIN " + query, params)
+        if plan is None:
+            problems.append((statement, "EXPLAIN 执行失败"))
+            continue
+        for row in plan:
+            table = row.get('table') or ''
+            extra = row.get('Extra') or ''
+            findings = []
+            if row.get('type') == 'ALL':
+                findings.append(('ALL', f"表 {table} 全表扫描（可用索引: {row.get('possible_keys') or '无'}）"))
+            if 'Using filesort' in extra:
+                findings.append(('filesort', f"表 {table} 使用 filesort"))
+            for kind, finding in findings:
+                reason = allowlisted(table, kind, statement)
+                if reason:
+                    notes.append((statement, f"{finding}，已豁免：{reason}"))
+                else:
+                    problems.append((statement, finding))
+    return problems, notes
+
+
+def main(argv):
+    db = DatabaseManager()
+    if not db.connect():
+        print("数据库连接失败！")
+        return 1
+
+    try:
+        if db.dialect != 'mysql' and not {'--reconcile-directory-counts', '--classify-evidence'} & set(argv):
+            # migrations 目录中是 MySQL 的迁移脚本，SQLite 的结构由 sqlite_schema.sql 在连接时创建
+            print("SQLite 数据库结构在连接时按 sqlite_schema.sql 自动创建，不需要执行迁移")
+            return 0
+
+        runner = MigrationRunner(db)
+        if '--status' in argv:
+            runner.ensure_table()
+            applied = runner.applied_versions()
+            for version, name, _ in runner.discover():
+                state = "已执行" if version in applied else "未执行"
+                print(f"{version:04d}_{name}: {state}")
+            return 0
+
+        if '--reconcile-directory-counts' in argv:
+            fixed = CaseManager(db).reconcile_directory_counts()
+            if fixed < 0:
+                return 1
+            print(f"修正了 {fixed} 个卷宗的目录数量")
+            return 0
+
+        if '--classify-evidence' in argv:
+            directory_manager = DirectoryManager(db)
+            rows = db.execute_query(
+                "SELECT DISTINCT case_id FROM case_directories WHERE evidence_type IS NULL") or []
+            classified = 0
+            for row in rows:
+                count = directory_manager.classify_case_directories(row['case_id'], only_unclassified=True)
+                if count < 0:
+                    return 1
+                classified += count
+            print(f"为 {len(rows)} 个卷宗的 {classified} 个目录项分类了证据类型")
+            return 0
+
+        if '--check' in argv:
+            problems, notes = explain_manager_queries(db)
+            for statement, message in notes:
+                print(f"提示: {message}\n    {statement[:160]}")
+            for statement, message in problems:
+                print(f"错误: {message}\n    {statement[:160]}")
+            print(f"检查完成：{len(problems)} 个问题，{len(notes)} 条提示")
+            return 1 if problems else 0
+
+        count = runner.migrate()
+        remaining = len(runner.pending())
+        print(f"执行了 {count} 个迁移，剩余 {remaining} 个未执行")
+        return 1 if remaining else 0
+    finally:
+        db.disconnect()
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,12 @@
+-- 卷宗和目录的检索索引
+-- 全文索引使用 ngram 分词器（默认 ngram_token_size=2），支持中文检索
+
+ALTER TABLE cases
+    ADD FULLTEXT INDEX ft_cases_search (case_name, case_number, description) WITH PARSER ngram;
+
+ALTER TABLE case_directories
+    ADD FULLTEXT INDEX ft_directories_file_name (file_name) WITH PARSER ngram;
+
+-- 案号、卷宗名称前缀匹配
+CREATE INDEX idx_cases_owner_case_number ON cases (created_by, case_number);
+CREATE INDEX idx_cases_owner_case_name ON cases (created_by, case_name(64));
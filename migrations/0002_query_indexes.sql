@@ -0,0 +1,14 @@
+-- 按管理类实际查询形态建立的索引
+
+-- CaseManager.get_user_cases / get_user_cases_page：created_by + status 过滤，按 updated_at, id 倒序
+CREATE INDEX idx_cases_owner_status_updated ON cases (created_by, status, updated_at, id);
+
+-- DirectoryManager.get_case_directories：目录序号的数值部分存为生成列，排序可以直接走索引
+ALTER TABLE case_directories
+    ADD COLUMN sequence_no INT UNSIGNED
+        AS (IFNULL(CAST(REGEXP_SUBSTR(TRIM(sequence_number), '^[0-9]+') AS UNSIGNED), 0)) STORED;
+
+CREATE INDEX idx_directories_case_order ON case_directories (case_id, sort_order, sequence_no, sequence_number);
+
+-- UserManager.validate_session：session_token 等值查找 + expires_at 范围过滤
+CREATE INDEX idx_sessions_token_expires ON user_sessions (session_token, expires_at);
@@ -0,0 +1,10 @@
+-- cases.directory_count：由 DirectoryManager 在写入目录的同一事务中维护，
+-- 卷宗列表查询不再需要关联 case_directories 计数
+
+ALTER TABLE cases ADD COLUMN directory_count INT UNSIGNED NOT NULL DEFAULT 0;
+
+UPDATE cases c
+LEFT JOIN (
+    SELECT case_id, COUNT(*) AS n FROM case_directories GROUP BY case_id
+) cd ON cd.case_id = c.id
+SET c.directory_count = COALESCE(cd.n, 0);
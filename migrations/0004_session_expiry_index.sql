@@ -0,0 +1,4 @@
+-- 过期会话清理按 expires_at 顺序分批删除，需要以 expires_at 开头的索引，
+-- 否则每批删除都要扫描整张 user_sessions 表
+
+CREATE INDEX idx_sessions_expires ON user_sessions (expires_at);
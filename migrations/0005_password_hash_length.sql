@@ -0,0 +1,3 @@
+-- 密码哈希字符串包含算法、成本参数和盐（约100个字符），旧的64位列宽不够
+
+ALTER TABLE users MODIFY COLUMN password VARCHAR(255) NOT NULL;
@@ -0,0 +1,24 @@
+-- 卷宗PDF文件：pdf_files 按内容 SHA-256 去重，每份内容只存储一次；
+-- case_files 记录卷宗引用了哪些文件（同一文件可被多个卷宗引用）
+
+CREATE TABLE pdf_files (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    sha256 CHAR(64) NOT NULL,
+    size_bytes BIGINT UNSIGNED NOT NULL,
+    page_count INT UNSIGNED NOT NULL,
+    storage_path VARCHAR(512) NOT NULL,
+    created_at DATETIME NOT NULL,
+    UNIQUE KEY uk_pdf_files_sha256 (sha256)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE case_files (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    case_id INT NOT NULL,
+    file_id INT NOT NULL,
+    original_name VARCHAR(255) NOT NULL,
+    sort_order INT NOT NULL DEFAULT 0,
+    created_at DATETIME NOT NULL,
+    UNIQUE KEY uk_case_files_case_file (case_id, file_id),
+    KEY idx_case_files_case_order (case_id, sort_order),
+    KEY idx_case_files_file (file_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
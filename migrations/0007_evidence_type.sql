@@ -0,0 +1,6 @@
+-- case_directories.evidence_type：导入目录时由 evidence_classifier 批量分类写入，
+-- 编辑页面点击证据类型按钮时按 (case_id, evidence_type) 走索引过滤
+
+ALTER TABLE case_directories ADD COLUMN evidence_type VARCHAR(20) NULL;
+
+CREATE INDEX idx_directories_case_evidence ON case_directories (case_id, evidence_type, sort_order);
@@ -0,0 +1,4 @@
+-- CaseManager.get_user_cases_changed_since：只按 created_by 过滤（包含已删除的卷宗），
+-- idx_cases_owner_status_updated 中间隔着 status 列，无法提供 updated_at, id 倒序
+
+CREATE INDEX idx_cases_owner_updated ON cases (created_by, updated_at, id);
@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+离线单机版数据同步
+离线单机版（DatabaseConfig.BACKEND = 'sqlite'）中卷宗、目录、文件的修改由触发器记入
+sync_outbox（每个卷宗一行），网络恢复后按卷宗推送到中心 MySQL：
+
+- 每个卷宗在中心数据库的一个事务中写入：卷宗信息、目录（replace_case_directories 只写差异）、
+  文件登记，任何一步失败整体回滚，下次重试
+- 本地ID与中心数据库ID的对应关系记录在 sync_id_map 中；用户按用户名对应
+- 新卷宗在中心数据库创建前先记下中心 cases 表当前的最大ID（entity 为 'pending_case'），
+  创建提交后、对应关系写入前中断时，重试按创建者、案号和该ID下界找回已创建的卷宗，不重复创建
+- 卷宗以上次同步后中心数据库的 updated_at 做乐观并发检查，期间在中心数据库被其他用户
+  修改过的卷宗记为冲突，不覆盖，保留在 sync_outbox 中等待人工处理
+- 推送期间本地又有修改时（version 变化）保留 sync_outbox 记录，下次再推送
+- PDF文件只同步登记信息（内容哈希、页数、存储路径），文件内容仍保存在本机 storage/ 中
+
+用法:
+    python offline_sync.py              推送全部待同步的卷宗
+    python offline_sync.py --status     查看待同步的卷宗
+    python offline_sync.py --pull-users 从中心数据库复制用户账号（离线登录使用）
+    python offline_sync.py --accept-local <卷宗ID>
+                                        冲突的卷宗以本地内容为准，覆盖中心数据库中的修改
+"""
+
+import sys
+import threading
+
+from database_config import (DatabaseConfig, DatabaseManager, UserManager, CaseManager, DirectoryManager,
+                             CaseFileManager, ConcurrentModificationError, Error)
+
+SYNC_CONFIG = {
+    # 后台同步检查间隔（秒）
+    'interval': 300,
+    # 每次推送的卷宗数上限
+    'batch_size': 50,
+}
+
+
+class SyncManager:
+    """把本地 SQLite 数据库中的卷宗修改推送到中心 MySQL"""
+
+    OUTBOX_QUERY = """
+        SELECT case_id, version, changed_at, attempts, last_error
+        FROM sync_outbox
+        ORDER BY changed_at, case_id
+        LIMIT %s
+    """
+
+    MAPPING_QUERY = "SELECT remote_id, remote_updated_at FROM sync_id_map WHERE entity = %s AND local_id = %s"
+
+    SAVE_MAPPING_QUERY = """
+        INSERT INTO sync_id_map (entity, local_id, remote_id, remote_updated_at)
+        VALUES (%s, %s, %s, %s)
+        ON CONFLICT (entity, local_id) DO UPDATE
+        SET remote_id = excluded.remote_id, remote_updated_at = excluded.remote_updated_at
+    """
+
+    def __init__(self, local_db, remote_db):
+        self.local = local_db
+        self.remote = remote_db
+        self.local_directories = DirectoryManager(local_db)
+        self.local_files = CaseFileManager(local_db)
+        self.remote_cases = CaseManager(remote_db)
+        self.remote_directories = DirectoryManager(remote_db)
+        self.remote_files = CaseFileManager(remote_db)
+
+    def pending(self, limit=None):
+        """待推送的卷宗（按修改时间先后）"""
+        return self.local.execute_query(self.OUTBOX_QUERY, (limit or SYNC_CONFIG['batch_size'],))
+
+    def push(self, limit=None):
+        """推送待同步的卷宗，返回 {'pushed': 数量, 'conflicts': [(卷宗ID, 说明)], 'failed': [(卷宗ID, 说明)]}"""
+        summary = {'pushed': 0, 'conflicts': [], 'failed': []}
+        for row in self.pending(limit) or []:
+            try:
+                self._push_case(row['case_id'], row['version'])
+                summary['pushed'] += 1
+            except ConcurrentModificationError as e:
+                summary['conflicts'].append((row['case_id'], str(e.msg)))
+                self._record_failure(row['case_id'], f"冲突: {e.msg}")
+            except Error as e:
+                print(f"同步卷宗 {row['case_id']} 失败: {e}")
+                summary['failed'].append((row['case_id'], str(e)))
+                self._record_failure(row['case_id'], str(e))
+        return summary
+
+    def pull_users(self):
+        """从中心数据库复制用户账号（含密码哈希），返回复制的用户数，失败时返回 -1"""
+        rows = self.remote.execute_query("SELECT id, username, password, full_name, role, status FROM users")
+        if rows is None:
+            return -1
+        upsert_query = """
+            INSERT INTO users (username, password, full_name, role, status)
+            VALUES (%s, %s, %s, %s, %s)
+            ON CONFLICT (username) DO UPDATE
+            SET password = excluded.password, full_name = excluded.full_name,
+                role = excluded.role, status = excluded.status
+        """
+        try:
+            with self.local.unit_of_work():
+                for row in rows:
+                    self.local.execute_update(upsert_query, (row['username'], row['password'], row['full_name'],
+                                                             row['role'], row['status']))
+                    local = self.local.execute_query("SELECT id FROM users WHERE username = %s", (row['username'],))
+                    self.local.execute_update(self.SAVE_MAPPING_QUERY, ('user', local[0]['id'], row['id'], None))
+                    # 停用的账号已缓存的会话立即失效
+                    UserManager.invalidate_user_sessions(local[0]['id'])
+        except Error as e:
+            print(f"复制用户账号失败: {e}")
+            return -1
+        return len(rows)
+
+    def accept_local(self, case_id):
+        """冲突处理：以本地内容为准，下次推送时覆盖中心数据库中的修改"""
+        mapping = self._mapping('case', case_id)
+        if mapping is None:
+            return False
+        remote = self.remote.execute_query("SELECT updated_at FROM cases WHERE id = %s", (mapping['remote_id'],))
+        if not remote:
+            return False
+        return self.local.execute_update(self.SAVE_MAPPING_QUERY, ('case', case_id, mapping['remote_id'],
+                                                                   remote[0]['updated_at'])) >= 0
+
+    def _push_case(self, case_id, version):
+        """在中心数据库的一个事务中写入一个卷宗，成功后更新对应关系并移出 sync_outbox"""
+        rows = self.local.execute_query("SELECT * FROM cases WHERE id = %s", (case_id,))
+        if rows is None:
+            raise Error(msg="读取本地卷宗失败")
+        mapping = self._mapping('case', case_id)
+        created_id = None
+        if mapping is None and rows:
+            pending = self._mapping('pending_case', case_id)
+            if pending is not None:
+                created_id = self._find_created_case(rows[0], pending['remote_id'])
+        if not rows or (mapping is None and created_id is None and rows[0]['status'] == 'deleted'):
+            # 离线期间新建又删除的卷宗不需要推送
+            self._finish(case_id, version)
+            return
+        case = rows[0]
+        directories = self.local_directories.get_case_directories(case_id)
+        files = self.local_files.get_case_files(case_id)
+        if directories is None or files is None:
+            raise Error(msg="读取本地目录或文件失败")
+        remote_user_id = self._remote_user_id(case['created_by'])
+        if mapping is None and created_id is None:
+            self._mark_pending(case_id)
+
+        with self.remote.unit_of_work():
+            if mapping is None and created_id is None:
+                remote_id = self.remote_cases.create_case(case['case_name'], case['case_number'],
+                                                          case['description'], remote_user_id)
+                if remote_id <= 0:
+                    raise Error(msg="在中心数据库创建卷宗失败")
+            elif mapping is None:
+                # 上次推送已创建了卷宗但没有记下对应关系，在该卷宗上继续写入
+                remote_id = created_id
+                self.remote_cases.update_case(remote_id, case['case_name'], case['description'], remote_user_id)
+            else:
+                remote_id = mapping['remote_id']
+                # 上次同步之后中心数据库中的卷宗被修改过时抛出 ConcurrentModificationError
+                self.remote_cases.update_case(remote_id, case['case_name'], case['description'], remote_user_id,
+                                              expected_updated_at=mapping['remote_updated_at'])
+            if case['status'] == 'deleted':
+                self.remote_cases.delete_case(remote_id, remote_user_id)
+            if self.remote_directories.replace_case_directories(remote_id, [
+                    {'number': row['sequence_number'], 'title': row['file_name'], 'page': row['page_number'],
+                     'end_page': row['end_page'], 'sort_order': row['sort_order'],
+                     'is_custom': row['is_custom'], 'evidence_type': row['evidence_type']}
+                    for row in directories]) is None:
+                raise Error(msg="写入目录失败")
+            self._push_files(remote_id, files)
+            updated = self.remote.execute_query("SELECT updated_at FROM cases WHERE id = %s", (remote_id,))
+
+        with self.local.unit_of_work():
+            self.local.execute_update(self.SAVE_MAPPING_QUERY, ('case', case_id, remote_id, updated[0]['updated_at']))
+            self._finish(case_id, version)
+
+    def _mark_pending(self, case_id):
+        """创建中心卷宗前记下中心 cases 表当前的最大ID，此后创建的卷宗ID都大于它"""
+        rows = self.remote.execute_query("SELECT COALESCE(MAX(id), 0) AS max_id FROM cases")
+        if not rows:
+            raise Error(msg="读取中心数据库卷宗ID失败")
+        if self.local.execute_update(self.SAVE_MAPPING_QUERY, ('pending_case', case_id, rows[0]['max_id'], None)) < 0:
+            raise Error(msg="记录同步状态失败")
+
+    def _find_created_case(self, case, min_id):
+        """查找上次推送在中心数据库创建的卷宗（ID大于创建前记下的下界），没有时返回 None"""
+        rows = self.remote.execute_query(
+            "SELECT id FROM cases WHERE created_by = %s AND case_number = %s AND id > %s ORDER BY id LIMIT 1",
+            (self._remote_user_id(case['created_by']), case['case_number'], min_id))
+        if rows is None:
+            raise Error(msg="查询中心数据库卷宗失败")
+        return rows[0]['id'] if rows else None
+
+    def _push_files(self, remote_case_id, files):
+        """登记卷宗的文件，并移除中心数据库中本地已不再引用的文件"""
+        kept = set()
+        for row in files:
+            file_id = self.remote_files.register_file(row['sha256'], row['size_bytes'], row['page_count'],
+                                                      row['storage_path'])
+            if file_id <= 0 or not self.remote_files.attach_file(remote_case_id, file_id, row['original_name'],
+                                                                 row['sort_order']):
+                raise Error(msg="登记文件失败")
+            kept.add(file_id)
+        for row in self.remote_files.get_case_files(remote_case_id) or []:
+            if row['file_id'] not in kept:
+                self.remote_files.detach_file(remote_case_id, row['file_id'])
+
+    def _remote_user_id(self, local_user_id):
+        """本地用户在中心数据库中的ID（按用户名对应）"""
+        mapping = self._mapping('user', local_user_id)
+        if mapping is not None:
+            return mapping['remote_id']
+        local = self.local.execute_query("SELECT username FROM users WHERE id = %s", (local_user_id,))
+        if not local:
+            raise Error(msg=f"本地用户 {local_user_id} 不存在")
+        remote = self.remote.execute_query("SELECT id FROM users WHERE username = %s", (local[0]['username'],))
+        if not remote:
+            raise Error(msg=f"中心数据库中没有用户 {local[0]['username']}")
+        self.local.execute_update(self.SAVE_MAPPING_QUERY, ('user', local_user_id, remote[0]['id'], None))
+        return remote[0]['id']
+
+    def _mapping(self, entity, local_id):
+        rows = self.local.execute_query(self.MAPPING_QUERY, (entity, local_id))
+        if rows is None:
+            raise Error(msg="读取同步对应关系失败")
+        return rows[0] if rows else None
+
+    def _finish(self, case_id, version):
+        """推送完成：只在推送期间没有新的修改时移出 sync_outbox，并清除创建前的记录"""
+        self.local.execute_update("DELETE FROM sync_id_map WHERE entity = 'pending_case' AND local_id = %s",
+                                  (case_id,))
+        self.local.execute_update("DELETE FROM sync_outbox WHERE case_id = %s AND version = %s", (case_id, version))
+
+    def _record_failure(self, case_id, message):
+        self.local.execute_update(
+            "UPDATE sync_outbox SET attempts = attempts + 1, last_error = %s WHERE case_id = %s",
+            (message[:500], case_id))
+
+
+class SyncWorker:
+    """后台线程定期检查中心数据库能否连接，能连接且有待同步的修改时推送"""
+
+    def __init__(self, local_db, interval=None, remote_backend=None, on_result=None):
+        self.local = local_db
+        self.interval = interval or SYNC_CONFIG['interval']
+        self.remote_backend = remote_backend or DatabaseConfig.get_backend('mysql')
+        # on_result(summary) 在后台线程中调用，界面需自行切回界面线程
+        self.on_result = on_result
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='offline-sync', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def run_once(self):
+        """同步一次：没有待同步的修改或中心数据库无法连接时返回 None"""
+        pending = self.local.execute_query("SELECT COUNT(*) AS n FROM sync_outbox")
+        if not pending or not pending[0]['n']:
+            return None
+        remote = DatabaseManager(self.remote_backend)
+        if not remote.connect():
+            return None
+        try:
+            return SyncManager(self.local, remote).push()
+        finally:
+            remote.disconnect()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                summary = self.run_once()
+            except Exception as e:
+                print(f"离线同步错误: {e}")
+                continue
+            if summary is not None and self.on_result:
+                self.on_result(summary)
+
+
+def main(argv):
+    local = DatabaseManager(DatabaseConfig.get_backend('sqlite'))
+    if not local.connect():
+        print("无法打开本地数据库！")
+        return 1
+    try:
+        if '--status' in argv:
+            rows = SyncManager(local, None).pending(limit=1000000) or []
+            for row in rows:
+                error = f"  上次失败: {row['last_error']}" if row['last_error'] else ""
+                print(f"卷宗 {row['case_id']}: 修改于 {row['changed_at']}，已尝试 {row['attempts']} 次{error}")
+            print(f"共 {len(rows)} 个卷宗待同步")
+            return 0
+
+        remote = DatabaseManager(DatabaseConfig.get_backend('mysql'))
+        if not remote.connect():
+            print("无法连接中心数据库！")
+            return 1
+        try:
+            sync = SyncManager(local, remote)
+            if '--accept-local' in argv:
+                case_id = int(argv[argv.index('--accept-local') + 1])
+                if not sync.accept_local(case_id):
+                    print(f"卷宗 {case_id} 尚未同步过或中心数据库中不存在")
+                    return 1
+            if '--pull-users' in argv:
+                count = sync.pull_users()
+                print(f"复制了 {count} 个用户账号" if count >= 0 else "复制用户账号失败")
+                return 0 if count >= 0 else 1
+            summary = sync.push()
+            print(f"推送了 {summary['pushed']} 个卷宗")
+            for case_id, message in summary['conflicts']:
+                print(f"冲突: 卷宗 {case_id} {message}")
+            for case_id, message in summary['failed']:
+                print(f"失败: 卷宗 {case_id} {message}")
+            return 1 if summary['conflicts'] or summary['failed'] else 0
+        finally:
+            remote.disconnect()
+    finally:
+        local.disconnect()
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
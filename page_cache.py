@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+PDF页面渲染缓存
+以 (文件ID, 页码, 缩放, 旋转) 为键缓存渲染好的页面图像数据，
+按字节预算做LRU淘汰，并在后台预取当前页前后的相邻页面。
+"""
+
+import threading
+from collections import OrderedDict
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+
+import fitz  # PyMuPDF
+
+# 默认缓存上限（字节）
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# 预取当前页前后各几页
+DEFAULT_PREFETCH_RADIUS = 2
+
+# 每个线程各自打开的PDF文档（PyMuPDF文档对象不能跨线程共用）
+_thread_docs = threading.local()
+
+
+def open_document(path):
+    """获取当前线程打开的PDF文档，切换文件时关闭上一个"""
+    doc = getattr(_thread_docs, 'doc', None)
+    if doc is not None and getattr(_thread_docs, 'path', None) == path:
+        return doc
+    if doc is not None:
+        doc.close()
+    _thread_docs.doc = fitz.open(path)
+    _thread_docs.path = path
+    return _thread_docs.doc
+
+
+def render_page(path, page_number, zoom=1.0, rotation=0):
+    """渲染一页为PPM图像数据（可直接用于 tk.PhotoImage(data=...)），页码从1开始"""
+    doc = open_document(path)
+    if not 1 <= page_number <= doc.page_count:
+        return None
+    page = doc.load_page(page_number - 1)
+    matrix = fitz.Matrix(zoom, zoom).prerotate(rotation)
+    return page.get_pixmap(matrix=matrix, alpha=False).tobytes("ppm")
+
+
+class PageRenderCache:
+    """按字节预算限制的页面渲染缓存（LRU淘汰，线程安全）"""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, prefetch_radius=DEFAULT_PREFETCH_RADIUS,
+                 renderer=render_page):
+        self.max_bytes = max_bytes
+        self.prefetch_radius = prefetch_radius
+        self.renderer = renderer
+
+        self._entries = OrderedDict()  # key -> 图像数据，末尾为最近使用
+        self._bytes = 0
+        self._inflight = {}  # key -> Future，避免同一页被重复渲染
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='page-prefetch')
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, file_id, path, page_number, zoom=1.0, rotation=0):
+        """获取页面图像数据，未命中时在当前线程渲染"""
+        key = (file_id, page_number, zoom, rotation)
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return data
+            self.misses += 1
+            future = self._inflight.get(key)
+
+        if future is not None:
+            # 正在后台预取，等待其完成；预取出错（返回 None）或已被 close() 取消时在当前线程渲染
+            try:
+                data = future.result()
+            except CancelledError:
+                data = None
+            if data is not None:
+                return data
+
+        data = self.renderer(path, page_number, zoom, rotation)
+        self._store(key, data)
+        return data
+
+    def prefetch(self, file_id, path, page_number, zoom=1.0, rotation=0, page_count=None):
+        """在后台渲染当前页前后相邻的页面（给出 page_count 时跳过超出末页的页码）"""
+        neighbours = []
+        for offset in range(1, self.prefetch_radius + 1):
+            neighbours.extend((page_number + offset, page_number - offset))
+
+        for neighbour in neighbours:
+            if neighbour < 1 or (page_count is not None and neighbour > page_count):
+                continue
+            key = (file_id, neighbour, zoom, rotation)
+            with self._lock:
+                if key in self._entries or key in self._inflight:
+                    continue
+                self._inflight[key] = self._executor.submit(self._prefetch_one, key, path)
+
+    def _prefetch_one(self, key, path):
+        file_id, page_number, zoom, rotation = key
+        try:
+            data = self.renderer(path, page_number, zoom, rotation)
+            self._store(key, data)
+            return data
+        except Exception as e:
+            print(f"页面预取错误: {e}")
+            return None
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def _store(self, key, data):
+        """写入缓存并按字节预算淘汰最久未使用的页面"""
+        if data is None or len(data) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old)
+            self._entries[key] = data
+            self._bytes += len(data)
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+                self.evictions += 1
+
+    def invalidate_file(self, file_id):
+        """移除某个文件的全部缓存页面"""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == file_id]:
+                self._bytes -= len(self._entries.pop(key))
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def close(self):
+        """停止预取并清空缓存"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        with self._lock:
+            self._inflight.clear()
+        self.clear()
+
+    def stats(self):
+        """缓存统计信息"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'prefetching': len(self._inflight)
+            }
@@ -0,0 +1,504 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+卷宗段落检索索引（卷宗问答的检索部分）
+把卷宗中各PDF的逐页文本切成不跨页的短段落，按中文字符二元组建立倒排索引，
+用 BM25 打分返回最相关的段落及其所在文件和页码，问答面板据此引用原文并跳转页面。
+
+存储（每个卷宗一个目录，cache/passage_index/case_<id>/）：
+- 每次加入PDF写入一个新的段（segment），已有的段不再修改，加入文件只需处理新文件
+- 段内的倒排表、段落长度、页码和段落文本偏移都是 NumPy 数组文件，以内存映射方式打开，
+  查询时只读取用到的倒排表，不把整个索引读入内存
+- meta.json 记录段列表和文件列表，写完段文件后再原子替换 meta.json，中断不会损坏索引
+- 移除文件只做删除标记，段数超过上限时合并所有段并清理已删除的段落
+- 查询期间持有所用段的引用，合并后被替换的段等正在进行的查询结束后才关闭和删除
+
+用法:
+    python passage_index.py --benchmark [--pages 2000] [--queries 200]
+"""
+
+import argparse
+import json
+import math
+import mmap
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+import numpy as np
+
+INDEX_CONFIG = {
+    'root': os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'passage_index'),
+    # 段落长度和相邻段落的重叠（字符）
+    'passage_chars': 300,
+    'overlap_chars': 60,
+    # 段数超过此值时合并
+    'max_segments': 8,
+    # BM25 参数
+    'k1': 1.2,
+    'b': 0.75,
+}
+
+INDEX_VERSION = 1
+
+# 中文连续字符按二元组切分，字母数字按词
+TOKEN_PATTERN = re.compile(r'[一-鿿]+|[a-z0-9]+')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+
+def passage_tokens(text):
+    """切分检索词：中文字符二元组（孤立的单字保留单字），字母数字整词"""
+    tokens = []
+    for run in TOKEN_PATTERN.findall((text or '').lower()):
+        if run.isascii() or len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+def split_passages(pages, passage_chars=None, overlap_chars=None):
+    """把逐页文本切成不跨页的段落：[(页码, 段落文本)]"""
+    size = passage_chars or INDEX_CONFIG['passage_chars']
+    overlap = overlap_chars if overlap_chars is not None else INDEX_CONFIG['overlap_chars']
+    step = max(1, size - overlap)
+    passages = []
+    for page in pages:
+        text = WHITESPACE_PATTERN.sub(' ', page.get('text') or '').strip()
+        for start in range(0, max(1, len(text) - overlap), step):
+            chunk = text[start:start + size]
+            if chunk.strip():
+                passages.append((page['page'], chunk))
+    return passages
+
+
+def write_segment(directory, name, passages):
+    """写入一个段：passages 为 [(文件序号, 页码, 段落文本)]，返回 (段落数, 总词数)"""
+    postings = {}
+    doc_len = np.zeros(len(passages), dtype=np.uint32)
+    for doc, (_, _, text) in enumerate(passages):
+        counts = Counter(passage_tokens(text))
+        doc_len[doc] = sum(counts.values())
+        for term, tf in counts.items():
+            postings.setdefault(term, []).append((doc, tf))
+
+    terms = sorted(postings)
+    starts = np.zeros(len(terms) + 1, dtype=np.uint64)
+    docs = np.empty(sum(len(postings[term]) for term in terms), dtype=np.uint32)
+    tfs = np.empty(len(docs), dtype=np.uint16)
+    position = 0
+    for i, term in enumerate(terms):
+        entries = postings[term]
+        docs[position:position + len(entries)] = [doc for doc, _ in entries]
+        tfs[position:position + len(entries)] = [min(tf, 65535) for _, tf in entries]
+        position += len(entries)
+        starts[i + 1] = position
+
+    encoded = [text.encode('utf-8') for _, _, text in passages]
+    text_offsets = np.zeros(len(encoded) + 1, dtype=np.uint64)
+    np.cumsum([len(data) for data in encoded], out=text_offsets[1:])
+
+    prefix = os.path.join(directory, name)
+    with open(prefix + '.terms', 'w', encoding='utf-8') as f:
+        f.write('\n'.join(terms))
+    with open(prefix + '.text', 'wb') as f:
+        f.write(b''.join(encoded))
+    arrays = {
+        'starts': starts,
+        'docs': docs,
+        'tfs': tfs,
+        'doc_len': doc_len,
+        'doc_file': np.array([file_no for file_no, _, _ in passages], dtype=np.uint32),
+        'doc_page': np.array([page for _, page, _ in passages], dtype=np.int32),
+        'text_offsets': text_offsets,
+    }
+    for key, array in arrays.items():
+        np.save(f"{prefix}.{key}.npy", array)
+    return len(passages), int(doc_len.sum())
+
+
+class Segment:
+    """以内存映射方式打开的只读段"""
+
+    ARRAYS = ('starts', 'docs', 'tfs', 'doc_len', 'doc_file', 'doc_page', 'text_offsets')
+
+    def __init__(self, directory, name):
+        self.name = name
+        self.refs = 0  # 正在使用该段的查询数（由 PassageIndex 在锁内维护）
+        self.retired = False  # 已被合并替换或索引已关闭，引用归零后关闭
+        self.delete_files = False  # 关闭后是否删除段文件
+        prefix = os.path.join(directory, name)
+        with open(prefix + '.terms', encoding='utf-8') as f:
+            content = f.read()
+        self.terms = {term: i for i, term in enumerate(content.split('\n'))} if content else {}
+        for key in self.ARRAYS:
+            setattr(self, key, np.load(f"{prefix}.{key}.npy", mmap_mode='r'))
+        self._text_file = open(prefix + '.text', 'rb')
+        size = os.fstat(self._text_file.fileno()).st_size
+        self._text = mmap.mmap(self._text_file.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+
+    def __len__(self):
+        return len(self.doc_len)
+
+    def postings(self, term):
+        """词的倒排表 (段落号数组, 词频数组)，不存在时返回 None"""
+        i = self.terms.get(term)
+        if i is None:
+            return None
+        start, end = int(self.starts[i]), int(self.starts[i + 1])
+        return self.docs[start:end], self.tfs[start:end]
+
+    def passage_text(self, doc):
+        start, end = int(self.text_offsets[doc]), int(self.text_offsets[doc + 1])
+        return self._text[start:end].decode('utf-8')
+
+    def passages(self):
+        """按段落顺序返回 [(文件序号, 页码, 段落文本)]（合并段时使用）"""
+        return [(int(self.doc_file[doc]), int(self.doc_page[doc]), self.passage_text(doc))
+                for doc in range(len(self))]
+
+    def close(self):
+        for key in self.ARRAYS:
+            setattr(self, key, None)
+        if isinstance(self._text, mmap.mmap):
+            self._text.close()
+        self._text_file.close()
+
+
+def segment_files(name):
+    return [name + suffix for suffix in ['.terms', '.text'] + [f".{key}.npy" for key in Segment.ARRAYS]]
+
+
+class PassageIndex:
+    """一个卷宗的段落检索索引（search 可与 add_document 在不同线程中同时调用）"""
+
+    def __init__(self, case_id, root=None):
+        self.case_id = case_id
+        self.directory = os.path.join(root or INDEX_CONFIG['root'], f"case_{case_id}")
+        os.makedirs(self.directory, exist_ok=True)
+        self._write_lock = threading.Lock()
+        self._refs_lock = threading.Lock()  # 保护段的引用计数和当前段列表的读取
+        self._garbage = set()  # 删除失败、待下次写入时重试删除的文件名
+        self.meta = self._load_meta()
+        self._remove_orphans()
+        self._segments = [Segment(self.directory, name) for name in self.meta['segments']]
+
+    def _load_meta(self):
+        path = os.path.join(self.directory, 'meta.json')
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                meta = json.load(f)
+            if meta.get('version') == INDEX_VERSION:
+                return meta
+        return {'version': INDEX_VERSION, 'segments': [], 'segment_stats': {},
+                'documents': [], 'deleted': [], 'next_segment': 0}
+
+    def _save_meta(self, meta):
+        path = os.path.join(self.directory, 'meta.json')
+        temp_path = path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+
+    def _remove_orphans(self):
+        """删除不在段列表中的旧段文件（上次合并后未能删除的段、写入中断的段）
+
+        只处理编号小于 next_segment 的段，其他实例正在写入的新段编号不小于 next_segment。
+        """
+        live = set(self.meta['segments'])
+        for filename in os.listdir(self.directory):
+            name = filename.split('.', 1)[0]
+            match = re.fullmatch(r'seg(\d+)', name)
+            if match and name not in live and int(match.group(1)) < self.meta['next_segment']:
+                self._remove_file(filename)
+
+    def _remove_file(self, filename):
+        try:
+            os.remove(os.path.join(self.directory, filename))
+            self._garbage.discard(filename)
+        except FileNotFoundError:
+            self._garbage.discard(filename)
+        except OSError:
+            # Windows 下文件仍被映射时无法删除，下次写入时重试
+            self._garbage.add(filename)
+
+    def _collect_garbage(self):
+        for filename in list(self._garbage):
+            self._remove_file(filename)
+
+    def _acquire_segments(self):
+        """取得当前的段列表和 meta，并为各段加一个引用"""
+        with self._refs_lock:
+            segments, meta = self._segments, self.meta
+            for segment in segments:
+                segment.refs += 1
+        return segments, meta
+
+    def _release_segments(self, segments):
+        with self._refs_lock:
+            for segment in segments:
+                segment.refs -= 1
+            finished = [segment for segment in segments if segment.retired and segment.refs == 0]
+        for segment in finished:
+            self._dispose(segment)
+
+    def _retire_segments(self, segments, delete_files):
+        """停用段：没有查询在使用的立即关闭，其余由最后一个使用它的查询关闭"""
+        with self._refs_lock:
+            for segment in segments:
+                segment.retired = True
+                segment.delete_files = delete_files
+            idle = [segment for segment in segments if segment.refs == 0]
+        for segment in idle:
+            self._dispose(segment)
+
+    def _dispose(self, segment):
+        with self._refs_lock:
+            # 同一个段只关闭一次
+            if segment.refs < 0:
+                return
+            segment.refs = -1
+        segment.close()
+        if segment.delete_files:
+            for filename in segment_files(segment.name):
+                self._remove_file(filename)
+
+    def _document_numbers(self, key):
+        deleted = set(self.meta['deleted'])
+        return [no for no, document in enumerate(self.meta['documents'])
+                if document['key'] == key and no not in deleted]
+
+    def has_document(self, key):
+        """文件（按内容哈希或路径标识）是否已建立索引"""
+        return bool(self._document_numbers(key))
+
+    def add_document(self, key, pages, label=None, path=None):
+        """为一个PDF的逐页文本建立索引（新写入一个段），已索引过的文件直接返回 0
+
+        pages 为 [{'page': 页码, 'text': 文本}]，返回新增的段落数。
+        """
+        with self._write_lock:
+            self._collect_garbage()
+            if self.has_document(key):
+                return 0
+            meta = json.loads(json.dumps(self.meta))
+            file_no = len(meta['documents'])
+            meta['documents'].append({'key': key, 'label': label or key, 'path': path})
+            passages = [(file_no, page, text) for page, text in split_passages(pages)]
+            if passages:
+                name = f"seg{meta['next_segment']:05d}"
+                meta['next_segment'] += 1
+                count, total_len = write_segment(self.directory, name, passages)
+                meta['segments'].append(name)
+                meta['segment_stats'][name] = {'passages': count, 'total_len': total_len}
+                segment = Segment(self.directory, name)
+            self._save_meta(meta)
+            with self._refs_lock:
+                self.meta = meta
+                if passages:
+                    self._segments = self._segments + [segment]
+            if len(self._segments) > INDEX_CONFIG['max_segments']:
+                self._compact_locked()
+            return len(passages)
+
+    def remove_document(self, key):
+        """移除文件的索引（标记删除，合并段时清理）"""
+        with self._write_lock:
+            numbers = self._document_numbers(key)
+            if not numbers:
+                return False
+            meta = json.loads(json.dumps(self.meta))
+            meta['deleted'] = sorted(set(meta['deleted']) | set(numbers))
+            self._save_meta(meta)
+            with self._refs_lock:
+                self.meta = meta
+            return True
+
+    def compact(self):
+        """把所有段合并为一个，清理已删除文件的段落"""
+        with self._write_lock:
+            self._collect_garbage()
+            self._compact_locked()
+
+    def _compact_locked(self):
+        deleted = set(self.meta['deleted'])
+        passages = [passage for segment in self._segments for passage in segment.passages()
+                    if passage[0] not in deleted]
+        meta = json.loads(json.dumps(self.meta))
+        meta['segments'], meta['segment_stats'] = [], {}
+        new_segments = []
+        if passages:
+            name = f"seg{meta['next_segment']:05d}"
+            meta['next_segment'] += 1
+            count, total_len = write_segment(self.directory, name, passages)
+            meta['segments'] = [name]
+            meta['segment_stats'][name] = {'passages': count, 'total_len': total_len}
+            new_segments = [Segment(self.directory, name)]
+        # 已删除的文件从文件列表中去掉后 file_no 会变化，因此文件列表保留，只清空段落
+        self._save_meta(meta)
+        with self._refs_lock:
+            old_segments, self._segments, self.meta = self._segments, new_segments, meta
+        # 正在进行的查询仍可读取旧段，查询结束后再关闭并删除
+        self._retire_segments(old_segments, delete_files=True)
+
+    def search(self, query, k=10):
+        """返回与问题最相关的 k 个段落
+
+        每项为 {'score', 'text', 'page', 'label', 'path', 'key'}，按分数从高到低排列。
+        """
+        segments, meta = self._acquire_segments()
+        try:
+            return self._search(segments, meta, query, k)
+        finally:
+            self._release_segments(segments)
+
+    def _search(self, segments, meta, query, k):
+        query_terms = Counter(passage_tokens(query))
+        if not segments or not query_terms:
+            return []
+
+        total_passages = sum(stats['passages'] for stats in meta['segment_stats'].values())
+        total_len = sum(stats['total_len'] for stats in meta['segment_stats'].values())
+        average_len = total_len / max(1, total_passages)
+        k1, b = INDEX_CONFIG['k1'], INDEX_CONFIG['b']
+
+        # 文档频率按全部段合计，各段的分数才可以直接比较
+        term_postings = {}
+        for term in query_terms:
+            lists = [segment.postings(term) for segment in segments]
+            df = sum(len(entry[0]) for entry in lists if entry is not None)
+            if df:
+                term_postings[term] = (math.log(1 + (total_passages - df + 0.5) / (df + 0.5)), lists)
+        if not term_postings:
+            return []
+
+        deleted = np.array(meta['deleted'], dtype=np.uint32)
+        candidates = []
+        for s, segment in enumerate(segments):
+            scores = None
+            for term, (idf, lists) in term_postings.items():
+                entry = lists[s]
+                if entry is None:
+                    continue
+                docs, tfs = entry
+                docs = np.asarray(docs)
+                tf = np.asarray(tfs, dtype=np.float64)
+                norm = k1 * (1 - b + b * np.asarray(segment.doc_len)[docs] / average_len)
+                if scores is None:
+                    scores = np.zeros(len(segment))
+                # 同一词的倒排表中段落号不重复，可以直接按下标累加
+                scores[docs] += query_terms[term] * idf * tf * (k1 + 1) / (tf + norm)
+            if scores is None:
+                continue
+            if len(deleted):
+                scores[np.isin(np.asarray(segment.doc_file), deleted)] = 0
+            top = np.argpartition(scores, -k)[-k:] if len(scores) > k else np.arange(len(scores))
+            candidates.extend((float(scores[doc]), s, int(doc)) for doc in top if scores[doc] > 0)
+
+        results = []
+        for score, s, doc in sorted(candidates, reverse=True)[:k]:
+            segment = segments[s]
+            document = meta['documents'][int(segment.doc_file[doc])]
+            results.append({
+                'score': score,
+                'text': segment.passage_text(doc),
+                'page': int(segment.doc_page[doc]),
+                'label': document['label'],
+                'path': document['path'],
+                'key': document['key'],
+            })
+        return results
+
+    def stats(self):
+        """索引统计：文件数、段数、段落数、磁盘占用（字节）"""
+        size = sum(os.path.getsize(os.path.join(self.directory, name)) for name in os.listdir(self.directory))
+        return {
+            'documents': len(self.meta['documents']) - len(self.meta['deleted']),
+            'segments': len(self._segments),
+            'passages': sum(stats['passages'] for stats in self.meta['segment_stats'].values()),
+            'bytes': size,
+        }
+
+    def close(self):
+        with self._write_lock:
+            with self._refs_lock:
+                segments, self._segments = self._segments, []
+            self._retire_segments(segments, delete_files=False)
+
+
+# ---------------------------------------------------------------- 基准测试
+
+BENCHMARK_SENTENCES = [
+    "犯罪嫌疑人张某于2023年5月12日晚在某小区地下车库盗窃电动车一辆。",
+    "被害人李某陈述其放在楼道内的电动车被盗，价值人民币三千二百元。",
+    "证人王某证实当晚看到一名男子推着电动车离开小区。",
+    "经价格认定，涉案电动车价值人民币二千八百元。",
+    "现场勘验发现车库监控摄像头被遮挡，提取鞋印两枚。",
+    "调取小区监控录像一段，刻录光盘一张附卷。",
+    "犯罪嫌疑人对上述盗窃事实供认不讳，并表示愿意退赔。",
+    "扣押电动车一辆、作案工具螺丝刀一把，已登记封存。",
+    "辨认笔录显示，被害人从十二张照片中辨认出犯罪嫌疑人。",
+    "银行交易明细显示犯罪嫌疑人案发后收到转账五千元。",
+]
+
+BENCHMARK_QUERIES = ["电动车价值多少", "谁辨认出犯罪嫌疑人", "监控录像", "作案工具", "收到转账",
+                     "证人看到了什么", "鞋印", "退赔"]
+
+
+def run_benchmark(page_count=2000, query_count=200, seed=1, root=None):
+    import shutil
+    import tempfile
+
+    rng = random.Random(seed)
+    pages = [{'page': i + 1, 'text': ''.join(rng.choice(BENCHMARK_SENTENCES) for _ in range(rng.randint(8, 20)))}
+             for i in range(page_count)]
+    root = root or tempfile.mkdtemp(prefix='passage_index_')
+    try:
+        index = PassageIndex(0, root=root)
+        start = time.perf_counter()
+        # 模拟逐个加入多卷PDF（每卷200页）
+        for volume, first in enumerate(range(0, page_count, 200)):
+            index.add_document(f"volume-{volume}", pages[first:first + 200], label=f"第{volume + 1}卷")
+        build_ms = (time.perf_counter() - start) * 1000
+        stats = index.stats()
+
+        timings = []
+        for i in range(query_count):
+            query = BENCHMARK_QUERIES[i % len(BENCHMARK_QUERIES)]
+            start = time.perf_counter()
+            index.search(query, k=5)
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        index.close()
+
+        print(f"{page_count} 页，{stats['documents']} 个文件，{stats['passages']} 个段落，"
+              f"{stats['segments']} 个段，索引 {stats['bytes'] / 1024 / 1024:.1f} MB")
+        print(f"建立索引 {build_ms:.0f} ms（{page_count / build_ms * 1000:,.0f} 页/秒）")
+        print(f"查询 {query_count} 次: p50 {timings[len(timings) // 2]:.2f} ms  "
+              f"p95 {timings[int(len(timings) * 0.95)]:.2f} ms  最大 {timings[-1]:.2f} ms")
+        return 0
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="卷宗段落检索索引")
+    parser.add_argument('--benchmark', action='store_true', help="用合成卷宗测试建索引和查询耗时")
+    parser.add_argument('--pages', type=int, default=2000)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args(argv)
+    if not args.benchmark:
+        parser.print_help()
+        return 0
+    return run_benchmark(args.pages, args.queries, args.seed)
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+密码哈希
+支持 PBKDF2-SHA256 和 scrypt 两种算法，每个密码使用独立的随机盐，
+算法、成本参数和盐都编码在哈希字符串中：
+
+    pbkdf2_sha256$<迭代次数>$<盐>$<哈希>
+    scrypt$<n>$<r>$<p>$<盐>$<哈希>
+
+旧版本使用的无盐 SHA-256（64位十六进制）仍可验证，登录成功后由
+UserManager 自动重新哈希为当前算法。
+
+用法（在部署机器上选择成本参数）:
+    python password_hashing.py --calibrate [--target-ms 100] [--algorithm pbkdf2_sha256|scrypt]
+"""
+
+import argparse
+import base64
+import hashlib
+import hmac
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# 当前使用的算法和成本参数（可用 --calibrate 在部署机器上重新选择）
+HASH_CONFIG = {
+    'algorithm': 'pbkdf2_sha256',
+    'pbkdf2_iterations': 600000,
+    'scrypt_n': 2 ** 15,
+    'scrypt_r': 8,
+    'scrypt_p': 1,
+}
+
+SALT_BYTES = 16
+
+# 执行哈希计算的线程数（hashlib 计算期间会释放GIL，不会阻塞界面线程）
+HASH_WORKERS = 2
+
+_executor = None
+
+
+def _b64encode(data):
+    return base64.b64encode(data).decode('ascii').rstrip('=')
+
+
+def _b64decode(text):
+    return base64.b64decode(text + '=' * (-len(text) % 4))
+
+
+class Pbkdf2Hasher:
+    """PBKDF2-HMAC-SHA256"""
+
+    algorithm = 'pbkdf2_sha256'
+
+    def __init__(self, iterations=None):
+        self.iterations = iterations or HASH_CONFIG['pbkdf2_iterations']
+
+    def encode(self, password, salt=None):
+        salt = salt or os.urandom(SALT_BYTES)
+        digest = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt, self.iterations)
+        return f"{self.algorithm}${self.iterations}${_b64encode(salt)}${_b64encode(digest)}"
+
+    @staticmethod
+    def verify(password, encoded):
+        _, iterations, salt, digest = encoded.split('$')
+        expected = _b64decode(digest)
+        actual = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), _b64decode(salt), int(iterations))
+        return hmac.compare_digest(actual, expected)
+
+    def needs_update(self, encoded):
+        return int(encoded.split('$')[1]) != self.iterations
+
+
+class ScryptHasher:
+    """scrypt"""
+
+    algorithm = 'scrypt'
+
+    def __init__(self, n=None, r=None, p=None):
+        self.n = n or HASH_CONFIG['scrypt_n']
+        self.r = r or HASH_CONFIG['scrypt_r']
+        self.p = p or HASH_CONFIG['scrypt_p']
+
+    @staticmethod
+    def _derive(password, salt, n, r, p):
+        # maxmem 需要容纳 128 * n * r 字节的工作内存
+        return hashlib.scrypt(password.encode('utf-8'), salt=salt, n=n, r=r, p=p,
+                              maxmem=256 * n * r, dklen=32)
+
+    def encode(self, password, salt=None):
+        salt = salt or os.urandom(SALT_BYTES)
+        digest = self._derive(password, salt, self.n, self.r, self.p)
+        return f"{self.algorithm}${self.n}${self.r}${self.p}${_b64encode(salt)}${_b64encode(digest)}"
+
+    @classmethod
+    def verify(cls, password, encoded):
+        _, n, r, p, salt, digest = encoded.split('$')
+        expected = _b64decode(digest)
+        actual = cls._derive(password, _b64decode(salt), int(n), int(r), int(p))
+        return hmac.compare_digest(actual, expected)
+
+    def needs_update(self, encoded):
+        _, n, r, p = encoded.split('$')[:4]
+        return (int(n), int(r), int(p)) != (self.n, self.r, self.p)
+
+
+HASHERS = {
+    Pbkdf2Hasher.algorithm: Pbkdf2Hasher,
+    ScryptHasher.algorithm: ScryptHasher,
+}
+
+
+def get_hasher(algorithm=None):
+    """按配置创建当前使用的哈希器"""
+    return HASHERS[algorithm or HASH_CONFIG['algorithm']]()
+
+
+def is_legacy_hash(encoded):
+    """是否为旧版本的无盐 SHA-256 哈希"""
+    return len(encoded) == 64 and '$' not in encoded
+
+
+def hash_password(password, hasher=None):
+    """使用当前算法生成密码哈希字符串"""
+    return (hasher or get_hasher()).encode(password)
+
+
+def verify_password(password, encoded):
+    """验证密码，哈希字符串格式无法识别时返回 False"""
+    if not encoded:
+        return False
+    if is_legacy_hash(encoded):
+        actual = hashlib.sha256(password.encode()).hexdigest()
+        return hmac.compare_digest(actual, encoded.lower())
+    hasher = HASHERS.get(encoded.split('$', 1)[0])
+    if hasher is None:
+        return False
+    try:
+        return hasher.verify(password, encoded)
+    except (ValueError, TypeError):
+        return False
+
+
+def needs_rehash(encoded, hasher=None):
+    """哈希字符串是否需要按当前算法和成本参数重新生成"""
+    hasher = hasher or get_hasher()
+    if is_legacy_hash(encoded) or not encoded.startswith(hasher.algorithm + '$'):
+        return True
+    return hasher.needs_update(encoded)
+
+
+def hash_executor():
+    """执行密码哈希的共享线程池"""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix='password-hash')
+    return _executor
+
+
+def measure(hasher, rounds=3):
+    """测量一次哈希计算的耗时（毫秒，取多次中的最小值）"""
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        hasher.encode('calibration-password')
+        timings.append((time.perf_counter() - start) * 1000)
+    return min(timings)
+
+
+def calibrate(target_ms=100, algorithm='pbkdf2_sha256'):
+    """选择单次哈希耗时接近 target_ms 的成本参数，返回 (哈希器, 实测耗时毫秒)"""
+    if algorithm == Pbkdf2Hasher.algorithm:
+        # PBKDF2 耗时与迭代次数成正比，先用较小的次数测速再按比例换算
+        probe = Pbkdf2Hasher(iterations=20000)
+        iterations = int(probe.iterations * target_ms / measure(probe))
+        hasher = Pbkdf2Hasher(iterations=max(10000, iterations // 1000 * 1000))
+        return hasher, measure(hasher)
+
+    # scrypt 的 n 必须是2的幂，逐级加倍直到超过目标耗时
+    best = ScryptHasher(n=2 ** 10, r=8, p=1)
+    elapsed = measure(best)
+    while elapsed < target_ms:
+        candidate = ScryptHasher(n=best.n * 2, r=8, p=1)
+        candidate_elapsed = measure(candidate)
+        if candidate_elapsed > target_ms and target_ms - elapsed < candidate_elapsed - target_ms:
+            break
+        best, elapsed = candidate, candidate_elapsed
+    return best, elapsed
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="密码哈希成本参数测定")
+    parser.add_argument('--calibrate', action='store_true', help="测定达到目标耗时的成本参数")
+    parser.add_argument('--target-ms', type=float, default=100, help="单次哈希的目标耗时（毫秒）")
+    parser.add_argument('--algorithm', choices=sorted(HASHERS), default=HASH_CONFIG['algorithm'])
+    args = parser.parse_args(argv)
+
+    if not args.calibrate:
+        hasher = get_hasher(args.algorithm)
+        print(f"当前配置 {args.algorithm}: 单次哈希 {measure(hasher):.1f} ms")
+        return 0
+
+    hasher, elapsed = calibrate(args.target_ms, args.algorithm)
+    print(f"目标 {args.target_ms:.0f} ms，实测 {elapsed:.1f} ms")
+    print("请在 HASH_CONFIG 中设置：")
+    if isinstance(hasher, Pbkdf2Hasher):
+        print(f"    'algorithm': 'pbkdf2_sha256',\n    'pbkdf2_iterations': {hasher.iterations},")
+    else:
+        print(f"    'algorithm': 'scrypt',\n    'scrypt_n': {hasher.n},\n"
+              f"    'scrypt_r': {hasher.r},\n    'scrypt_p': {hasher.p},")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+PDF后台提取引擎
+在进程池中按页码区间并行提取PDF文本和目录，通过队列把逐页进度和
+部分目录结果送回Tk主线程（由 after() 轮询），窗口关闭时可取消。
+"""
+
+import os
+import queue
+import hashlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import fitz  # PyMuPDF
+
+import toc_parser
+
+# 提取逻辑变更时递增，用于区分不同版本的提取结果
+EXTRACTOR_VERSION = 2
+
+# 每个子任务处理的页数
+PAGES_PER_TASK = 50
+
+# Tk 轮询队列的间隔（毫秒）
+POLL_INTERVAL_MS = 100
+
+# 计算文件哈希时每次读取的字节数
+HASH_CHUNK_SIZE = 1024 * 1024
+
+def file_sha256(path, chunk_size=HASH_CHUNK_SIZE):
+    """分块读取文件计算SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def extract_page_range(pdf_path, start, end, progress_queue, cancel_event, job_id):
+    """在子进程中提取 [start, end) 页的文本、页面尺寸，并为每页的目录行打分
+
+    返回 (start, 页面列表, [(页码, 得分, 目录行)])，目录页由主进程合并各区间后选出，
+    这样跨区间的多页目录也能识别。
+    """
+    pages = []
+    page_results = []
+    doc = fitz.open(pdf_path)
+    try:
+        for page_index in range(start, end):
+            if cancel_event.is_set():
+                break
+            page = doc.load_page(page_index)
+            text = page.get_text("text")
+            score, page_rows = toc_parser.score_page(text, page_index + 1)
+            pages.append({
+                'page': page_index + 1,
+                'text': text,
+                'width': page.rect.width,
+                'height': page.rect.height
+            })
+            page_results.append((page_index + 1, score, page_rows))
+            # 进度中只带可能是目录页的行，最终目录以 _finish 中的选择为准
+            if score < toc_parser.CONTINUATION_THRESHOLD:
+                page_rows = []
+            progress_queue.put(('page', job_id, page_index + 1, page_rows))
+    finally:
+        doc.close()
+    return start, pages, page_results
+
+
+class ExtractionJob:
+    """一次PDF提取任务，在Tk主线程中轮询进度并回调"""
+
+    def __init__(self, engine, job_id, pdf_path, page_count, futures, widget,
+                 on_progress=None, on_toc=None, on_done=None, on_error=None,
+                 cache=None, hash_future=None, cached_result=None):
+        self.engine = engine
+        self.job_id = job_id
+        self.pdf_path = pdf_path
+        self.page_count = page_count
+        self.futures = futures
+        self.widget = widget
+        self.cache = cache
+        self.hash_future = hash_future
+        self.cached_result = cached_result
+        self.sha256 = None
+        self.on_progress = on_progress
+        self.on_toc = on_toc
+        self.on_done = on_done
+        self.on_error = on_error
+
+        self.pages_done = 0
+        self.cancelled = False
+        self.finished = False
+        self._after_id = None
+
+    def start_polling(self):
+        """开始在Tk事件循环中轮询"""
+        self._after_id = self.widget.after(POLL_INTERVAL_MS, self._poll)
+
+    def cancel(self):
+        """取消任务：通知子进程停止，丢弃尚未开始的子任务"""
+        if self.finished or self.cancelled:
+            return
+        self.cancelled = True
+        self.engine.cancel_event(self.job_id).set()
+        for future in self.futures:
+            future.cancel()
+        if self._after_id:
+            try:
+                self.widget.after_cancel(self._after_id)
+            except Exception:
+                pass
+            self._after_id = None
+        self.engine.discard_job(self.job_id)
+
+    def _poll(self):
+        """处理队列中的进度消息，所有子任务结束后合并结果"""
+        self._after_id = None
+        if self.cancelled:
+            return
+
+        if self.cached_result is None and self.hash_future is not None and self.hash_future.done():
+            self._check_cache()
+        if self.cached_result is not None:
+            self._finish()
+            return
+
+        # 先判断是否全部完成再取消息，保证完成前发出的进度都已处理
+        all_done = all(future.done() for future in self.futures)
+        if self.hash_future is not None:
+            all_done = all_done and self.hash_future.done()
+        for _, page_number, page_rows in self.engine.drain(self.job_id):
+            self.pages_done += 1
+            if self.on_progress:
+                self.on_progress(self.pages_done, self.page_count)
+            if page_rows and self.on_toc:
+                self.on_toc(page_rows)
+
+        if all_done:
+            self._finish()
+        else:
+            self._after_id = self.widget.after(POLL_INTERVAL_MS, self._poll)
+
+    def _check_cache(self):
+        """文件哈希算出后查询缓存，命中时取消仍在进行的页面提取"""
+        future, self.hash_future = self.hash_future, None
+        try:
+            self.sha256 = future.result()
+        except Exception as e:
+            print(f"计算文件哈希错误: {e}")
+            return
+        cached = self.cache.load(self.sha256, self.pdf_path)
+        if cached is None:
+            return
+        self.cache.remember_path(self.pdf_path, self.sha256)
+        self.engine.cancel_event(self.job_id).set()
+        for range_future in self.futures:
+            range_future.cancel()
+        self.cached_result = cached
+
+    def _finish(self):
+        """按页码顺序合并各子任务的结果"""
+        self.finished = True
+        self.engine.discard_job(self.job_id)
+        if self.cached_result is not None:
+            if self.on_done:
+                self.on_done(self.cached_result)
+            return
+        try:
+            parts = sorted(future.result() for future in self.futures)
+        except Exception as e:
+            print(f"PDF提取错误: {e}")
+            if self.on_error:
+                self.on_error(e)
+            return
+
+        result = {
+            'path': self.pdf_path,
+            'page_count': self.page_count,
+            'pages': [page for _, pages, _ in parts for page in pages],
+            'toc': toc_parser.select_toc_rows([r for _, _, results in parts for r in results])
+        }
+        if self.cache is not None and self.sha256:
+            result['sha256'] = self.sha256
+            try:
+                self.cache.store(self.pdf_path, self.sha256, result)
+            except Exception as e:
+                print(f"保存提取缓存错误: {e}")
+        if self.on_done:
+            self.on_done(result)
+
+
+class PDFExtractionEngine:
+    """PDF提取引擎，管理进程池和跨进程进度队列"""
+
+    def __init__(self, max_workers=None, pages_per_task=PAGES_PER_TASK):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.pages_per_task = pages_per_task
+        self._executor = None
+        self._manager = None
+        self._queue = None
+        self._cancel_events = {}
+        self._pending = {}
+        self._next_job_id = 0
+
+    def _ensure_started(self):
+        """首次使用时启动进程池"""
+        if self._executor is None:
+            self._manager = multiprocessing.Manager()
+            self._queue = self._manager.Queue()
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+
+    def extract(self, pdf_path, widget, on_progress=None, on_toc=None, on_done=None, on_error=None,
+                cache=None):
+        """提交PDF提取任务，大文件按页码区间拆分到多个进程
+
+        传入 cache（ExtractionCache）时，已缓存的文件直接返回缓存结果；
+        否则在进程池中同时计算文件哈希，哈希命中缓存时取消提取。
+        """
+        self._ensure_started()
+
+        self._next_job_id += 1
+        job_id = self._next_job_id
+        cancel_event = self._manager.Event()
+        self._cancel_events[job_id] = cancel_event
+        self._pending[job_id] = []
+
+        cached = cache.lookup_path(pdf_path) if cache is not None else None
+        if cached is not None:
+            job = ExtractionJob(self, job_id, pdf_path, cached['page_count'], [], widget,
+                                on_progress, on_toc, on_done, on_error, cached_result=cached)
+            job.start_polling()
+            return job
+
+        with fitz.open(pdf_path) as doc:
+            page_count = doc.page_count
+
+        hash_future = self._executor.submit(file_sha256, pdf_path) if cache is not None else None
+        futures = []
+        for start in range(0, page_count, self.pages_per_task):
+            end = min(start + self.pages_per_task, page_count)
+            futures.append(self._executor.submit(
+                extract_page_range, pdf_path, start, end, self._queue, cancel_event, job_id))
+
+        job = ExtractionJob(self, job_id, pdf_path, page_count, futures, widget,
+                            on_progress, on_toc, on_done, on_error,
+                            cache=cache, hash_future=hash_future)
+        job.start_polling()
+        return job
+
+    def cancel_event(self, job_id):
+        return self._cancel_events[job_id]
+
+    def drain(self, job_id):
+        """取出某个任务的全部待处理消息（其他任务的消息暂存）"""
+        while True:
+            try:
+                _, message_job_id, page_number, page_rows = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if message_job_id in self._pending:
+                self._pending[message_job_id].append((message_job_id, page_number, page_rows))
+        messages = self._pending.get(job_id, [])
+        if job_id in self._pending:
+            self._pending[job_id] = []
+        return messages
+
+    def discard_job(self, job_id):
+        self._cancel_events.pop(job_id, None)
+        self._pending.pop(job_id, None)
+
+    def shutdown(self):
+        """取消所有任务并关闭进程池"""
+        for cancel_event in self._cancel_events.values():
+            cancel_event.set()
+        self._cancel_events.clear()
+        self._pending.clear()
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        if self._manager:
+            self._manager.shutdown()
+            self._manager = None
+            self._queue = None
+
+
+_engine = None
+
+
+def get_extraction_engine():
+    """获取全局共享的提取引擎（进程池启动开销较大，整个应用共用一个）"""
+    global _engine
+    if _engine is None:
+        _engine = PDFExtractionEngine()
+    return _engine
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+PDF页面渐进式分块渲染
+在 Canvas 上显示一页PDF：先显示整页的低分辨率预览（放大铺满），再在后台线程中
+按目标缩放渲染当前可见区域的图块，逐块替换预览。
+
+- 只渲染可见（及周围一圈）的图块，滚出视野的图块归还图像池
+- 图块直接由 fitz 渲染为 PPM 数据交给 tk.PhotoImage，不经过 PIL
+- PhotoImage 对象放入图像池重复使用，翻页、滚动时不反复创建
+- 翻页或缩放后，后台尚未开始的旧图块直接跳过，已完成的旧结果被丢弃
+"""
+
+import queue
+from concurrent.futures import ThreadPoolExecutor
+
+import tkinter as tk
+import fitz  # PyMuPDF
+
+from page_cache import open_document
+
+# 图块边长（像素）
+TILE_SIZE = 512
+
+# 预览的缩放为目标缩放的 1/PREVIEW_SCALE，显示时用 Tk 整数放大铺满
+PREVIEW_SCALE = 4
+
+# 可见区域外额外预渲染的图块圈数
+TILE_MARGIN = 1
+
+# 图像池最多保留的 PhotoImage 数
+MAX_POOLED_IMAGES = 48
+
+# Tk 轮询渲染结果的间隔（毫秒）
+POLL_INTERVAL_MS = 30
+
+
+def page_geometry(path, page_number, zoom=1.0, rotation=0):
+    """目标缩放下整页的像素尺寸和页数：(宽, 高, 页数)，页码越界时返回 None"""
+    doc = open_document(path)
+    if not 1 <= page_number <= doc.page_count:
+        return None
+    page = doc.load_page(page_number - 1)
+    bounds = page.rect * fitz.Matrix(zoom, zoom).prerotate(rotation)
+    return int(round(bounds.width)), int(round(bounds.height)), doc.page_count
+
+
+def render_tile(path, page_number, zoom, rotation, x0, y0, x1, y1):
+    """渲染页面上 (x0, y0)-(x1, y1) 像素区域为PPM数据
+
+    区域坐标以整页渲染结果的左上角为原点，返回 (实际左上角x, 实际左上角y, PPM数据)。
+    """
+    doc = open_document(path)
+    page = doc.load_page(page_number - 1)
+    matrix = fitz.Matrix(zoom, zoom).prerotate(rotation)
+    origin = (page.rect * matrix).tl
+    # 像素区域换算回页面坐标作为裁剪框（旋转时同样适用）
+    clip = fitz.Rect(x0 + origin.x, y0 + origin.y, x1 + origin.x, y1 + origin.y) * ~matrix
+    pixmap = page.get_pixmap(matrix=matrix, clip=clip, alpha=False)
+    return pixmap.x - origin.x, pixmap.y - origin.y, pixmap.tobytes("ppm")
+
+
+class TiledPageRenderer:
+    """在 Canvas 上渐进式显示PDF页面（show_page 等方法只能在界面线程中调用）"""
+
+    def __init__(self, canvas, cache=None, scrollbar=None, tile_size=TILE_SIZE,
+                 preview_scale=PREVIEW_SCALE, max_pooled_images=MAX_POOLED_IMAGES):
+        self.canvas = canvas
+        self.cache = cache  # PageRenderCache，缓存整页预览
+        self.scrollbar = scrollbar
+        self.tile_size = tile_size
+        self.preview_scale = preview_scale
+        self.max_pooled_images = max_pooled_images
+
+        self.path = None
+        self.file_id = None
+        self.page_number = None
+        self.page_count = None
+        self.zoom = 1.0
+        self.rotation = 0
+        self.page_size = None  # 目标缩放下的页面像素尺寸
+
+        self._generation = 0  # 每次翻页/缩放加一，用于丢弃过期的渲染结果
+        self._tiles = {}  # (列, 行) -> (canvas 图元ID, PhotoImage)
+        self._pending = set()  # 已提交渲染的图块
+        self._preview_item = None
+        self._preview_image = None
+        self._pool = []
+        self._results = queue.SimpleQueue()
+        self._outstanding = 0  # 已提交尚未处理结果的渲染任务数
+        self._after_id = None
+        self._closed = False
+        # 单线程按提交顺序渲染，预览总是先于图块完成
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='page-render')
+
+        self.canvas.configure(yscrollcommand=self._on_scroll,
+                              xscrollcommand=lambda first, last: self.update_visible_tiles())
+        self.canvas.bind('<Configure>', lambda event: self.update_visible_tiles(), add='+')
+
+    def show_page(self, path, page_number, zoom=None, rotation=None, file_id=None):
+        """显示某一页：先提交整页预览，预览显示后再渲染可见图块"""
+        if self._closed:
+            return
+        self.path = path
+        self.file_id = file_id if file_id is not None else path
+        self.page_number = page_number
+        self.zoom = zoom or self.zoom
+        self.rotation = self.rotation if rotation is None else rotation
+        self.page_size = None
+
+        self._generation += 1
+        self._clear_tiles()
+        self._submit(self._render_preview, self._generation, self.file_id, path, page_number,
+                     self.zoom, self.rotation)
+
+    def next_page(self, step=1):
+        """前后翻页（页码越界时不动）"""
+        if self.page_number is None:
+            return
+        target = self.page_number + step
+        if 1 <= target <= (self.page_count or target):
+            self.show_page(self.path, target, file_id=self.file_id)
+            self.canvas.yview_moveto(0)
+
+    def set_zoom(self, zoom):
+        """按新的缩放重新显示当前页"""
+        if self.page_number is not None and zoom != self.zoom:
+            self.show_page(self.path, self.page_number, zoom=zoom, file_id=self.file_id)
+
+    def update_visible_tiles(self):
+        """提交可见区域内尚未渲染的图块，回收离开可见区域的图块"""
+        if self.page_size is None or self._closed:
+            return
+        width, height = self.page_size
+        size = self.tile_size
+        left = self.canvas.canvasx(0)
+        top = self.canvas.canvasy(0)
+        right = left + self.canvas.winfo_width()
+        bottom = top + self.canvas.winfo_height()
+
+        columns = range(max(0, int(left // size) - TILE_MARGIN),
+                        min(-(-width // size), int(right // size) + 1 + TILE_MARGIN))
+        rows = range(max(0, int(top // size) - TILE_MARGIN),
+                     min(-(-height // size), int(bottom // size) + 1 + TILE_MARGIN))
+        wanted = {(column, row) for column in columns for row in rows}
+
+        for tile in [tile for tile in self._tiles if tile not in wanted]:
+            item, image = self._tiles.pop(tile)
+            self.canvas.delete(item)
+            self._release(image)
+        self._pending &= wanted
+
+        # 离视野中心近的图块先渲染
+        center_x, center_y = (left + right) / 2, (top + bottom) / 2
+        missing = sorted((tile for tile in wanted if tile not in self._tiles and tile not in self._pending),
+                         key=lambda t: (abs((t[0] + 0.5) * size - center_x) + abs((t[1] + 0.5) * size - center_y)))
+        for column, row in missing:
+            self._pending.add((column, row))
+            box = (column * size, row * size, min(width, (column + 1) * size), min(height, (row + 1) * size))
+            self._submit(self._render_tile, self._generation, (column, row),
+                         self.path, self.page_number, self.zoom, self.rotation, box)
+
+    def close(self):
+        """停止后台渲染，释放图像"""
+        self._closed = True
+        self._generation += 1
+        if self._after_id is not None:
+            try:
+                self.canvas.after_cancel(self._after_id)
+            except Exception:
+                pass
+            self._after_id = None
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._clear_tiles()
+        self._pool.clear()
+
+    # ---------------------------------------------------------- 后台线程
+
+    def _render_preview(self, generation, file_id, path, page_number, zoom, rotation):
+        if generation != self._generation:
+            return None
+        geometry = page_geometry(path, page_number, zoom, rotation)
+        if geometry is None:
+            return None
+        preview_zoom = zoom / self.preview_scale
+        if self.cache is not None:
+            data = self.cache.get(file_id, path, page_number, preview_zoom, rotation)
+        else:
+            data = render_tile(path, page_number, preview_zoom, rotation,
+                               0, 0, geometry[0] / self.preview_scale, geometry[1] / self.preview_scale)[2]
+        return 'preview', generation, geometry, data
+
+    def _render_tile(self, generation, tile, path, page_number, zoom, rotation, box):
+        # 翻页后尚未开始的旧图块直接跳过
+        if generation != self._generation:
+            return None
+        x, y, data = render_tile(path, page_number, zoom, rotation, *box)
+        return 'tile', generation, tile, (x, y, data)
+
+    # ---------------------------------------------------------- 界面线程
+
+    def _submit(self, fn, *args):
+        future = self._executor.submit(fn, *args)
+        future.add_done_callback(self._results.put)
+        self._outstanding += 1
+        if self._after_id is None:
+            self._after_id = self.canvas.after(POLL_INTERVAL_MS, self._poll)
+
+    def _poll(self):
+        """处理后台渲染完成的预览和图块"""
+        self._after_id = None
+        if self._closed:
+            return
+        while True:
+            try:
+                future = self._results.get_nowait()
+            except queue.Empty:
+                break
+            self._outstanding -= 1
+            if future.cancelled():
+                continue
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"页面渲染错误: {e}")
+                continue
+            if result is None or result[1] != self._generation:
+                continue
+            if result[0] == 'preview':
+                self._show_preview(*result[2:])
+            else:
+                self._show_tile(*result[2:])
+
+        if self._outstanding:
+            self._after_id = self.canvas.after(POLL_INTERVAL_MS, self._poll)
+
+    def _show_preview(self, geometry, data):
+        width, height, self.page_count = geometry
+        self.page_size = (width, height)
+        self.canvas.configure(scrollregion=(0, 0, width, height))
+
+        small = self._acquire(data)
+        if self._preview_image is None:
+            self._preview_image = tk.PhotoImage(master=self.canvas)
+        else:
+            self._preview_image.blank()
+        # Tk 的 copy -zoom 把预览整数放大到复用的图像中（PhotoImage.zoom 每次都会新建图像）
+        self._preview_image.tk.call(self._preview_image, 'copy', small,
+                                    '-zoom', self.preview_scale, self.preview_scale)
+        self._release(small)
+        if self._preview_item is None:
+            self._preview_item = self.canvas.create_image(0, 0, anchor='nw', image=self._preview_image,
+                                                          tags=('page',))
+        self.canvas.lower(self._preview_item)
+        self.update_visible_tiles()
+        if self.cache is not None:
+            # 缓存中保存的是整页预览，翻页时相邻页的预览可直接取用
+            self.cache.prefetch(self.file_id, self.path, self.page_number, self.zoom / self.preview_scale,
+                                self.rotation, page_count=self.page_count)
+
+    def _show_tile(self, tile, rendered):
+        if tile not in self._pending:
+            # 渲染期间已滚出可见区域
+            return
+        self._pending.discard(tile)
+        x, y, data = rendered
+        image = self._acquire(data)
+        item = self.canvas.create_image(x, y, anchor='nw', image=image, tags=('page', 'tile'))
+        self._tiles[tile] = (item, image)
+
+    def _acquire(self, data):
+        """从图像池取一个 PhotoImage 并载入PPM数据"""
+        if self._pool:
+            image = self._pool.pop()
+            image.configure(data=data, format='ppm')
+        else:
+            image = tk.PhotoImage(master=self.canvas, data=data, format='ppm')
+        return image
+
+    def _release(self, image):
+        """PhotoImage 归还图像池（超过上限时丢弃）"""
+        if len(self._pool) < self.max_pooled_images:
+            self._pool.append(image)
+
+    def _clear_tiles(self):
+        for item, image in self._tiles.values():
+            self.canvas.delete(item)
+            self._release(image)
+        self._tiles.clear()
+        self._pending.clear()
+        if self._preview_image is not None:
+            self._preview_image.blank()
+
+    def _on_scroll(self, first, last):
+        if self.scrollbar is not None:
+            self.scrollbar.set(first, last)
+        self.update_visible_tiles()
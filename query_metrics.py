@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+数据库查询统计
+DatabaseManager 每执行一条语句就把一个 QueryEvent 交给已注册的钩子。
+默认钩子 QueryMetrics 按语句统计次数、耗时分布（直方图）、返回/影响行数和调用方法，
+耗时超过阈值的语句写入按大小轮转的慢查询日志，程序退出时可输出汇总。
+"""
+
+import atexit
+import json
+import logging
+import os
+import threading
+from collections import Counter, namedtuple
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+
+# kind: query / update / insert / execute（事务中的语句）
+QueryEvent = namedtuple('QueryEvent', 'kind statement params elapsed_ms rows caller error')
+
+# 直方图的桶上限（毫秒），最后一个桶收集所有更慢的语句
+HISTOGRAM_BOUNDS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, float('inf'))
+
+DEFAULT_SLOW_QUERY_LOG = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'logs', 'slow_query.log')
+
+_metrics = None
+_metrics_lock = threading.Lock()
+
+
+def normalize_statement(statement):
+    """合并空白字符，作为统计的键"""
+    return ' '.join(statement.split())
+
+
+class StatementStats:
+    """一条语句的统计数据"""
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.rows = 0
+        self.buckets = [0] * len(HISTOGRAM_BOUNDS_MS)
+        self.callers = Counter()
+
+    def add(self, event):
+        self.count += 1
+        if event.error is not None:
+            self.errors += 1
+        self.total_ms += event.elapsed_ms
+        self.max_ms = max(self.max_ms, event.elapsed_ms)
+        if event.rows and event.rows > 0:
+            self.rows += event.rows
+        for i, bound in enumerate(HISTOGRAM_BOUNDS_MS):
+            if event.elapsed_ms <= bound:
+                self.buckets[i] += 1
+                break
+        self.callers[event.caller] += 1
+
+    def percentile(self, fraction):
+        """按直方图估算分位数（返回所在桶的上限）"""
+        target = self.count * fraction
+        seen = 0
+        for bound, count in zip(HISTOGRAM_BOUNDS_MS, self.buckets):
+            seen += count
+            if seen >= target and count:
+                return min(bound, self.max_ms)
+        return self.max_ms
+
+
+class QueryMetrics:
+    """查询统计和慢查询日志（线程安全，可直接作为 DatabaseManager 的钩子）"""
+
+    def __init__(self, slow_query_ms=200, slow_query_log=DEFAULT_SLOW_QUERY_LOG,
+                 max_bytes=5 * 1024 * 1024, backup_count=5, log_params=False):
+        self.slow_query_ms = slow_query_ms
+        self.log_params = log_params
+        self._stats = {}
+        self._lock = threading.Lock()
+
+        self._slow_logger = None
+        if slow_query_log:
+            os.makedirs(os.path.dirname(slow_query_log) or '.', exist_ok=True)
+            handler = RotatingFileHandler(slow_query_log, maxBytes=max_bytes,
+                                          backupCount=backup_count, encoding='utf-8', delay=True)
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            self._slow_logger = logging.getLogger(f'slow_query.{id(self)}')
+            self._slow_logger.propagate = False
+            self._slow_logger.setLevel(logging.INFO)
+            self._slow_logger.addHandler(handler)
+
+    def __call__(self, event):
+        key = normalize_statement(event.statement)
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = StatementStats()
+            stats.add(event)
+
+        if self._slow_logger and event.elapsed_ms >= self.slow_query_ms:
+            record = {
+                'time': datetime.now().isoformat(timespec='milliseconds'),
+                'elapsed_ms': round(event.elapsed_ms, 2),
+                'kind': event.kind,
+                'rows': event.rows,
+                'caller': event.caller,
+                'statement': key,
+            }
+            if self.log_params:
+                record['params'] = repr(event.params)
+            if event.error is not None:
+                record['error'] = str(event.error)
+            self._slow_logger.info(json.dumps(record, ensure_ascii=False))
+
+    def snapshot(self):
+        """各语句统计数据的副本：{语句: dict}"""
+        with self._lock:
+            return {
+                statement: {
+                    'count': stats.count,
+                    'errors': stats.errors,
+                    'total_ms': stats.total_ms,
+                    'avg_ms': stats.total_ms / stats.count,
+                    'p50_ms': stats.percentile(0.5),
+                    'p95_ms': stats.percentile(0.95),
+                    'max_ms': stats.max_ms,
+                    'rows': stats.rows,
+                    'histogram': dict(zip(HISTOGRAM_BOUNDS_MS, stats.buckets)),
+                    'callers': dict(stats.callers),
+                }
+                for statement, stats in self._stats.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+    def summary(self, top=20):
+        """按总耗时排序的汇总文本"""
+        snapshot = self.snapshot()
+        if not snapshot:
+            return "没有执行过数据库语句"
+        lines = [f"{'次数':>6} {'错误':>4} {'总计ms':>9} {'平均ms':>8} {'p95ms':>7} {'最大ms':>8} {'行数':>7}  调用方 / 语句"]
+        for statement, stats in sorted(snapshot.items(), key=lambda item: item[1]['total_ms'], reverse=True)[:top]:
+            callers = ', '.join(caller for caller, _ in Counter(stats['callers']).most_common(3))
+            lines.append(f"{stats['count']:>6} {stats['errors']:>4} {stats['total_ms']:>9.1f} {stats['avg_ms']:>8.2f} "
+                         f"{stats['p95_ms']:>7.0f} {stats['max_ms']:>8.1f} {stats['rows']:>7}  {callers}")
+            lines.append(f"{'':>48}  {statement[:120]}")
+        return '\n'.join(lines)
+
+    def dump_summary(self, top=20):
+        print("数据库语句统计（按总耗时排序）:")
+        print(self.summary(top))
+
+
+def get_query_metrics(**config):
+    """进程内共享的 QueryMetrics（第一次调用时按 config 创建）
+
+    config 中的 summary_on_exit 为 True 时，程序退出时输出汇总。
+    """
+    global _metrics
+    with _metrics_lock:
+        if _metrics is None:
+            summary_on_exit = config.pop('summary_on_exit', False)
+            _metrics = QueryMetrics(**config)
+            if summary_on_exit:
+                atexit.register(_metrics.dump_summary)
+        return _metrics
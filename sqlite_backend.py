@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SQLite 数据库后端（离线单机版和本地测试使用）
+把 sqlite3 连接包装成 DatabaseManager 使用的 mysql-connector 连接接口：
+
+- 语句中的 %s 占位符转换为 ?，datetime 参数按 MySQL DATETIME 的格式（精确到秒）存储，
+  DATETIME 列读出时转换回 datetime
+- start_transaction 使用 BEGIN IMMEDIATE，事务开始时即取得写锁，
+  代替 MySQL 中的 SELECT ... FOR UPDATE
+- sqlite3 的异常转换为 mysql.connector 的异常类型，管理类中的 except Error 同样适用；
+  没有安装 mysql-connector 时使用本模块中同名的异常类
+- 新建连接时按配置设置 PRAGMA（WAL 日志、同步级别、缓存等），
+  数据库文件不存在或结构版本较旧时执行 sqlite_schema.sql
+- 全文检索使用 FTS5：连接上注册 ngram_tokens() 函数，触发器用它把卷宗和目录文本切分为
+  字符二元组写入 FTS5 表，与 MySQL ngram 分词器（ngram_token_size=2）的行为一致
+"""
+
+import os
+import re
+import sqlite3
+import threading
+import types
+from contextlib import contextmanager
+from datetime import date, datetime
+from functools import lru_cache
+
+try:
+    from mysql.connector import Error, errors
+except ImportError:
+    # 离线单机版可以不安装 mysql-connector，异常类型与其保持一致
+    class Error(Exception):
+        """数据库错误（与 mysql.connector.Error 的构造参数相同）"""
+
+        def __init__(self, msg=None, errno=None, values=None, sqlstate=None):
+            super().__init__(msg)
+            self.msg = msg
+            self.errno = errno
+            self.sqlstate = sqlstate
+
+        def __str__(self):
+            return str(self.msg)
+
+    class InterfaceError(Error):
+        pass
+
+    class DatabaseError(Error):
+        pass
+
+    class OperationalError(DatabaseError):
+        pass
+
+    class IntegrityError(DatabaseError):
+        pass
+
+    class ProgrammingError(DatabaseError):
+        pass
+
+    class DataError(DatabaseError):
+        pass
+
+    class NotSupportedError(DatabaseError):
+        pass
+
+    class InternalError(DatabaseError):
+        pass
+
+    errors = types.SimpleNamespace(
+        Error=Error, InterfaceError=InterfaceError, DatabaseError=DatabaseError,
+        OperationalError=OperationalError, IntegrityError=IntegrityError,
+        ProgrammingError=ProgrammingError, DataError=DataError,
+        NotSupportedError=NotSupportedError, InternalError=InternalError)
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sqlite_schema.sql')
+
+# sqlite_schema.sql 对应的结构版本（记录在 PRAGMA user_version 中）
+SCHEMA_VERSION = 3
+
+# 与 MySQL ngram_token_size 一致
+NGRAM_SIZE = 2
+
+# 表示连接级故障的错误信息，其余 sqlite3.OperationalError 多为语句错误
+CONNECTION_ERROR_PATTERN = re.compile(r'locked|busy|disk|unable to open|readonly|malformed', re.IGNORECASE)
+
+PLACEHOLDER_PATTERN = re.compile(r'%(s|%)')
+
+_schema_lock = threading.Lock()
+_schema_ready = set()  # 已确认结构为最新版本的数据库文件
+
+sqlite3.register_converter('DATETIME', lambda value: datetime.fromisoformat(value.decode('utf-8')))
+
+
+def ngram_tokens(text, n=NGRAM_SIZE):
+    """把文本切分为以空格分隔的字符n元组（注册为 SQL 函数 ngram_tokens，供 FTS5 触发器使用）"""
+    tokens = []
+    for segment in re.split(r'\s+', (text or '').lower()):
+        if len(segment) <= n:
+            if segment:
+                tokens.append(segment)
+            continue
+        tokens.extend(segment[i:i + n] for i in range(len(segment) - n + 1))
+    return ' '.join(tokens)
+
+
+def fts_phrase(keyword):
+    """构造 FTS5 短语查询（n元组按顺序相邻即为子串匹配）"""
+    return '"' + ngram_tokens(keyword).replace('"', '""') + '"'
+
+
+@lru_cache(maxsize=512)
+def translate_query(query):
+    """把 mysql-connector 风格的 %s 占位符转换为 sqlite3 的 ?（%% 转换为 %）"""
+    return PLACEHOLDER_PATTERN.sub(lambda match: '?' if match.group(1) == 's' else '%', query)
+
+
+def adapt_value(value):
+    """参数转换为 SQLite 存储格式：datetime 与 MySQL DATETIME 一样精确到秒"""
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, bool):
+        return int(value)
+    return value
+
+
+def adapt_params(params):
+    if not params:
+        return ()
+    return tuple(adapt_value(value) for value in params)
+
+
+@contextmanager
+def translate_errors():
+    """把 sqlite3 的异常转换为 mysql.connector 的异常类型"""
+    try:
+        yield
+    except sqlite3.IntegrityError as e:
+        raise errors.IntegrityError(msg=str(e)) from e
+    except sqlite3.OperationalError as e:
+        if CONNECTION_ERROR_PATTERN.search(str(e)):
+            raise errors.OperationalError(msg=str(e)) from e
+        raise errors.ProgrammingError(msg=str(e)) from e
+    except sqlite3.DataError as e:
+        raise errors.DataError(msg=str(e)) from e
+    except sqlite3.ProgrammingError as e:
+        raise errors.ProgrammingError(msg=str(e)) from e
+    except sqlite3.InterfaceError as e:
+        raise errors.InterfaceError(msg=str(e)) from e
+    except sqlite3.Error as e:
+        raise errors.DatabaseError(msg=str(e)) from e
+
+
+class SQLiteCursor:
+    """与 mysql-connector 游标接口一致的 sqlite3 游标包装"""
+
+    def __init__(self, connection, dictionary=False):
+        self._cursor = connection.raw.cursor()
+        self._dictionary = dictionary
+        self.rowcount = -1
+        self.lastrowid = None
+
+    @property
+    def column_names(self):
+        return tuple(column[0] for column in self._cursor.description or ())
+
+    @property
+    def with_rows(self):
+        return self._cursor.description is not None
+
+    def execute(self, query, params=None):
+        with translate_errors():
+            self._cursor.execute(translate_query(query), adapt_params(params))
+        self.rowcount = self._cursor.rowcount
+        self.lastrowid = self._cursor.lastrowid
+
+    def executemany(self, query, seq_params):
+        with translate_errors():
+            self._cursor.executemany(translate_query(query), [adapt_params(params) for params in seq_params])
+        self.rowcount = self._cursor.rowcount
+
+    def fetchone(self):
+        with translate_errors():
+            row = self._cursor.fetchone()
+        return self._make_row(row) if row is not None else None
+
+    def fetchmany(self, size=1):
+        with translate_errors():
+            return [self._make_row(row) for row in self._cursor.fetchmany(size)]
+
+    def fetchall(self):
+        with translate_errors():
+            return [self._make_row(row) for row in self._cursor.fetchall()]
+
+    def _make_row(self, row):
+        if self._dictionary:
+            return dict(zip(self.column_names, row))
+        return row
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteConnection:
+    """与 mysql-connector 连接接口一致的 sqlite3 连接包装（供 ConnectionPool 使用）"""
+
+    def __init__(self, raw):
+        self.raw = raw
+        # 预处理游标缓存以 connection_id 判断连接是否重连过
+        self.connection_id = id(raw)
+
+    @property
+    def in_transaction(self):
+        return self.raw.in_transaction
+
+    def start_transaction(self):
+        """开始事务并立即取得写锁（等待其他写事务最长 busy_timeout 毫秒）"""
+        with translate_errors():
+            self.raw.execute("BEGIN IMMEDIATE")
+
+    def commit(self):
+        if self.raw.in_transaction:
+            with translate_errors():
+                self.raw.execute("COMMIT")
+
+    def rollback(self):
+        if self.raw.in_transaction:
+            with translate_errors():
+                self.raw.execute("ROLLBACK")
+
+    def cursor(self, buffered=None, dictionary=False, prepared=False):
+        # sqlite3 按语句文本缓存已编译的语句，prepared 不需要特殊处理
+        return SQLiteCursor(self, dictionary=dictionary)
+
+    def ping(self, reconnect=False, attempts=1, delay=0):
+        with translate_errors():
+            self.raw.execute("SELECT 1").fetchone()
+
+    def close(self):
+        try:
+            # 关闭前让 SQLite 按本连接的查询情况更新统计信息
+            self.raw.execute("PRAGMA optimize")
+        except sqlite3.Error:
+            pass
+        self.raw.close()
+
+
+def ensure_schema(raw, path, schema_path=SCHEMA_PATH):
+    """数据库结构版本低于 SCHEMA_VERSION 时执行建表脚本（脚本中的语句均可重复执行）"""
+    # 内存数据库每个连接都是独立的数据库，不能记为已就绪
+    key = os.path.abspath(path) if path != ':memory:' else None
+    with _schema_lock:
+        if key is not None and key in _schema_ready:
+            return
+        version = raw.execute("PRAGMA user_version").fetchone()[0]
+        if version < SCHEMA_VERSION:
+            with open(schema_path, encoding='utf-8') as f:
+                raw.executescript(f.read())
+            raw.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        if key is not None:
+            _schema_ready.add(key)
+
+
+def connect(path, pragmas=None, cached_statements=256):
+    """打开 SQLite 数据库，设置 PRAGMA 并确保数据库结构为最新版本"""
+    if path != ':memory:':
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with translate_errors():
+        # 事务由 start_transaction/commit 显式控制，其余语句自动提交（与 MySQL autocommit 一致）
+        raw = sqlite3.connect(path, isolation_level=None, check_same_thread=False,
+                              detect_types=sqlite3.PARSE_DECLTYPES, cached_statements=cached_statements)
+        try:
+            # 建表脚本和之后的写入都会触发 FTS5 触发器，须在执行脚本前注册
+            raw.create_function('ngram_tokens', 1, ngram_tokens, deterministic=True)
+            for name, value in (pragmas or {}).items():
+                raw.execute(f"PRAGMA {name} = {value}").fetchall()
+            ensure_schema(raw, path)
+        except BaseException:
+            raw.close()
+            raise
+    return SQLiteConnection(raw)
@@ -0,0 +1,197 @@
+-- 离线单机版 SQLite 数据库结构（与 MySQL 执行完 migrations 后的结构对应）
+-- 由 sqlite_backend.ensure_schema 在首次连接时执行，语句均可重复执行；
+-- 修改本文件时同时增大 sqlite_backend.SCHEMA_VERSION
+-- 时间列声明为 DATETIME，读出时转换为 datetime；默认值使用本地时间（与 MySQL CURRENT_TIMESTAMP 一致）
+
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT NOT NULL UNIQUE,
+    password TEXT NOT NULL,
+    full_name TEXT,
+    role TEXT NOT NULL DEFAULT 'user',
+    status TEXT NOT NULL DEFAULT 'active',
+    last_login DATETIME,
+    created_at DATETIME NOT NULL DEFAULT (datetime('now', 'localtime'))
+);
+
+CREATE TABLE IF NOT EXISTS user_sessions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    session_token TEXT NOT NULL,
+    expires_at DATETIME NOT NULL,
+    created_at DATETIME NOT NULL DEFAULT (datetime('now', 'localtime'))
+);
+CREATE INDEX IF NOT EXISTS idx_sessions_token_expires ON user_sessions (session_token, expires_at);
+CREATE INDEX IF NOT EXISTS idx_sessions_expires ON user_sessions (expires_at);
+
+CREATE TABLE IF NOT EXISTS cases (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    case_name TEXT NOT NULL,
+    case_number TEXT NOT NULL,
+    description TEXT,
+    created_by INTEGER NOT NULL,
+    status TEXT NOT NULL DEFAULT 'active',
+    directory_count INTEGER NOT NULL DEFAULT 0,
+    created_at DATETIME NOT NULL DEFAULT (datetime('now', 'localtime')),
+    updated_at DATETIME NOT NULL DEFAULT (datetime('now', 'localtime'))
+);
+CREATE INDEX IF NOT EXISTS idx_cases_owner_case_number ON cases (created_by, case_number);
+CREATE INDEX IF NOT EXISTS idx_cases_owner_case_name ON cases (created_by, case_name);
+CREATE INDEX IF NOT EXISTS idx_cases_owner_status_updated ON cases (created_by, status, updated_at, id);
+CREATE INDEX IF NOT EXISTS idx_cases_owner_updated ON cases (created_by, updated_at, id);
+
+-- sequence_no 与 MySQL 的生成列相同：目录序号开头的数字部分，没有数字时为 0
+CREATE TABLE IF NOT EXISTS case_directories (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    case_id INTEGER NOT NULL,
+    sequence_number TEXT NOT NULL,
+    file_name TEXT NOT NULL,
+    page_number INTEGER NOT NULL DEFAULT 1,
+    end_page INTEGER,
+    sort_order INTEGER NOT NULL DEFAULT 0,
+    is_custom INTEGER NOT NULL DEFAULT 0,
+    evidence_type TEXT,
+    sequence_no INTEGER GENERATED ALWAYS AS (MAX(CAST(TRIM(sequence_number) AS INTEGER), 0)) STORED,
+    created_at DATETIME NOT NULL DEFAULT (datetime('now', 'localtime')),
+    updated_at DATETIME NOT NULL DEFAULT (datetime('now', 'localtime'))
+);
+CREATE INDEX IF NOT EXISTS idx_directories_case_order ON case_directories (case_id, sort_order, sequence_no, sequence_number);
+CREATE INDEX IF NOT EXISTS idx_directories_case_evidence ON case_directories (case_id, evidence_type, sort_order);
+
+CREATE TABLE IF NOT EXISTS pdf_files (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    sha256 TEXT NOT NULL UNIQUE,
+    size_bytes INTEGER NOT NULL,
+    page_count INTEGER NOT NULL,
+    storage_path TEXT NOT NULL,
+    created_at DATETIME NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS case_files (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    case_id INTEGER NOT NULL,
+    file_id INTEGER NOT NULL,
+    original_name TEXT NOT NULL,
+    sort_order INTEGER NOT NULL DEFAULT 0,
+    created_at DATETIME NOT NULL,
+    UNIQUE (case_id, file_id)
+);
+CREATE INDEX IF NOT EXISTS idx_case_files_case_order ON case_files (case_id, sort_order);
+CREATE INDEX IF NOT EXISTS idx_case_files_file ON case_files (file_id);
+
+-- 同步到中心 MySQL 的待推送卷宗：卷宗、目录、文件有变化时由触发器记录，
+-- version 每次变化加一，推送完成后只删除推送期间没有再变化的记录
+CREATE TABLE IF NOT EXISTS sync_outbox (
+    case_id INTEGER PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 1,
+    changed_at DATETIME NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT
+);
+
+-- 本地ID与中心数据库ID的对应关系（entity: 'user' / 'case'），
+-- remote_updated_at 为上次同步后中心数据库中卷宗的 updated_at，用于发现冲突
+CREATE TABLE IF NOT EXISTS sync_id_map (
+    entity TEXT NOT NULL,
+    local_id INTEGER NOT NULL,
+    remote_id INTEGER NOT NULL,
+    remote_updated_at DATETIME,
+    PRIMARY KEY (entity, local_id)
+);
+
+CREATE TRIGGER IF NOT EXISTS trg_cases_sync_insert AFTER INSERT ON cases
+BEGIN
+    INSERT INTO sync_outbox (case_id, changed_at) VALUES (NEW.id, datetime('now', 'localtime'))
+    ON CONFLICT (case_id) DO UPDATE SET version = version + 1, changed_at = excluded.changed_at;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_cases_sync_update AFTER UPDATE ON cases
+BEGIN
+    INSERT INTO sync_outbox (case_id, changed_at) VALUES (NEW.id, datetime('now', 'localtime'))
+    ON CONFLICT (case_id) DO UPDATE SET version = version + 1, changed_at = excluded.changed_at;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_directories_sync_insert AFTER INSERT ON case_directories
+BEGIN
+    INSERT INTO sync_outbox (case_id, changed_at) VALUES (NEW.case_id, datetime('now', 'localtime'))
+    ON CONFLICT (case_id) DO UPDATE SET version = version + 1, changed_at = excluded.changed_at;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_directories_sync_update AFTER UPDATE ON case_directories
+BEGIN
+    INSERT INTO sync_outbox (case_id, changed_at) VALUES (NEW.case_id, datetime('now', 'localtime'))
+    ON CONFLICT (case_id) DO UPDATE SET version = version + 1, changed_at = excluded.changed_at;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_directories_sync_delete AFTER DELETE ON case_directories
+BEGIN
+    INSERT INTO sync_outbox (case_id, changed_at) VALUES (OLD.case_id, datetime('now', 'localtime'))
+    ON CONFLICT (case_id) DO UPDATE SET version = version + 1, changed_at = excluded.changed_at;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_case_files_sync_insert AFTER INSERT ON case_files
+BEGIN
+    INSERT INTO sync_outbox (case_id, changed_at) VALUES (NEW.case_id, datetime('now', 'localtime'))
+    ON CONFLICT (case_id) DO UPDATE SET version = version + 1, changed_at = excluded.changed_at;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_case_files_sync_update AFTER UPDATE ON case_files
+BEGIN
+    INSERT INTO sync_outbox (case_id, changed_at) VALUES (NEW.case_id, datetime('now', 'localtime'))
+    ON CONFLICT (case_id) DO UPDATE SET version = version + 1, changed_at = excluded.changed_at;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_case_files_sync_delete AFTER DELETE ON case_files
+BEGIN
+    INSERT INTO sync_outbox (case_id, changed_at) VALUES (OLD.case_id, datetime('now', 'localtime'))
+    ON CONFLICT (case_id) DO UPDATE SET version = version + 1, changed_at = excluded.changed_at;
+END;
+
+-- 全文检索（对应 MySQL 的 ngram 全文索引）：rowid 与 cases.id / case_directories.id 相同，
+-- 内容为 ngram_tokens() 切分的字符二元组，由下面的触发器维护。
+-- ngram_tokens 由 sqlite_backend.connect 在每个连接上注册，其他工具打开数据库时不能写入这些表
+CREATE VIRTUAL TABLE IF NOT EXISTS cases_fts USING fts5(case_name, case_number, description);
+CREATE VIRTUAL TABLE IF NOT EXISTS case_directories_fts USING fts5(file_name);
+
+-- 结构版本 1 的数据库升级时补建已有数据的索引
+INSERT INTO cases_fts (rowid, case_name, case_number, description)
+SELECT id, ngram_tokens(case_name), ngram_tokens(case_number), ngram_tokens(description)
+FROM cases WHERE id NOT IN (SELECT rowid FROM cases_fts);
+
+INSERT INTO case_directories_fts (rowid, file_name)
+SELECT id, ngram_tokens(file_name)
+FROM case_directories WHERE id NOT IN (SELECT rowid FROM case_directories_fts);
+
+CREATE TRIGGER IF NOT EXISTS trg_cases_fts_insert AFTER INSERT ON cases
+BEGIN
+    INSERT INTO cases_fts (rowid, case_name, case_number, description)
+    VALUES (NEW.id, ngram_tokens(NEW.case_name), ngram_tokens(NEW.case_number), ngram_tokens(NEW.description));
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_cases_fts_update AFTER UPDATE OF case_name, case_number, description ON cases
+BEGIN
+    DELETE FROM cases_fts WHERE rowid = OLD.id;
+    INSERT INTO cases_fts (rowid, case_name, case_number, description)
+    VALUES (NEW.id, ngram_tokens(NEW.case_name), ngram_tokens(NEW.case_number), ngram_tokens(NEW.description));
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_cases_fts_delete AFTER DELETE ON cases
+BEGIN
+    DELETE FROM cases_fts WHERE rowid = OLD.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_directories_fts_insert AFTER INSERT ON case_directories
+BEGIN
+    INSERT INTO case_directories_fts (rowid, file_name) VALUES (NEW.id, ngram_tokens(NEW.file_name));
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_directories_fts_update AFTER UPDATE OF file_name ON case_directories
+BEGIN
+    DELETE FROM case_directories_fts WHERE rowid = OLD.id;
+    INSERT INTO case_directories_fts (rowid, file_name) VALUES (NEW.id, ngram_tokens(NEW.file_name));
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_directories_fts_delete AFTER DELETE ON case_directories
+BEGIN
+    DELETE FROM case_directories_fts WHERE rowid = OLD.id;
+END;
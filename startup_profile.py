@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+启动耗时分析
+python main.py --profile-startup 会以 `python -X importtime` 重新启动程序，
+在登录窗口第一次绘制完成后退出，然后输出：
+
+- 从进程启动到第一帧的时间
+- 第一帧之前导入的各个模块的耗时（按累计耗时排序）
+- 推迟到打开卷宗时才导入的编辑页面模块的耗时
+
+用于跟踪冷启动时间的变化。
+"""
+
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+
+CHILD_FLAG = '--profile-startup-child'
+
+# 子进程写入 stderr 的分隔标记，之后的导入属于延迟导入
+FIRST_FRAME_MARKER = '-- first frame --'
+
+IMPORT_TIME_PATTERN = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+
+# 默认只显示累计耗时最多的模块数
+TOP_MODULES = 25
+
+
+def parse_import_times(lines):
+    """解析 -X importtime 的输出，返回 [(模块名, 自身耗时us, 累计耗时us, 嵌套层级)]"""
+    modules = []
+    for line in lines:
+        match = IMPORT_TIME_PATTERN.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            modules.append((name, int(self_us), int(cumulative_us), (len(indent) - 1) // 2))
+    return modules
+
+
+def run_child(app_factory, lazy_loader):
+    """在子进程中运行：创建应用，等第一帧绘制完成后记录时间并退出"""
+    app = app_factory()
+    app.root.update()
+    first_frame = time.time()
+
+    sys.stderr.write(FIRST_FRAME_MARKER + '\n')
+    sys.stderr.flush()
+    start = time.perf_counter()
+    lazy_error = None
+    try:
+        lazy_loader()
+    except Exception as e:
+        lazy_error = str(e)
+    lazy_ms = (time.perf_counter() - start) * 1000
+
+    print(json.dumps({'first_frame': first_frame, 'lazy_ms': lazy_ms, 'lazy_error': lazy_error}))
+    sys.stdout.flush()
+    try:
+        app.root.destroy()
+    except Exception:
+        pass
+    return 0
+
+
+def profile_startup(script_path, top=TOP_MODULES):
+    """启动子进程并输出启动耗时报告"""
+    launched = time.time()
+    process = subprocess.run(
+        [sys.executable, '-X', 'importtime', os.path.abspath(script_path), CHILD_FLAG],
+        capture_output=True, text=True)
+
+    result = None
+    for line in process.stdout.splitlines():
+        if line.startswith('{'):
+            result = json.loads(line)
+    if result is None:
+        print("启动分析失败：程序没有显示第一帧")
+        print(process.stderr[-2000:])
+        return 1
+
+    stderr_lines = process.stderr.splitlines()
+    split = stderr_lines.index(FIRST_FRAME_MARKER) if FIRST_FRAME_MARKER in stderr_lines else len(stderr_lines)
+    startup_modules = parse_import_times(stderr_lines[:split])
+    lazy_modules = parse_import_times(stderr_lines[split:])
+
+    print(f"进程启动到第一帧: {(result['first_frame'] - launched) * 1000:.0f} ms")
+    print(f"第一帧之前的导入: {sum(m[1] for m in startup_modules) / 1000:.0f} ms，共 {len(startup_modules)} 个模块")
+    print(f"\n累计耗时最多的模块（前 {top} 个）:")
+    print(f"{'累计(ms)':>10} {'自身(ms)':>10}  模块")
+    for name, self_us, cumulative_us, level in sorted(startup_modules, key=lambda m: m[2], reverse=True)[:top]:
+        print(f"{cumulative_us / 1000:>10.1f} {self_us / 1000:>10.1f}  {'  ' * level}{name}")
+
+    print(f"\n延迟导入（编辑卷宗页面）: {result['lazy_ms']:.0f} ms，共 {len(lazy_modules)} 个模块")
+    if result['lazy_error']:
+        print(f"    导入失败: {result['lazy_error']}")
+    for name, self_us, cumulative_us, level in lazy_modules:
+        if level == 0:
+            print(f"{cumulative_us / 1000:>10.1f}  {name}")
+    return 0
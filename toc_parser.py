@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+卷宗目录识别
+支持的目录行格式（README 中列出的四种，序号和页码可以是全角数字）:
+
+    1 文件名称 10
+    1. 文件名称 10
+    (1) 文件名称 10
+    1） 文件名称 10
+
+每页先用一个很便宜的预筛（行尾数字个数、"目录"标题）排除正文页，
+只有候选页才用合并后的预编译正则一次匹配整页文本。每个候选页按匹配行占比、
+页码是否递增、序号是否连续打分，得分足够的页作为目录页；
+紧接在目录页之后且序号连续的页作为目录的续页（多页目录）。
+
+用法:
+    python toc_parser.py --benchmark <语料目录> [--workers N]
+    python toc_parser.py --benchmark --synthetic 200 [--workers N]
+
+语料目录中每个 *.json 文件是一份卷宗：
+    {"pages": ["第1页文本", "第2页文本", ...],
+     "toc": [{"number": "1", "title": "起诉意见书", "page": 3}, ...]}
+"""
+
+import argparse
+import glob
+import json
+import os
+import random
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# 全角数字和标点转半角
+FULLWIDTH_TABLE = str.maketrans({
+    **{chr(0xFF10 + i): str(i) for i in range(10)},
+    '（': '(', '）': ')', '．': '.', '　': ' ', '…': '.', '·': '.', '－': '-',
+})
+
+# 合并四种格式的目录行（多行模式下一次匹配整页文本）
+TOC_LINE_PATTERN = re.compile(
+    r'^[ \t]*'
+    r'(?:\((?P<paren_number>\d{1,4})\)|(?P<number>\d{1,4})[).、]?)'
+    r'[ \t]*'
+    r'(?P<title>[^\n]*?[一-鿿][^\n]*?)'
+    r'[ \t.\-_]*'
+    r'(?P<page>\d{1,5})[ \t]*$',
+    re.MULTILINE
+)
+
+# 预筛：以数字结尾的行、目录标题
+LINE_END_DIGIT_PATTERN = re.compile(r'\d[ \t]*$', re.MULTILINE)
+TOC_HEADING_PATTERN = re.compile(r'(?:卷\s*内\s*)?目\s*录')
+
+# 没有"目录"标题时，一页至少需要的目录行数
+MIN_ROWS = 3
+
+# 目录页得分阈值；续页（紧接目录页且序号连续）的较低阈值
+TOC_PAGE_THRESHOLD = 0.5
+CONTINUATION_THRESHOLD = 0.25
+
+# 只在页首附近查找"目录"标题
+HEADING_SEARCH_CHARS = 200
+
+
+def normalize_text(text):
+    """全角数字和标点转半角"""
+    return (text or '').translate(FULLWIDTH_TABLE)
+
+
+def parse_rows(text, page_number=None):
+    """解析一页（已转半角的）文本中的全部目录行"""
+    rows = []
+    for match in TOC_LINE_PATTERN.finditer(text):
+        rows.append({
+            'number': match.group('paren_number') or match.group('number'),
+            'title': match.group('title').strip(),
+            'page': int(match.group('page')),
+            'source_page': page_number
+        })
+    return rows
+
+
+def score_rows(rows, line_count, has_heading):
+    """按目录行占比、页码递增、序号连续给一页打分（0~1）
+
+    正文中偶尔出现的形似目录行占比低，即使恰好递增也只能得到很低的分数。
+    """
+    if not rows:
+        return 0.0
+    pairs = len(rows) - 1
+    if pairs:
+        ordered = sum(1 for a, b in zip(rows, rows[1:]) if b['page'] >= a['page']) / pairs
+        sequential = sum(1 for a, b in zip(rows, rows[1:]) if int(b['number']) == int(a['number']) + 1) / pairs
+    else:
+        ordered = sequential = 0.5
+    ratio = min(1.0, len(rows) / max(1, line_count))
+    score = min(1.0, ratio * (0.4 + 0.3 * ordered + 0.3 * sequential) + (0.1 if has_heading else 0.0))
+    if len(rows) < MIN_ROWS and not has_heading:
+        score *= 0.5
+    return score
+
+
+def score_page(text, page_number=None):
+    """识别一页的目录行并打分，返回 (得分, 目录行)；非候选页直接返回 (0.0, [])"""
+    text = normalize_text(text)
+    has_heading = TOC_HEADING_PATTERN.search(text, 0, HEADING_SEARCH_CHARS) is not None
+    candidates = len(LINE_END_DIGIT_PATTERN.findall(text))
+    if candidates == 0 or (candidates < MIN_ROWS and not has_heading):
+        return 0.0, []
+    rows = parse_rows(text, page_number)
+    if not rows:
+        return 0.0, []
+    line_count = sum(1 for line in text.splitlines() if line.strip())
+    return score_rows(rows, line_count, has_heading), rows
+
+
+def select_toc_rows(page_results):
+    """从各页的 (页码, 得分, 目录行) 中选出目录页，合并为完整目录（支持多页目录）"""
+    toc = []
+    last_page = None
+    last_number = None
+    for page_number, score, rows in sorted(page_results, key=lambda result: result[0]):
+        if not rows:
+            continue
+        continues = (last_page is not None and page_number == last_page + 1
+                     and int(rows[0]['number']) == last_number + 1)
+        if score >= TOC_PAGE_THRESHOLD or (continues and score >= CONTINUATION_THRESHOLD):
+            toc.extend(rows)
+            last_page = page_number
+            last_number = int(rows[-1]['number'])
+    return toc
+
+
+def detect_toc(pages):
+    """识别一份文档的目录，pages 为按页顺序的文本列表（页码从1开始）"""
+    return select_toc_rows([(i, *score_page(text, i)) for i, text in enumerate(pages, 1)])
+
+
+def _score_page_chunk(chunk):
+    return [(page_number, *score_page(text, page_number)) for page_number, text in chunk]
+
+
+def detect_toc_parallel(pages, max_workers=None, pages_per_task=200, executor=None):
+    """在进程池中按页区间并行打分，再合并选出目录"""
+    numbered = list(enumerate(pages, 1))
+    chunks = [numbered[i:i + pages_per_task] for i in range(0, len(numbered), pages_per_task)]
+    if executor is not None:
+        return select_toc_rows([r for part in executor.map(_score_page_chunk, chunks) for r in part])
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        return select_toc_rows([r for part in pool.map(_score_page_chunk, chunks) for r in part])
+
+
+def detect_toc_many(documents, max_workers=None, executor=None, chunksize=8):
+    """在进程池中并行识别多份文档的目录，documents 为页面文本列表的列表"""
+    if executor is not None:
+        return list(executor.map(detect_toc, documents, chunksize=chunksize))
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        return list(pool.map(detect_toc, documents, chunksize=chunksize))
+
+
+# ---------------------------------------------------------------- 基准测试
+
+SAMPLE_TITLES = ['起诉意见书', '受案登记表', '立案决定书', '询问笔录', '讯问笔录', '搜查证', '扣押决定书',
+                 '鉴定意见通知书', '证人证言', '辨认笔录', '现场勘验笔录', '户籍证明', '到案经过', '情况说明']
+SAMPLE_BODY = ['经审查，犯罪嫌疑人于2023年5月12日在本市某区实施盗窃，涉案金额共计人民币3200元。',
+               '以上笔录我看过，和我说的相符。', '问：你的基本情况？', '答：我叫张某，1988年出生。',
+               '第 12 页', '本院认为，被告人的行为已构成犯罪。', '2023年6月1日',
+               # 正文中形似目录行的干扰行
+               '1. 被告人张某 男 35', '2 涉案手机 1', '(3) 扣押物品清单 共 4']
+
+
+def synthetic_document(rng, toc_pages=None):
+    """生成一份带目录的合成卷宗（随机格式、全角数字、多页目录）"""
+    toc_pages = toc_pages or rng.choice([1, 1, 2, 3])
+    entries = rng.randint(12, 30) * toc_pages
+    formats = ['{n} {t} {p}', '{n}. {t} {p}', '({n}) {t} {p}', '{n}） {t} {p}', '{n}、{t}……{p}']
+    fmt = rng.choice(formats)
+    fullwidth = rng.random() < 0.3
+
+    toc, page = [], toc_pages + 1
+    for n in range(1, entries + 1):
+        toc.append({'number': str(n), 'title': rng.choice(SAMPLE_TITLES), 'page': page})
+        page += rng.randint(1, 6)
+
+    def render(entry):
+        line = fmt.format(n=entry['number'], t=entry['title'], p=entry['page'])
+        if fullwidth:
+            line = line.translate(str.maketrans('0123456789()', '０１２３４５６７８９（）'))
+        return line
+
+    per_page = -(-entries // toc_pages)
+    pages = []
+    for i in range(toc_pages):
+        lines = ['卷内目录'] if i == 0 else []
+        lines += ['序号 文书名称 页码'] + [render(e) for e in toc[i * per_page:(i + 1) * per_page]]
+        pages.append('\n'.join(lines))
+    for _ in range(page - toc_pages):
+        pages.append('\n'.join(rng.choice(SAMPLE_BODY) for _ in range(rng.randint(10, 40))))
+    return {'pages': pages, 'toc': toc}
+
+
+def load_corpus(corpus_dir):
+    documents = []
+    for path in sorted(glob.glob(os.path.join(corpus_dir, '*.json'))):
+        with open(path, encoding='utf-8') as f:
+            documents.append(json.load(f))
+    return documents
+
+
+def evaluate(documents, detected):
+    """按 (序号, 名称, 页码) 计算准确率、召回率和F1"""
+    true_positive = expected_total = detected_total = 0
+    for document, rows in zip(documents, detected):
+        expected = {(str(e['number']), e['title'], int(e['page'])) for e in document['toc']}
+        found = {(r['number'], r['title'], r['page']) for r in rows}
+        true_positive += len(expected & found)
+        expected_total += len(expected)
+        detected_total += len(found)
+    precision = true_positive / detected_total if detected_total else 0.0
+    recall = true_positive / expected_total if expected_total else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return precision, recall, f1
+
+
+def run_benchmark(documents, workers=None):
+    total_pages = sum(len(document['pages']) for document in documents)
+
+    start = time.perf_counter()
+    serial = [detect_toc(document['pages']) for document in documents]
+    serial_elapsed = time.perf_counter() - start
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # 先启动工作进程，避免把进程启动时间计入吞吐量
+        list(pool.map(normalize_text, [''] * (workers or os.cpu_count() or 1)))
+        start = time.perf_counter()
+        parallel = detect_toc_many([document['pages'] for document in documents], executor=pool)
+        parallel_elapsed = time.perf_counter() - start
+
+    precision, recall, f1 = evaluate(documents, serial)
+    print(f"文档 {len(documents)} 份，共 {total_pages} 页")
+    print(f"准确率 {precision:.3f}  召回率 {recall:.3f}  F1 {f1:.3f}")
+    print(f"单进程: {total_pages / serial_elapsed:,.0f} 页/秒")
+    print(f"进程池: {total_pages / parallel_elapsed:,.0f} 页/秒（{workers or os.cpu_count()} 个进程）")
+    if parallel != serial:
+        print("警告：并行结果与单进程结果不一致")
+        return 1
+    return 0
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="卷宗目录识别")
+    parser.add_argument('--benchmark', nargs='?', const='', metavar='语料目录',
+                        help="对语料目录（或 --synthetic 生成的卷宗）测试准确率和吞吐量")
+    parser.add_argument('--synthetic', type=int, default=0, help="生成的合成卷宗数量")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args(argv)
+
+    if args.benchmark is None:
+        parser.print_help()
+        return 0
+    if args.benchmark:
+        documents = load_corpus(args.benchmark)
+    else:
+        rng = random.Random(args.seed)
+        documents = [synthetic_document(rng) for _ in range(args.synthetic or 100)]
+    if not documents:
+        print("语料为空")
+        return 1
+    return run_benchmark(documents, args.workers)
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))